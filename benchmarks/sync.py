@@ -0,0 +1,498 @@
+"""
+Measure the throughput of a whole sync against a fake Blackboard server
+
+A local HTTP server stands in for Blackboard, serving the REST endpoints
+used by `SyncSession` for a synthetic institution: memberships, courses,
+content listings, bodies, attachments and their downloads, and WebDav
+files linked from content bodies. `BlackboardDownload` is run against it
+as it would be against a real instance, and the wall time, requests per
+second and MiB/s are reported.
+
+Results are compared with those stored in a baseline file, which is
+written with `--update-baseline`. The benchmark fails if the throughput
+drops below the baseline by more than the tolerance, or if there is no
+baseline for the shape run, unless `--no-baseline` is given to only
+report the results. The baseline for the default shape is kept in
+`benchmarks/baseline.json`, measured on a single core, so update it
+before comparing results from another machine.
+
+You may invoke this script with the following command from the project root
+`python -m benchmarks.sync --courses 8 --depth 2 --folders 3 --files 4`
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, NamedTuple
+from urllib.parse import urlsplit, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from requests.cookies import RequestsCookieJar
+
+from blackboard_sync.manifest import SyncManifest
+from blackboard_sync.session import SyncSession
+from blackboard_sync.transport import SyncTransport
+from blackboard_sync.download import BlackboardDownload
+
+KiB = 1024
+MiB = 1024 * 1024
+
+USER_ID = "_1_1"
+MODIFIED = "2024-01-01T00:00:00.000Z"
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+
+class Shape(NamedTuple):
+    """Size of a synthetic institution."""
+    courses: int = 8
+    # Levels of folders below the top of each course
+    depth: int = 2
+    # Folders inside each folder, and at the top of each course
+    folders: int = 3
+    # Documents inside each folder, each with a single attachment
+    files: int = 4
+    # Size of each attachment in bytes
+    file_size: int = 256 * KiB
+    # WebDav files linked from the body of each document
+    webdav: int = 1
+    # Results in each page of a listing
+    page_size: int = 100
+    # Whether contents can be listed recursively
+    recursive: bool = True
+
+
+class Node(NamedTuple):
+    content: dict[str, Any]
+    children: list[str]
+
+
+class Institution:
+    """Courses and contents of a fake instance, generated from a shape.
+
+    Every file is unique, so that none is skipped as a copy of another.
+    """
+
+    def __init__(self, shape: Shape, base_url: str) -> None:
+        self.shape = shape
+        self.base_url = base_url
+        self.courses = [f"_{i + 1}_1" for i in range(shape.courses)]
+
+        # Content ids are unique across the institution
+        self.nodes: dict[str, Node] = {}
+        self.roots: dict[str, list[str]] = {}
+        self.webdav_files: set[str] = set()
+        self._ids = 0
+
+        for course_id in self.courses:
+            self.roots[course_id] = self._folder(None, shape.depth)
+
+        self.payload = os.urandom(shape.file_size)
+
+    def _next_id(self) -> str:
+        self._ids += 1
+        return f"_{self._ids}_1"
+
+    def _folder(self, parent: str | None, depth: int) -> list[str]:
+        """Create the contents of a folder, returning their ids."""
+        children = []
+
+        for i in range(self.shape.files):
+            content_id = self._next_id()
+            self.nodes[content_id] = Node(self._content(
+                content_id, parent, f"Document {i}", 'x-bb-document',
+                body=self._body(content_id)
+            ), [])
+            children.append(content_id)
+
+        if depth > 0:
+            for i in range(self.shape.folders):
+                content_id = self._next_id()
+                grandchildren = self._folder(content_id, depth - 1)
+                self.nodes[content_id] = Node(self._content(
+                    content_id, parent, f"Folder {i}", 'x-bb-folder',
+                    has_children=bool(grandchildren)
+                ), grandchildren)
+                children.append(content_id)
+
+        return children
+
+    def _content(self, content_id: str, parent: str | None, title: str,
+                 handler: str, body: str | None = None,
+                 has_children: bool = False) -> dict[str, Any]:
+        return {
+            'id': content_id,
+            'title': title,
+            'body': body,
+            'modified': MODIFIED,
+            'hasChildren': has_children,
+            'parentId': parent,
+            'availability': {'available': 'Yes'},
+            'contentHandler': {'id': f"resource/{handler}"}
+        }
+
+    def _body(self, content_id: str) -> str:
+        links = []
+
+        for i in range(self.shape.webdav):
+            path = f"/bbcswebdav/pid-{content_id}/xid-{i}"
+            self.webdav_files.add(path)
+            links.append(f'<a href="{self.base_url}{path}">notes{i}.pdf</a>')
+
+        return f"<p>Reading for this week</p>{''.join(links)}"
+
+    def file_body(self, name: str) -> bytes:
+        """Bytes of a file, unique to its name."""
+        prefix = name.encode()[:len(self.payload)]
+        return prefix + self.payload[len(prefix):]
+
+    def membership(self, course_id: str) -> dict[str, Any]:
+        return {'courseId': course_id, 'dataSourceId': '_1_1',
+                'created': MODIFIED, 'availability': {'available': 'Yes'}}
+
+    def course(self, course_id: str) -> dict[str, Any]:
+        return {'id': course_id, 'name': f"Course {course_id}",
+                'created': MODIFIED, 'availability': {'available': 'Yes'}}
+
+    def descendants(self, ids: list[str]) -> list[str]:
+        found = []
+
+        for content_id in ids:
+            found.append(content_id)
+            found.extend(self.descendants(self.nodes[content_id].children))
+        return found
+
+
+class Router:
+    """Map a request path to the response of the fake instance."""
+
+    def __init__(self, institution: Institution) -> None:
+        self.institution = institution
+        v = r"/learn/api/public/v\d+"
+        self.routes = [
+            (re.compile(rf"{v}/users/me"), self.user),
+            (re.compile(rf"{v}/users/[^/]+/courses"), self.memberships),
+            (re.compile(rf"{v}/courses/([^/]+)"), self.course),
+            (re.compile(rf"{v}/courses/([^/]+)/contents"), self.contents),
+            (re.compile(rf"{v}/courses/[^/]+/contents/([^/]+)"), self.body),
+            (re.compile(rf"{v}/courses/[^/]+/contents/([^/]+)/children"),
+             self.children),
+            (re.compile(rf"{v}/courses/[^/]+/contents/([^/]+)/attachments"),
+             self.attachments),
+        ]
+
+    def route(self, path: str, query: dict[str, list[str]]
+              ) -> tuple[int, Any]:
+        for pattern, handler in self.routes:
+            if (match := pattern.fullmatch(path)):
+                return handler(path, query, *match.groups())
+        return 404, {'status': 404, 'message': "Not found"}
+
+    def user(self, path: str, query: dict[str, list[str]]
+             ) -> tuple[int, Any]:
+        return 200, {'id': USER_ID}
+
+    def memberships(self, path: str, query: dict[str, list[str]]
+                    ) -> tuple[int, Any]:
+        return 200, {'results': [self.institution.membership(c)
+                                 for c in self.institution.courses]}
+
+    def course(self, path: str, query: dict[str, list[str]],
+               course_id: str) -> tuple[int, Any]:
+        return 200, self.institution.course(course_id)
+
+    def contents(self, path: str, query: dict[str, list[str]],
+                 course_id: str) -> tuple[int, Any]:
+        ids = self.institution.roots[course_id]
+
+        if query.get('recursive') == ['true']:
+            if not self.institution.shape.recursive:
+                return 400, {'status': 400, 'message': "Not supported"}
+            ids = self.institution.descendants(ids)
+
+        return self.page(path, query, ids)
+
+    def children(self, path: str, query: dict[str, list[str]],
+                 content_id: str) -> tuple[int, Any]:
+        return self.page(path, query,
+                         self.institution.nodes[content_id].children)
+
+    def page(self, path: str, query: dict[str, list[str]],
+             ids: list[str]) -> tuple[int, Any]:
+        offset = int(query.get('offset', ['0'])[0])
+        limit = self.institution.shape.page_size
+        fields = query.get('fields', [''])[0].split(',')
+
+        results = []
+
+        for content_id in ids[offset:offset + limit]:
+            content = self.institution.nodes[content_id].content
+
+            if fields != ['']:
+                content = {k: v for k, v in content.items() if k in fields}
+            results.append(content)
+
+        page: dict[str, Any] = {'results': results}
+
+        if offset + limit < len(ids):
+            next_query = {k: v[0] for k, v in query.items()}
+            next_query['offset'] = str(offset + limit)
+            page['paging'] = {'nextPage': f"{path}?{urlencode(next_query)}"}
+
+        return 200, page
+
+    def body(self, path: str, query: dict[str, list[str]],
+             content_id: str) -> tuple[int, Any]:
+        return 200, {'body': self.institution.nodes[content_id]
+                     .content['body']}
+
+    def attachments(self, path: str, query: dict[str, list[str]],
+                    content_id: str) -> tuple[int, Any]:
+        return 200, {'results': [{'id': f"{content_id}a",
+                                  'fileName': f"slides{content_id}.pdf",
+                                  'mimeType': 'application/pdf'}]}
+
+
+class FakeBlackboard(ThreadingHTTPServer):
+    """Local server for a synthetic institution, counting requests."""
+
+    daemon_threads = True
+
+    def __init__(self, shape: Shape) -> None:
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.url = f"http://127.0.0.1:{self.server_port}"
+        # Links in bodies point to the instance, known once it is bound
+        self.institution = Institution(shape, self.url)
+        self.router = Router(self.institution)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeBlackboard
+
+    def do_HEAD(self) -> None:
+        self._respond(head=True)
+
+    def do_GET(self) -> None:
+        self._respond(head=False)
+
+    def _respond(self, head: bool) -> None:
+        with self.server.lock:
+            self.server.requests += 1
+
+        institution = self.server.institution
+        url = urlsplit(self.path)
+
+        if url.path == '/':
+            self._send(200, b'', 'text/html', head)
+        elif (url.path in institution.webdav_files
+              or url.path.endswith('/download')):
+            self._send(200, institution.file_body(url.path),
+                       'application/pdf', head)
+        else:
+            status, body = self.server.router.route(url.path,
+                                                    parse_qs(url.query))
+            self._send(status, json.dumps(body).encode(),
+                       'application/json', head)
+
+    def _send(self, status: int, body: bytes, content_type: str,
+              head: bool) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+
+        if content_type != 'application/json':
+            # Files are unique, and so are their ETags
+            self.send_header("ETag", f'"{self.path}"')
+
+        self.end_headers()
+
+        if not head:
+            self.wfile.write(body)
+
+            with self.server.lock:
+                self.server.bytes_sent += len(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+class Result(NamedTuple):
+    wall_time: float
+    requests: int
+    # Bytes of the files written, not counting the sync's own data
+    bytes: int
+    files: int
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.wall_time
+
+    @property
+    def throughput(self) -> float:
+        """MiB written per second."""
+        return self.bytes / MiB / self.wall_time
+
+
+def run(shape: Shape, course_workers: int | None = None) -> Result:
+    """Sync the whole institution once, into an empty folder."""
+    server = FakeBlackboard(shape)
+    server.start()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            location = Path(tmpdir)
+            sess = SyncSession(server.url, cookies=RequestsCookieJar(),
+                               transport=SyncTransport())
+            download = BlackboardDownload(sess, location,
+                                          course_workers=course_workers)
+
+            start = time.perf_counter()
+            download.download()
+            wall_time = time.perf_counter() - start
+
+            data = location / SyncManifest.data_directory
+            files = [p for p in location.rglob('*')
+                     if p.is_file() and data not in p.parents]
+            written = sum(p.stat().st_size for p in files)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return Result(wall_time, server.requests, written, len(files))
+
+
+def compare(name: str, result: Result, baseline: Path,
+            tolerance: float) -> bool:
+    """Print the change from the baseline.
+
+    :return: False on a regression, or if there is no baseline to
+             compare with.
+    """
+    if not baseline.exists():
+        print(f"no baseline at {baseline}, see --update-baseline")
+        return False
+
+    stored = json.loads(baseline.read_text()).get(name)
+
+    if stored is None:
+        print(f"no baseline for {name} in {baseline}, "
+              "see --update-baseline or --no-baseline")
+        return False
+
+    ok = True
+
+    for key, value in (('requests_per_second', result.requests_per_second),
+                       ('throughput', result.throughput)):
+        change = value / stored[key] - 1
+        regressed = change < -tolerance
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{key:20} {stored[key]:10.1f} -> {value:10.1f} "
+              f"({change:+.0%}){flag}")
+
+    return ok
+
+
+def update_baseline(name: str, result: Result, baseline: Path) -> None:
+    stored = json.loads(baseline.read_text()) if baseline.exists() else {}
+    stored[name] = {'wall_time': result.wall_time,
+                    'requests_per_second': result.requests_per_second,
+                    'throughput': result.throughput}
+    baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+    print(f"baseline for {name} written to {baseline}")
+
+
+def main() -> None:
+    defaults = Shape()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--courses", type=int, default=defaults.courses)
+    parser.add_argument("--depth", type=int, default=defaults.depth,
+                        help="levels of folders in each course")
+    parser.add_argument("--folders", type=int, default=defaults.folders,
+                        help="folders inside each folder")
+    parser.add_argument("--files", type=int, default=defaults.files,
+                        help="documents inside each folder")
+    parser.add_argument("--size", type=int,
+                        default=defaults.file_size // KiB,
+                        help="size of each file in KiB")
+    parser.add_argument("--webdav", type=int, default=defaults.webdav,
+                        help="WebDav files linked from each document")
+    parser.add_argument("--no-recursive", action="store_true",
+                        help="list each folder instead of whole courses")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="courses fetched concurrently")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs, of which the fastest is kept")
+    parser.add_argument("--name", default=None,
+                        help="name of the results in the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown allowed before failing")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--no-baseline", action="store_true",
+                        help="only report the results")
+    parser.add_argument("--verbose", action="store_true",
+                        help="show the log of each sync")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('blackboard_sync').setLevel(logging.WARNING)
+
+    shape = Shape(args.courses, args.depth, args.folders, args.files,
+                  args.size * KiB, args.webdav,
+                  recursive=not args.no_recursive)
+    name = args.name or (f"{shape.courses}c-{shape.depth}d-"
+                         f"{shape.folders}f-{shape.files}x{args.size}k"
+                         f"{'-flat' if args.no_recursive else ''}")
+
+    results = [run(shape, args.workers)
+               for _ in range(args.repeat)]
+    result = min(results, key=lambda r: r.wall_time)
+
+    print(f"{name}: {result.files} files, {result.bytes / MiB:.1f} MiB, "
+          f"{result.requests} requests")
+    print(f"wall time:          {result.wall_time:8.2f} s")
+    print(f"requests/sec:       {result.requests_per_second:8.1f}")
+    print(f"throughput:         {result.throughput:8.1f} MiB/s")
+
+    if args.update_baseline:
+        update_baseline(name, result, args.baseline)
+    elif args.no_baseline:
+        return
+    elif not compare(name, result, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
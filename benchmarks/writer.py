@@ -0,0 +1,119 @@
+"""
+Measure the throughput of the file writers used by BStream
+
+A local HTTP server streams a file of random bytes, which is downloaded
+concurrently by a number of workers, first with the previous 1 KiB
+`iter_content` loop and then with `StreamWriter`.
+
+You may invoke this script with the following command from the project root
+`python -m benchmarks.writer --size 200 --workers 4`
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from blackboard_sync.content.writer import get_writer
+
+MiB = 1024 * 1024
+
+
+def serve(payload: bytes) -> ThreadingHTTPServer:
+    """Start a local server which returns the payload on every GET."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_write(stream: requests.Response, path: Path) -> None:
+    with path.open("wb") as f:
+        for chunk in stream.iter_content(chunk_size=1024):
+            f.write(chunk)
+
+
+def writer_write(stream: requests.Response, path: Path) -> None:
+    with path.open("wb") as f:
+        get_writer().write(stream, f)
+
+
+def run(url: str, workers: int, directory: Path,
+        write: Callable[[requests.Response, Path], None]) -> float:
+    """Download once per worker, return mean bytes/sec per worker."""
+
+    def task(i: int) -> float:
+        start = time.perf_counter()
+        with requests.get(url, stream=True) as stream:
+            size = int(stream.headers["Content-Length"])
+            write(stream, directory / f"{i}.bin")
+        return size / (time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        rates = list(executor.map(task, range(workers)))
+
+    return sum(rates) / len(rates)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", type=int, default=200,
+                        help="file size in MiB")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = serve(os.urandom(args.size * MiB))
+    url = f"http://127.0.0.1:{server.server_port}/file.bin"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = Path(tmpdir)
+        before = run(url, args.workers, directory, legacy_write)
+        after = run(url, args.workers, directory, writer_write)
+
+    server.shutdown()
+
+    print(f"{args.workers} workers, {args.size} MiB each")
+    print(f"iter_content(1024): {before / MiB:8.1f} MiB/s per worker")
+    print(f"StreamWriter:       {after / MiB:8.1f} MiB/s per worker")
+    print(f"speedup:            {after / before:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
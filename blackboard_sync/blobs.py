@@ -0,0 +1,132 @@
+"""
+BlackboardSync content-addressed file store
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import os
+import uuid
+import shutil
+import logging
+import hashlib
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(path: Path, digest: 'hashlib._Hash') -> None:
+    """Feed the contents of a file to a running digest."""
+    with path.open('rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+
+
+class BlobStore:
+    """Store of downloaded files, addressed by their SHA-256 digest.
+
+    Every file in the download location is a hardlink to a blob, so
+    identical files in several courses only take space once. If the
+    file system does not support hardlinks, files are stored in place
+    and copied from each other instead.
+
+    Since copies share their data, editing one in place edits them all.
+    """
+
+    _directory = "blobs"
+
+    def __init__(self, data_directory: Path) -> None:
+        self._root = data_directory / self._directory
+        self._root.mkdir(exist_ok=True, parents=True)
+        self._links: bool | None = None
+
+    def blob_path(self, digest: str) -> Path:
+        return self._root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.blob_path(digest).is_file()
+
+    def put(self, src: Path, digest: str, dest: Path) -> None:
+        """Add a complete download to the store and move it into place."""
+        blob = self.blob_path(digest)
+
+        if self._links is not False:
+            if not blob.is_file():
+                blob.parent.mkdir(exist_ok=True)
+                self._try_link(src, blob)
+
+            if blob.is_file() and self._try_link(blob, dest):
+                src.unlink()
+                return
+
+        os.replace(src, dest)
+
+    def materialise(self, digest: str, dest: Path,
+                    fallback: Path | None = None) -> bool:
+        """Create a file from its blob, or from another copy of it.
+
+        :return: False if no copy of the file is held.
+        """
+        source = self.blob_path(digest)
+
+        if source.is_file():
+            if self._links is not False and self._try_link(source, dest):
+                return True
+        elif fallback is not None and fallback.is_file():
+            source = fallback
+        else:
+            return False
+
+        self._replace_with(dest, lambda tmp: shutil.copyfile(source, tmp))
+        return True
+
+    def prune(self) -> int:
+        """Delete blobs which are not linked to any file any longer.
+
+        :return: Number of blobs deleted
+        """
+        pruned = 0
+
+        for blob in self._root.glob('*/*'):
+            if blob.stat().st_nlink <= 1:
+                blob.unlink()
+                pruned += 1
+
+        return pruned
+
+    def _try_link(self, src: Path, dest: Path) -> bool:
+        try:
+            self._replace_with(dest, lambda tmp: os.link(src, tmp))
+        except OSError:
+            if self._links is None:
+                logger.info("Hardlinks not supported, storing copies")
+                self._links = False
+            return False
+
+        self._links = True
+        return True
+
+    @staticmethod
+    def _replace_with(dest: Path, create) -> None:
+        """Create a file next to dest, then atomically move it there."""
+        tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}")
+
+        try:
+            create(tmp)
+            os.replace(tmp, dest)
+        finally:
+            tmp.unlink(missing_ok=True)
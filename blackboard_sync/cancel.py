@@ -0,0 +1,121 @@
+"""
+BlackboardSync cooperative cancellation
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import socket
+import logging
+import threading
+from itertools import count
+from contextlib import contextmanager
+from collections.abc import Callable, Iterator
+
+from requests import Response
+
+logger = logging.getLogger(__name__)
+
+
+class SyncCancelled(Exception):
+    """The sync was cancelled before the operation could finish."""
+
+
+class CancelToken:
+    """Flag shared by every part of a sync, to stop it early.
+
+    Work is split in small steps, and the token is checked between
+    them. Operations which may block for long, like reading a response,
+    register a callback with `interrupting` which unblocks them as soon
+    as the token is cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._callbacks: dict[int, Callable[[], None]] = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """Cancel, and interrupt every operation registered."""
+        with self._lock:
+            if self._event.is_set():
+                return
+
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.debug("Could not interrupt operation", exc_info=True)
+
+    def check(self) -> None:
+        """Raise `SyncCancelled` if cancelled."""
+        if self._event.is_set():
+            raise SyncCancelled
+
+    def sleep(self, seconds: float) -> None:
+        """Sleep, unless cancelled in the meantime.
+
+        :raises SyncCancelled: If cancelled before or while sleeping
+        """
+        if self._event.wait(seconds):
+            raise SyncCancelled
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until cancelled.
+
+        :return: Whether the token was cancelled
+        """
+        return self._event.wait(timeout)
+
+    @contextmanager
+    def interrupting(self, callback: Callable[[], None]) -> Iterator[None]:
+        """Call `callback` if cancelled while the block runs."""
+        with self._lock:
+            self.check()
+            callback_id = next(self._ids)
+            self._callbacks[callback_id] = callback
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.pop(callback_id, None)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+def interrupt(response: Response) -> None:
+    """Unblock a thread reading the body of a response.
+
+    Closing the response is not enough, a read already waiting on the
+    socket only returns once the socket is shut down.
+    """
+    connection = getattr(response.raw, 'connection', None)
+    sock = getattr(connection, 'sock', None)
+
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
@@ -124,3 +124,72 @@ class SyncConfig(Config):
     @Config.persist
     def min_year(self, year: int | None) -> None:
         self._sync['min_year'] = str(year or 0)
+
+    @property
+    def course_workers(self) -> int | None:
+        return self._sync.getint('course_workers')
+
+    @course_workers.setter
+    @Config.persist
+    def course_workers(self, workers: int | None) -> None:
+        if workers is None:
+            self.remove_option('Sync', 'course_workers')
+        else:
+            self._sync['course_workers'] = str(workers)
+
+    @property
+    def retry_attempts(self) -> int | None:
+        return self._sync.getint('retry_attempts')
+
+    @retry_attempts.setter
+    @Config.persist
+    def retry_attempts(self, attempts: int | None) -> None:
+        if attempts is None:
+            self.remove_option('Sync', 'retry_attempts')
+        else:
+            self._sync['retry_attempts'] = str(attempts)
+
+    @property
+    def thread_sessions(self) -> bool:
+        return self._sync.getboolean('thread_sessions', fallback=False)
+
+    @thread_sessions.setter
+    @Config.persist
+    def thread_sessions(self, enabled: bool) -> None:
+        self._sync['thread_sessions'] = str(enabled)
+
+    @property
+    def metrics_textfile(self) -> Path | None:
+        return self._sync.getpath('metrics_textfile')
+
+    @metrics_textfile.setter
+    @Config.persist
+    def metrics_textfile(self, path: Path | None) -> None:
+        if path is None:
+            self.remove_option('Sync', 'metrics_textfile')
+        else:
+            self._sync['metrics_textfile'] = str(path)
+
+    @property
+    def metrics_port(self) -> int | None:
+        return self._sync.getint('metrics_port')
+
+    @metrics_port.setter
+    @Config.persist
+    def metrics_port(self, port: int | None) -> None:
+        if port is None:
+            self.remove_option('Sync', 'metrics_port')
+        else:
+            self._sync['metrics_port'] = str(port)
+
+    @property
+    def profiler(self) -> str | None:
+        return self._sync.get('profiler')
+
+    @profiler.setter
+    @Config.persist
+    def profiler(self, mode: str | None) -> None:
+        if mode is None:
+            self.remove_option('Sync', 'profiler')
+        else:
+            self._sync['profiler'] = mode
@@ -4,3 +4,9 @@ from typing import TypedDict
 class BBContentPath(TypedDict):
     course_id: str
     content_id: str
+
+
+def content_key(api_path: BBContentPath, *children: str) -> str:
+    """Key identifying a content, or an item it owns, in the manifest."""
+    return '/'.join([api_path['course_id'], api_path['content_id'],
+                     *children])
@@ -2,12 +2,13 @@ import uuid
 import mimetypes
 
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from requests import Response
 
 from blackboard.blackboard import BBAttachment
 
+from ..plan import SyncPlan
 from .base import BStream
-from .api_path import BBContentPath
+from .api_path import BBContentPath, content_key
 from .job import DownloadJob
 
 
@@ -16,6 +17,10 @@ class Attachment(BStream):
 
     def __init__(self, attachment: BBAttachment, api_path: BBContentPath,
                  job: DownloadJob):
+        super().__init__(job,
+                         content_key(api_path, attachment.id),
+                         content_key(api_path))
+
         filename = attachment.fileName or str(uuid.uuid1())
         name_ext = '.' + filename.split('.')[-1]
 
@@ -29,8 +34,18 @@ class Attachment(BStream):
             real_ext = possible_ext[0] if possible_ext else '.txt'
             self.filename = filename + real_ext
 
-        self.stream = job.session.download(attachment_id=attachment.id,
-                                           **api_path)
+        self._session = job.session
+        self._attachment_id = attachment.id
+        self._api_path = api_path
+
+    def open_stream(self, headers: dict[str, str]) -> Response:
+        return self._session.download(attachment_id=self._attachment_id,
+                                      headers=headers, **self._api_path)
+
+    def stream_url(self) -> str:
+        return self._session.attachment_url(
+            attachment_id=self._attachment_id, **self._api_path
+        )
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
-        super().write_base(path / self.filename, executor, self.stream)
+    def write(self, path: Path, plan: SyncPlan) -> None:
+        plan.add_stream(path / self.filename, self)
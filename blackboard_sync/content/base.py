@@ -1,24 +1,323 @@
+import time
+from abc import ABC, abstractmethod
 from pathlib import Path
+from functools import partial
+from contextlib import nullcontext
+from typing import Any, ContextManager
 from requests import Response
 
 from concurrent.futures import ThreadPoolExecutor
 
+from ..cancel import CancelToken, interrupt
+from ..manifest import SyncManifest
+from ..progress import SyncProgress
+from ..retry import RetryPolicy, TRANSIENT_ERRORS
+from .job import DownloadJob
+from .part import (PartFile, PartRequest, discard_part, part_request,
+                   remove_part, start_part)
+from .writer import get_writer
 
-class BStream:
-    """Base class for content that can be downloaded as a byte stream."""
-    CHUNK_SIZE = 1024
 
-    def write_base(self, path: Path, executor: ThreadPoolExecutor,
-                   stream: Response) -> None:
+class DownloadError(Exception):
+    """The server answered a download with an error status."""
+
+
+class InterruptedRead(Exception):
+    """The body of a response could not be read to its end.
+
+    Only these are retried by the download itself, errors sending the
+    request have been retried by the transport already.
+    """
+
+    def __init__(self, error: BaseException) -> None:
+        super().__init__(str(error))
+        self.error = error
+
+
+class BStream(ABC):
+    """Base class for content that can be downloaded as a byte stream.
+
+    Subclasses send the request in `open_stream`, which only runs on the
+    worker writing the stream. The body goes to a partial file, which
+    is moved into place once complete and can be resumed if cut short,
+    see `part`. Reads cut by a transient error are retried following
+    the job's retry policy.
+    """
+
+    # Evict downloaded files from the page cache after writing them
+    DROP_PAGE_CACHE = False
+
+    # Revalidate the local copy with the validators of the last response
+    CONDITIONAL_REQUESTS = False
+
+    PART_SUFFIX = '.part'
+
+    def __init__(self, job: DownloadJob | None = None,
+                 key: str | None = None, parent: str | None = None) -> None:
+        """
+        :param job: Job whose manifest and blob store are used
+        :param key: Key of the file in the manifest
+        :param parent: Key of the content the file belongs to
+        """
+        self._key = key
+        self._parent = parent
+        self._manifest = None
+        self._blobs = None
+        self._retry: RetryPolicy | None = None
+        self._cancel: CancelToken | None = None
+        self._progress: SyncProgress | None = None
+
+        if job is not None:
+            self._blobs = job.blobs
+            self._retry = job.retry
+            self._cancel = job.cancel_token
+            self._progress = job.progress
+
+            if key is not None:
+                self._manifest = job.manifest
+                self._manifest.start_file(key, parent)
+
+    @abstractmethod
+    def open_stream(self, headers: dict[str, str]) -> Response:
+        """Send the request for the byte stream."""
+
+    def stream_url(self) -> str | None:
+        """URL which serves the same stream as `open_stream`, if any."""
+        return None
+
+    def should_open(self) -> bool:
+        """Check if the stream is worth requesting at all."""
+        return True
+
+    def expected_size(self) -> int | None:
+        """Size of the file written last time, if any."""
+        if self._manifest is None or self._key is None:
+            return None
+
+        entry = self._manifest.get(self._key)
+        return entry.size if entry is not None else None
+
+    def get_path(self, path: Path, stream: Response) -> Path | None:
+        """Final path of the file, or None to discard the stream."""
+        return path
+
+    def write_base(self, path: Path, executor: ThreadPoolExecutor) -> None:
         """Schedule the write operation."""
 
         def _write() -> None:
-            with path.open("wb") as f:
-                for chunk in stream.iter_content(chunk_size=self.CHUNK_SIZE):
-                    f.write(chunk)
+            self._download(path)
 
         executor.submit(_write)
 
+    def _download(self, path: Path) -> None:
+        part_path = path.with_name(path.name + self.PART_SUFFIX)
+
+        try:
+            self._check_cancelled()
+
+            if not self.should_open():
+                self._skip()
+                return
+
+            failures = 0
+
+            while True:
+                try:
+                    if not self._write_part(path, part_path):
+                        # Partial file could not be resumed, start over
+                        remove_part(part_path)
+                        self._write_part(path, part_path)
+                    return
+                except InterruptedRead as interrupted:
+                    error = interrupted.error
+
+                # A read interrupted by cancelling is not worth retrying
+                self._check_cancelled()
+                failures += 1
+                if (delay := self._retry_delay(failures)) is None:
+                    raise error
+
+                self._sleep(delay)
+        except BaseException:
+            if self._manifest is not None:
+                self._manifest.fail_file(self._key, self._parent)
+            raise
+
+    def _retry_delay(self, failures: int) -> float | None:
+        if self._retry is None:
+            return None
+        return self._retry.delay(failures)
+
+    def _check_cancelled(self) -> None:
+        if self._cancel is not None:
+            self._cancel.check()
+
+    def _sleep(self, seconds: float) -> None:
+        if self._cancel is not None:
+            self._cancel.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _interruptible(self, stream: Response) -> ContextManager[None]:
+        """Interrupt the read of the stream if the job is cancelled."""
+        if self._cancel is None:
+            return nullcontext()
+        return self._cancel.interrupting(partial(interrupt, stream))
+
+    def _write_part(self, path: Path, part_path: Path) -> bool:
+        """Download to the partial file, then move it into place.
+
+        :return: False if the server would not resume the partial file.
+        """
+        request = self._part_request(part_path)
+
+        with (self.open_stream(request.headers) as stream,
+              self._interruptible(stream)):
+            part = self._open_part(stream, path, part_path, request)
+
+            if isinstance(part, bool):
+                return part
+
+            try:
+                with part_path.open('ab' if part.resume else 'wb') as f:
+                    get_writer().write(stream, f, self.DROP_PAGE_CACHE,
+                                       part.digest, self._cancel,
+                                       self._progress)
+            except TRANSIENT_ERRORS as e:
+                discard_part(stream, part_path)
+                raise InterruptedRead(e)
+            except BaseException:
+                discard_part(stream, part_path)
+                raise
+
+        self._commit_part(part_path, part)
+        return True
+
+    def _part_request(self, part_path: Path) -> PartRequest:
+        """Offset of the partial file, and the headers to request it."""
+        return part_request(part_path) or PartRequest(0, self._validators())
+
+    def _open_part(self, stream: Any, path: Path, part_path: Path,
+                   request: PartRequest) -> PartFile | bool:
+        """Handle the headers of a response before its body is read.
+
+        :return: The file to write the body to, or whether the download
+                 is already over, as in `_write_part`.
+        """
+        if stream.status_code == 416:
+            return False
+
+        if stream.status_code == 304:
+            # Local copy is still current
+            if self._manifest is not None:
+                self._manifest.keep_file(self._key, self._parent)
+            if self._progress is not None:
+                self._progress.skip()
+            return True
+
+        if not 200 <= stream.status_code < 300:
+            # Error pages must not be written in place of the file
+            raise DownloadError(f"Server answered {stream.status_code}")
+
+        file_path = self.get_path(path, stream)
+
+        if file_path is None:
+            self._skip()
+            return True
+
+        etag = stream.headers.get('ETag')
+        last_modified = stream.headers.get('Last-Modified')
+
+        if (known_digest := self._copy_known(etag, file_path)):
+            self._record(file_path, etag, known_digest, last_modified)
+            return True
+
+        if (started := start_part(part_path, stream, request)) is None:
+            # Range of another version of the file, start over
+            return False
+
+        resume, digest = started
+        return PartFile(file_path, resume, digest, etag, last_modified)
+
+    def _commit_part(self, part_path: Path, part: PartFile) -> None:
+        """Move a complete partial file into place."""
+        digest = part.digest.hexdigest()
+
+        if self._blobs is not None:
+            self._blobs.put(part_path, digest, part.file_path)
+        else:
+            part_path.replace(part.file_path)
+
+        remove_part(part_path)
+        self._record(part.file_path, part.etag, digest, part.last_modified)
+
+    def _validators(self) -> dict[str, str]:
+        """Headers which avoid a download if the local copy is current."""
+        if not self.CONDITIONAL_REQUESTS or self._manifest is None:
+            return {}
+
+        entry = self._manifest.get(self._key)
+
+        if entry is None or not SyncManifest.file_unchanged(entry):
+            return {}
+
+        headers = {}
+
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        return headers
+
+    def _copy_known(self, etag: str | None, file_path: Path) -> str | None:
+        """Create the file from a copy held of its last download.
+
+        Only a copy of the same file served with the same ETag is used.
+        Identical files of different URLs are only told apart by their
+        digest, once downloaded.
+
+        :return: Digest of the file, if a copy was found.
+        """
+        # Weak ETags do not guarantee identical bytes
+        if not etag or etag.startswith('W/'):
+            return None
+
+        if self._blobs is None or self._manifest is None or self._key is None:
+            return None
+
+        entry = self._manifest.find_etag(self._key, etag)
+
+        if entry is None or entry.digest is None:
+            return None
+
+        fallback = None
+
+        if entry.path and SyncManifest.file_unchanged(entry):
+            fallback = Path(entry.path)
+
+        if self._blobs.materialise(entry.digest, file_path, fallback):
+            return entry.digest
+        return None
+
+    def _skip(self) -> None:
+        """Record a file which was deliberately not downloaded."""
+        if self._manifest is not None:
+            self._manifest.skip_file(self._key, self._parent)
+        if self._progress is not None:
+            self._progress.skip()
+
+    def _record(self, file_path: Path, etag: str | None, digest: str,
+                last_modified: str | None) -> None:
+        if self._manifest is not None:
+            self._manifest.complete_file(self._key, self._parent, file_path,
+                                         etag, digest, last_modified)
+
+    @property
+    def key(self) -> str | None:
+        """Key of the file in the manifest."""
+        return self._key
+
 
 class FStream:
     """Base class for content that can be written as text."""
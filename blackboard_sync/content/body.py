@@ -1,10 +1,11 @@
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 from blackboard.blackboard import BBCourseContent
 
+from ..plan import SyncPlan
 from .base import FStream
 from .job import DownloadJob
+from .api_path import BBContentPath, content_key
 from .templates import create_body
 from .webdav import WebDavFile, ContentParser
 
@@ -12,7 +13,7 @@ from .webdav import WebDavFile, ContentParser
 class ContentBody(FStream):
     """Process the content body to find WebDav files."""
 
-    def __init__(self, content: BBCourseContent, _: None,
+    def __init__(self, content: BBCourseContent, api_path: BBContentPath,
                  job: DownloadJob) -> None:
         self.ignore = False
 
@@ -24,13 +25,14 @@ class ContentBody(FStream):
         parser = ContentParser(content.body, job.session.instance_url)
 
         self.body = create_body(title, parser.body, parser.text)
-        self.children = [WebDavFile(ln, job) for ln in parser.links]
+        parent = content_key(api_path)
+        self.children = [WebDavFile(ln, job, parent) for ln in parser.links]
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
+    def write(self, path: Path, plan: SyncPlan) -> None:
         if self.ignore:
             return
 
-        self.write_base(path / f"{path.stem}.html", executor, self.body)
+        plan.add_text(path / f"{path.stem}.html", self, self.body)
 
         for child in self.children:
-            child.write(path, executor)
+            child.write(path, plan)
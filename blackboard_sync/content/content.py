@@ -3,7 +3,6 @@ from pathlib import Path
 from json import JSONDecodeError
 from pydantic import ValidationError
 from requests import RequestException
-from concurrent.futures import ThreadPoolExecutor
 
 from blackboard.blackboard import (
     BBCourseContent,
@@ -12,9 +11,10 @@ from blackboard.blackboard import (
 )
 from blackboard.exceptions import BBBadRequestError, BBForbiddenError
 
+from ..plan import SyncPlan
 from . import folder, document, externallink, body, unhandled
 
-from .api_path import BBContentPath
+from .api_path import BBContentPath, content_key
 from .job import DownloadJob
 
 logger = logging.getLogger(__name__)
@@ -31,28 +31,47 @@ class Content:
         self.body = None
         self.handler = None
 
-        self.ignore = not Content.should_download(content, job)
+        key = content_key(api_path)
+        self.title = content.title_path_safe.replace('.', '_')
+        self.ignore = (job.cancelled or
+                       not Content.should_download(content, job, key))
+        # Available, but not changed since the last sync
+        self.unchanged = (self.ignore and not job.cancelled and
+                          bool(content.availability))
 
         if self.ignore:
             return
 
         Handler = Content.get_handler(content.contentHandler)
-        self.title = content.title_path_safe.replace('.', '_')
+
+        failed = False
 
         try:
             self.handler = Handler(content, api_path, job)
         except (ValidationError, JSONDecodeError,
                 BBBadRequestError, BBForbiddenError):
             logger.exception(f"Error fetching {content.title}")
+            failed = True
 
         try:
+            if not job.lists_bodies and job.has_changed(content.modified, key):
+                content = content.model_copy(update={
+                    'body': job.session.fetch_content_body(**api_path)
+                })
+
             if content.body:
-                self.body = body.ContentBody(content, None, job)
+                self.body = body.ContentBody(content, api_path, job)
         except (ValidationError, JSONDecodeError,
                 BBBadRequestError, BBForbiddenError, RequestException):
             logger.warning(f"Error fetching body of {content.title}")
+            failed = True
+
+        job.manifest.record_content(key, content.modified, failed)
+
+    def write(self, path: Path, plan: SyncPlan) -> None:
+        if self.unchanged:
+            plan.add_kept(path / self.title)
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
         if self.ignore:
             return
 
@@ -61,18 +80,19 @@ class Content:
 
         if self.handler is not None:
             if self.handler.create_dir:
-                path.mkdir(exist_ok=True, parents=True)
+                plan.add_directory(path)
 
-            self.handler.write(path, executor)
+            self.handler.write(path, plan)
 
         if self.body is not None:
-            path.mkdir(exist_ok=True, parents=True)
-            self.body.write(path, executor)
+            plan.add_directory(path)
+            self.body.write(path, plan)
 
     @staticmethod
-    def should_download(content: BBCourseContent, job: DownloadJob) -> bool:
+    def should_download(content: BBCourseContent, job: DownloadJob,
+                        key: str | None = None) -> bool:
         or_guards = [
-            job.has_changed(content.modified),
+            job.has_changed(content.modified, key),
             content.hasChildren,
         ]
 
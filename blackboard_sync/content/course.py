@@ -1,13 +1,23 @@
 import logging
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+from json import JSONDecodeError
+from pydantic import ValidationError
+from collections.abc import Iterable
 
-from blackboard.blackboard import BBCourse
+from blackboard.blackboard import BBCourse, BBCourseContent
+from blackboard.exceptions import (
+    BBBadRequestError,
+    BBForbiddenError,
+    BBStatusError,
+    BBUnauthorizedError
+)
 
+from ..plan import SyncPlan
 from .api_path import BBContentPath
 from .job import DownloadJob
 from .content import Content
+from .tree import ContentTree
 
 logger = logging.getLogger(__name__)
 
@@ -24,22 +34,63 @@ class Course:
         self.year = self.get_year(course.created)
         self.title = course.title or 'Untitled Course'
 
-        contents = job.session.fetch_contents(course_id=course.id)
+        tree = self.fetch_tree(job, course.id)
+
+        # Track the expansion of this course on its own
+        job = job.fork(tree)
+
+        contents: Iterable[BBCourseContent]
+
+        if tree is not None:
+            contents = tree.roots
+        else:
+            contents = job.session.iter_contents(course_id=course.id,
+                                                 fields=job.content_fields)
+
         self.children = []
 
         for content in contents:
+            if job.cancelled:
+                break
+
             api_path = BBContentPath(course_id=course.id,
                                      content_id=content.id)
             self.children.append(Content(content, api_path, job))
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
+        # Wait for every folder in the tree to be expanded
+        job.walker.join()
+
+    def write(self, path: Path, plan: SyncPlan) -> None:
+        """Add the files of the course to a sync plan."""
         if self.ignore:
             return
 
         path = path / self.year / self.title
 
         for child in self.children:
-            child.write(path, executor)
+            child.write(path, plan)
+
+    @staticmethod
+    def fetch_tree(job: DownloadJob, course_id: str) -> ContentTree | None:
+        """List the whole course at once, if the server supports it."""
+        if not job.session.recursive_listing:
+            return None
+
+        try:
+            contents = job.session.fetch_content_tree(
+                course_id=course_id, fields=job.content_fields
+            )
+        except BBUnauthorizedError:
+            raise
+        except (ValidationError, JSONDecodeError,
+                BBBadRequestError, BBForbiddenError, BBStatusError):
+            logger.info("Recursive listing not available, "
+                        "listing each folder instead")
+            # Not asked again for the other courses of the instance
+            job.session.recursive_listing = False
+            return None
+
+        return ContentTree(contents)
 
     @staticmethod
     def get_year(created: datetime | None) -> str:
@@ -1,10 +1,11 @@
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 from blackboard.blackboard import BBCourseContent
 from blackboard.filters import BBAttachmentFilter
 from bwfilters import BWFilter
 
+from ..plan import SyncPlan
+from ..session import ATTACHMENT_FIELDS
 from .attachment import Attachment
 from .api_path import BBContentPath
 from .job import DownloadJob
@@ -14,7 +15,9 @@ class Document:
     """Represents a file with attachments in the Blackboard API"""
     def __init__(self, content: BBCourseContent, api_path: BBContentPath,
                  job: DownloadJob):
-        attachments = job.session.fetch_file_attachments(**api_path)
+        attachments = job.session.fetch_file_attachments(
+            params={'fields': ATTACHMENT_FIELDS}, **api_path
+        )
         assert isinstance(attachments, list)
 
         att_filter = BBAttachmentFilter(mime_types=BWFilter(['video/*']))
@@ -27,15 +30,15 @@ class Document:
                 Attachment(attachment, api_path, job)
             )
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
+    def write(self, path: Path, plan: SyncPlan) -> None:
         # If only attachment, just use parent
         if len(self.attachments) > 1:
-            path.mkdir(exist_ok=True, parents=True)
+            plan.add_directory(path)
         else:
             path = path.parent
 
         for attachment in self.attachments:
-            attachment.write(path, executor)
+            attachment.write(path, plan)
 
     @property
     def create_dir(self) -> bool:
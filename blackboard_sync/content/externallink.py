@@ -1,9 +1,9 @@
 import platform
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 from blackboard.blackboard import BBCourseContent
 
+from ..plan import SyncPlan
 from .base import FStream
 from .job import DownloadJob
 
@@ -18,7 +18,7 @@ class ExternalLink(FStream):
         if content.contentHandler is not None:
             self.url = content.contentHandler.url
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
+    def write(self, path: Path, plan: SyncPlan) -> None:
         if self.url is None:
             return
 
@@ -31,7 +31,7 @@ class ExternalLink(FStream):
             body = self.create_unix_body(self.url)
             path = path.with_suffix(".desktop")
 
-        super().write_base(path, executor, body)
+        plan.add_text(path, self, body)
 
     def create_unix_body(self, url: str) -> str:
         return f"[Desktop Entry]\nIcon=text-html\nType=Link\nURL[$e]={url}"
@@ -1,32 +1,133 @@
+import logging
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterator
+from json import JSONDecodeError
+from pydantic import ValidationError
 
 from blackboard.blackboard import BBCourseContent
+from blackboard.exceptions import BBBadRequestError, BBForbiddenError
 
-from .api_path import BBContentPath
+from ..plan import SyncPlan
+from .api_path import BBContentPath, content_key
 from .job import DownloadJob
 from . import content
 
+logger = logging.getLogger(__name__)
+
 
 class Folder:
     """Content of type `x-bb-folder`."""
 
-    def __init__(self, _: BBCourseContent, api_path: BBContentPath,
+    def __init__(self, folder: BBCourseContent, api_path: BBContentPath,
                  job: DownloadJob) -> None:
-        self.children = []
-        course_id = api_path['course_id']
+        self.children: list[content.Content] = []
+        self._api_path = api_path
+        self._modified = folder.modified
+        self._has_children = folder.hasChildren
+        self._job = job
+
+        # Children are fetched later by the job's walker
+        job.walker.submit(self.expand)
+
+    def expand(self) -> None:
+        """Fetch the children of this folder.
+
+        Any subfolders found are queued for expansion in turn. If the
+        folder has not changed, the children listed last time are used.
+        Nothing more is listed once the job is cancelled.
+        """
+        if self._job.cancelled:
+            return
+
+        course_id = self._api_path['course_id']
+
+        # Children are built as each page of the listing arrives
+        try:
+            for child in self._list_children():
+                if self._job.cancelled:
+                    break
+
+                child_path = BBContentPath(content_id=child.id,
+                                           course_id=course_id)
+                self.children.append(content.Content(child, child_path,
+                                                     self._job))
+        except (ValidationError, JSONDecodeError,
+                BBBadRequestError, BBForbiddenError):
+            logger.exception("Error fetching folder children")
+
+    def _list_children(self) -> Iterator[BBCourseContent]:
+        tree = self._job.content_tree
+
+        # Server may not have listed the children after all
+        if tree is not None:
+            listed = tree.children(self._api_path['content_id'])
+
+            if listed or not self._has_children:
+                yield from listed
+                return
+
+        if self._modified is None:
+            yield from self._fetch_children()
+            return
+
+        key = content_key(self._api_path)
+        manifest = self._job.manifest
+        cached = manifest.cached_children(key, self._modified)
+
+        if cached is not None:
+            logger.debug(f"Folder {key} unchanged, using last listing")
+            yield from (BBCourseContent(**child) for child in cached)
+            return
+
+        known = self._known_children(key)
+        listing = []
+
+        for child in self._fetch_children():
+            listing.append(child.model_dump(mode='json', exclude_unset=True))
+
+            if known is not None and child.id not in known:
+                self._mark_new(child)
+            yield child
+
+        # Only a complete listing is worth keeping
+        if not manifest.record_children(key, self._modified, listing):
+            logger.debug(f"Folder {key} listed again, no changes")
+        elif known:
+            logger.debug(f"Folder {key} listed again, children changed")
+
+    def _known_children(self, key: str) -> set[str] | None:
+        """Children of the folder seen before, if it was listed before.
+
+        Every child of a folder new to this sync is new as well.
+        """
+        if self._job.is_new(key):
+            return set()
+
+        if (listing := self._job.manifest.last_listing(key)) is None:
+            return None
+
+        return {child.get('id') for child in listing.children}
+
+    def _mark_new(self, child: BBCourseContent) -> None:
+        child_key = content_key(BBContentPath(
+            content_id=child.id, course_id=self._api_path['course_id']
+        ))
+
+        # Children already downloaded are checked against the manifest
+        if self._job.manifest.get(child_key) is None:
+            self._job.mark_new(child_key)
 
-        for child in job.session.fetch_content_children(**api_path):
-            child_path = BBContentPath(content_id=child.id,
-                                       course_id=course_id)
-            self.children.append(content.Content(child, child_path, job))
+    def _fetch_children(self) -> Iterator[BBCourseContent]:
+        return self._job.session.iter_content_children(
+            fields=self._job.content_fields, **self._api_path
+        )
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
+    def write(self, path: Path, plan: SyncPlan) -> None:
         if self.children:
-            path.mkdir(exist_ok=True, parents=True)
+            plan.add_directory(path)
 
         for child in self.children:
-            child.write(path, executor)
+            child.write(path, plan)
 
     @property
     def create_dir(self) -> bool:
@@ -1,30 +1,143 @@
+import copy
 from datetime import datetime, timezone
+from concurrent.futures import Executor
 
-from blackboard.api_extended import BlackboardExtended
+from ..blobs import BlobStore
+from ..cancel import CancelToken
+from ..manifest import SyncManifest
+from ..progress import SyncProgress
+from ..retry import RetryPolicy
+from ..session import SyncSession, CONTENT_FIELDS
+from .tree import ContentTree
+from .walker import TreeWalker
 
 
 UNIX_EPOCH = datetime.fromtimestamp(0, tz=timezone.utc)
 
 
 class DownloadJob:
-    def __init__(self, session: BlackboardExtended,
-                 last_downloaded: datetime | None):
+    def __init__(self, session: SyncSession,
+                 last_downloaded: datetime | None,
+                 executor: Executor | None = None,
+                 manifest: SyncManifest | None = None,
+                 blobs: BlobStore | None = None,
+                 retry: RetryPolicy | None = None,
+                 cancel_token: CancelToken | None = None,
+                 progress: SyncProgress | None = None):
         self._last_downloaded = last_downloaded or UNIX_EPOCH
         self._session = session
-        self._cancelled = False
+        self._retry = retry or RetryPolicy()
+        self._manifest = manifest or SyncManifest()
+        self._blobs = blobs
+        self._webdav_probes: dict[str, bool] = {}
+        self._new_contents: set[str] = set()
+        self._executor = executor
+        self._walker = TreeWalker(executor)
+        self._content_tree: ContentTree | None = None
+        self._cancel_token = cancel_token or CancelToken()
+        self._progress = progress
+
+    def fork(self, content_tree: ContentTree | None = None
+             ) -> 'DownloadJob':
+        """Create a job sharing this job's state, with its own walker.
+
+        Used to track the traversal of each course independently.
+
+        :param content_tree: Contents of the course, if already listed
+        """
+        job = copy.copy(self)
+        job._walker = TreeWalker(self._executor)
+        job._content_tree = content_tree
+        return job
+
+    def has_changed(self, modified: datetime | None,
+                    key: str | None = None) -> bool:
+        # Items in the manifest are checked individually
+        if key is not None:
+            is_current = self._manifest.is_current(key, modified)
+
+            if is_current is not None:
+                return not is_current
+
+        if key in self._new_contents:
+            return True
 
-    def has_changed(self, modified: datetime | None) -> bool:
         if modified is not None:
             return (modified >= self._last_downloaded)
         return True
 
+    def mark_new(self, key: str) -> None:
+        """Treat a content first seen in a listing as changed.
+
+        Contents added to a folder while its last listing was used are
+        only found once it is listed again, by which time they may be
+        older than the last sync.
+        """
+        self._new_contents.add(key)
+
+    def is_new(self, key: str) -> bool:
+        return key in self._new_contents
+
     @property
-    def session(self) -> BlackboardExtended:
+    def session(self) -> SyncSession:
         return self._session
 
+    @property
+    def lists_bodies(self) -> bool:
+        """Whether content listings include the body of each content.
+
+        Bodies are only listed on the first sync, when every content is
+        new. Later on, they are only fetched for contents which changed.
+        """
+        return self._last_downloaded <= UNIX_EPOCH
+
+    @property
+    def content_fields(self) -> str:
+        """Fields requested for each content in a listing."""
+        if self.lists_bodies:
+            return f"{CONTENT_FIELDS},body"
+        return CONTENT_FIELDS
+
+    @property
+    def retry(self) -> RetryPolicy:
+        """Policy for downloads interrupted after the response began."""
+        return self._retry
+
+    @property
+    def webdav_probes(self) -> dict[str, bool]:
+        """Whether each WebDav URL probed passed the download checks."""
+        return self._webdav_probes
+
+    @property
+    def manifest(self) -> SyncManifest:
+        return self._manifest
+
+    @property
+    def blobs(self) -> BlobStore | None:
+        return self._blobs
+
+    @property
+    def content_tree(self) -> ContentTree | None:
+        """Every content of the course, if listed recursively."""
+        return self._content_tree
+
+    @property
+    def walker(self) -> TreeWalker:
+        return self._walker
+
+    @property
+    def progress(self) -> SyncProgress | None:
+        """Counters of the files and bytes written, if kept."""
+        return self._progress
+
+    @property
+    def cancel_token(self) -> CancelToken:
+        """Token checked by every step of the job, shared by its forks."""
+        return self._cancel_token
+
     @property
     def cancelled(self) -> bool:
-        return self._cancelled
+        return self._cancel_token.cancelled
 
     def cancel(self) -> None:
-        self._cancelled = True
+        self._cancel_token.cancel()
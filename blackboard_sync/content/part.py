@@ -0,0 +1,151 @@
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, NamedTuple
+from requests import Response
+
+from ..blobs import hash_file
+
+
+class PartFile(NamedTuple):
+    """A response body about to be written to a partial file."""
+    file_path: Path
+    resume: bool
+    digest: 'hashlib._Hash'
+    etag: str | None
+    last_modified: str | None
+
+
+class PartInfo(NamedTuple):
+    """Version of the file a partial file was started from."""
+    # Strong ETag or Last-Modified date, sent as `If-Range`
+    validator: str
+    # Full size of the file, if known
+    size: int | None
+
+
+class PartRequest(NamedTuple):
+    """Headers to request a file, resuming its partial file if any."""
+    offset: int
+    headers: dict[str, str]
+    size: int | None = None
+
+
+def resumes_at(stream: Response, offset: int,
+               size: int | None = None) -> bool:
+    """Check that a partial response starts at the given offset.
+
+    :param size: Full size of the file expected, if known
+    """
+    if stream.status_code != 206:
+        return False
+
+    # Content-Range: bytes <start>-<end>/<size>
+    content_range = stream.headers.get('Content-Range', '')
+    unit, _, byte_range = content_range.partition(' ')
+    start = byte_range.split('-', 1)[0]
+    total = byte_range.rpartition('/')[2]
+
+    if size is not None and total != str(size):
+        return False
+
+    return unit == 'bytes' and start == str(offset)
+
+
+def _part_info_path(part_path: Path) -> Path:
+    return part_path.with_name(part_path.name + '.json')
+
+
+def read_part_info(part_path: Path) -> PartInfo | None:
+    """Version of the file a partial file was started from, if known."""
+    try:
+        data = json.loads(_part_info_path(part_path).read_text())
+        return PartInfo(str(data['validator']), data.get('size'))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_part_info(part_path: Path, stream: Any) -> None:
+    """Record the version of a file about to be written to its part.
+
+    Weak ETags cannot be used with `If-Range`, so the Last-Modified
+    date is used instead. If neither is sent, nothing is recorded and
+    the partial file will not be resumed.
+    """
+    info_path = _part_info_path(part_path)
+    etag = stream.headers.get('ETag')
+
+    if etag and etag.startswith('W/'):
+        etag = None
+
+    validator = etag or stream.headers.get('Last-Modified')
+
+    if not validator:
+        info_path.unlink(missing_ok=True)
+        return
+
+    size = None
+
+    if stream.status_code == 206:
+        total = stream.headers.get('Content-Range', '').rpartition('/')[2]
+        size = int(total) if total.isdigit() else None
+    elif (length := stream.headers.get('Content-Length', '')).isdigit():
+        size = int(length)
+
+    info_path.write_text(json.dumps({'validator': validator, 'size': size}))
+
+
+def remove_part(part_path: Path) -> None:
+    """Delete a partial file, and what is known of its version."""
+    part_path.unlink(missing_ok=True)
+    _part_info_path(part_path).unlink(missing_ok=True)
+
+
+def part_request(part_path: Path) -> PartRequest | None:
+    """Headers to request the rest of a partial file, if resumable.
+
+    The rest is requested with `If-Range`, so that it is only sent if
+    the file is still the same version. Partial files of an unknown
+    version are removed instead.
+    """
+    offset = part_path.stat().st_size if part_path.exists() else 0
+
+    if not offset:
+        return None
+
+    if (info := read_part_info(part_path)) is not None:
+        return PartRequest(offset, {'Range': f"bytes={offset}-",
+                                    'If-Range': info.validator}, info.size)
+
+    # The partial file may be of another version of the file
+    remove_part(part_path)
+    return None
+
+
+def start_part(part_path: Path, stream: Response,
+               request: PartRequest) -> tuple[bool, 'hashlib._Hash'] | None:
+    """Prepare the partial file for the body of a response.
+
+    :return: Whether the body resumes the partial file, with the digest
+             of the bytes already in it. None if the response is a range
+             of another version of the file.
+    """
+    resume = (request.offset > 0 and
+              resumes_at(stream, request.offset, request.size))
+    digest = hashlib.sha256()
+
+    if resume:
+        hash_file(part_path, digest)
+    elif stream.status_code == 206:
+        return None
+    else:
+        write_part_info(part_path, stream)
+
+    return resume, digest
+
+
+def discard_part(stream: Response, part_path: Path) -> None:
+    """Remove a partial file after an error, unless resumable."""
+    if (stream.headers.get('Accept-Ranges') != 'bytes' or
+            read_part_info(part_path) is None):
+        remove_part(part_path)
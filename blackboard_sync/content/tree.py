@@ -0,0 +1,44 @@
+import logging
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+
+from blackboard.blackboard import BBCourseContent
+
+logger = logging.getLogger(__name__)
+
+
+class ContentTree:
+    """Contents of a course listed at once, grouped by their parent.
+
+    Top-level contents share the parent of the course root, which is not
+    listed itself. Contents under any other parent missing from the
+    listing cannot be placed, and are left out of the tree.
+    """
+
+    def __init__(self, contents: Iterable[BBCourseContent]) -> None:
+        contents = list(contents)
+        ids = {content.id for content in contents}
+
+        self.roots: list[BBCourseContent] = []
+        self._children: dict[str, list[BBCourseContent]] = defaultdict(list)
+
+        unlisted = Counter(content.parentId for content in contents
+                           if content.parentId not in ids)
+        root_id = unlisted.most_common(1)[0][0] if unlisted else None
+        orphans = 0
+
+        for content in contents:
+            if content.parentId in ids:
+                self._children[content.parentId].append(content)
+            elif content.parentId == root_id or content.parentId is None:
+                self.roots.append(content)
+            else:
+                orphans += 1
+
+        if orphans:
+            logger.warning(f"Left out {orphans} contents whose parent "
+                           "was not listed")
+
+    def children(self, content_id: str) -> list[BBCourseContent]:
+        """Children listed for a content, in the order they were listed."""
+        return self._children.get(content_id, [])
@@ -1,9 +1,9 @@
 import logging
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 
 from blackboard.blackboard import BBCourseContent
 
+from ..plan import SyncPlan
 from .job import DownloadJob
 
 logger = logging.getLogger(__name__)
@@ -16,7 +16,7 @@ class Unhandled:
                  job: DownloadJob) -> None:
         logger.info(f"{content.title} not supported")
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
+    def write(self, path: Path, plan: SyncPlan) -> None:
         pass
 
     @property
@@ -0,0 +1,64 @@
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Executor
+
+
+class TreeWalker:
+    """Work queue used to expand a content tree breadth-first.
+
+    Each task expands a single node and may queue more tasks for its
+    children, so the traversal never recurses. With an executor,
+    sibling nodes are expanded concurrently, otherwise the queue is
+    drained on the thread calling `join`.
+    """
+
+    def __init__(self, executor: Executor | None = None) -> None:
+        self._executor = executor
+        self._queue: deque[Callable[[], None]] = deque()
+        self._pending = 0
+        self._errors: list[BaseException] = []
+        self._cond = threading.Condition()
+
+    def submit(self, task: Callable[[], None]) -> None:
+        """Queue a task to expand a node of the tree."""
+        if self._executor is None:
+            self._queue.append(task)
+            return
+
+        with self._cond:
+            self._pending += 1
+
+        self._executor.submit(self._run, task)
+
+    def _run(self, task: Callable[[], None]) -> None:
+        try:
+            task()
+        except BaseException as e:
+            with self._cond:
+                self._errors.append(e)
+        finally:
+            with self._cond:
+                self._pending -= 1
+                if self._pending == 0:
+                    self._cond.notify_all()
+
+    def join(self) -> None:
+        """Wait until the whole tree has been expanded.
+
+        :raises: The first error raised by any of the tasks.
+        """
+        while self._queue:
+            self._run_inline(self._queue.popleft())
+
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending == 0)
+
+        if self._errors:
+            raise self._errors[0]
+
+    def _run_inline(self, task: Callable[[], None]) -> None:
+        try:
+            task()
+        except BaseException as e:
+            self._errors.append(e)
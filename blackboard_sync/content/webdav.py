@@ -27,8 +27,8 @@ from bs4 import BeautifulSoup
 from urllib.parse import unquote
 from typing import List, NamedTuple
 from pathvalidate import sanitize_filename
-from concurrent.futures import ThreadPoolExecutor
 
+from ..plan import SyncPlan
 from .base import BStream
 from .job import DownloadJob
 
@@ -83,13 +83,46 @@ class ContentParser:
         return self._text
 
 
+def probe_webdav(job: DownloadJob, link: str) -> bool:
+    """Check if a WebDav file should be downloaded, without its body.
+
+    Sends a HEAD request, or a ranged GET for a single byte if HEAD is
+    not allowed. Results are cached by the job for the whole sync.
+    """
+    base_url = job.session.instance_url
+
+    if not link.startswith(base_url):
+        return False
+
+    if link in job.webdav_probes:
+        return job.webdav_probes[link]
+
+    response = job.session.probe_webdav(webdav_url=link)
+
+    if response.status_code in (405, 501):
+        response = job.session.download_webdav(webdav_url=link,
+                                               headers={'Range': 'bytes=0-0'})
+
+    with response:
+        valid = validate_webdav_response(response, link, base_url)
+
+    job.webdav_probes[link] = valid
+    return valid
+
+
 def validate_webdav_response(response: Response,
                              link: str, base_url: str) -> bool:
-    if response.status_code == 200:
+    if response.status_code in (200, 206):
         h = response.headers
         content_type = h.get('Content-Type', '')
         content_len = int(h.get('Content-Length', 0))
 
+        # Partial responses give the full size in Content-Range,
+        # or * if unknown
+        if 'Content-Range' in h:
+            total = h['Content-Range'].rpartition('/')[2]
+            content_len = int(total) if total.isdigit() else 0
+
         # TODO: feature: select mime types
         len_limit = 1024 * 1024 * 20  # 20 MB
 
@@ -105,19 +138,44 @@ def validate_webdav_response(response: Response,
 
 class WebDavFile(BStream):
     """A Blackboard WebDav file which can be downloaded directly"""
-    def __init__(self, link: Link, job: DownloadJob) -> None:
+
+    CONDITIONAL_REQUESTS = True
+
+    def __init__(self, link: Link, job: DownloadJob,
+                 parent: str | None = None) -> None:
+        key = f"{parent}/{link.href}" if parent else None
+        super().__init__(job, key, parent)
+
         self.title = sanitize_filename(link.text, replacement_text="_")
-        self.stream = job.session.download_webdav(webdav_url=link.href)
-        content_type = self.stream.headers.get('Content-Type', 'text/plain')
-        self.extension = mimetypes.guess_extension(content_type)
-        self.valid = validate_webdav_response(self.stream, link.href,
-                                              job.session.instance_url)
+        self.href = link.href
+        self._job = job
+        self._session = job.session
+
+    def should_open(self) -> bool:
+        # Copy held already passed the checks
+        if self._validators():
+            return True
+        return probe_webdav(self._job, self.href)
+
+    def open_stream(self, headers: dict[str, str]) -> Response:
+        return self._session.download_webdav(webdav_url=self.href,
+                                             headers=headers)
+
+    def stream_url(self) -> str:
+        return self.href
+
+    def get_path(self, path: Path, stream: Response) -> Path | None:
+        if not validate_webdav_response(stream, self.href,
+                                        self._session.instance_url):
+            return None
+
+        content_type = stream.headers.get('Content-Type', 'text/plain')
+        extension = mimetypes.guess_extension(content_type)
 
-    def write(self, path: Path, executor: ThreadPoolExecutor) -> None:
-        if self.valid:
-            path = Path(path, self.title)
+        if extension:
+            path = path.with_suffix(extension)
 
-            if self.extension:
-                path = path.with_suffix(self.extension)
+        return path
 
-            super().write_base(path, executor, self.stream)
+    def write(self, path: Path, plan: SyncPlan) -> None:
+        plan.add_stream(Path(path, self.title), self)
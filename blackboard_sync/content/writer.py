@@ -0,0 +1,123 @@
+import os
+import hashlib
+import threading
+from typing import BinaryIO
+from requests import Response
+
+from ..cancel import CancelToken
+from ..progress import SyncProgress
+
+
+class StreamWriter:
+    """Copy response bodies to files through a reusable buffer.
+
+    The body is read in blocks of `BUFFER_SIZE` into a buffer allocated
+    once, instead of a new chunk for each read. urllib3 still reads
+    each block into bytes of its own and copies them into the buffer,
+    waiting until the block is full or the body ends. Each worker
+    thread should use its own writer, see `get_writer`.
+    """
+
+    BUFFER_SIZE = 256 * 1024
+
+    # Bytes written between each request to drop the page cache
+    FADVISE_INTERVAL = 8 * 1024 * 1024
+
+    def __init__(self) -> None:
+        self._buffer = bytearray(self.BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
+
+    def write(self, stream: Response, f: BinaryIO,
+              drop_cache: bool = False,
+              digest: 'hashlib._Hash | None' = None,
+              cancel: CancelToken | None = None,
+              progress: SyncProgress | None = None) -> int:
+        """Write the body of a streamed response to a binary file.
+
+        :param stream: A response obtained with `stream=True`
+        :param f: File opened for writing in binary mode
+        :param drop_cache: Evict written pages from the page cache
+        :param digest: Hash updated with every byte written
+        :param cancel: Token checked between each read
+        :param progress: Counts the bytes as they are written
+        :raises SyncCancelled: If cancelled before the body was written
+        :return: Number of bytes written
+        """
+        raw = getattr(stream, 'raw', None)
+
+        if raw is None or not hasattr(raw, 'readinto'):
+            return self._write_chunks(stream, f, digest, cancel, progress)
+
+        # Let urllib3 decompress the body as it is read
+        if stream.headers.get('Content-Encoding', 'identity') != 'identity':
+            raw.decode_content = True
+
+        drop_cache = drop_cache and hasattr(os, 'posix_fadvise')
+        written = dropped = 0
+
+        while n := raw.readinto(self._view):
+            if cancel is not None:
+                cancel.check()
+
+            f.write(self._view[:n])
+            written += n
+
+            if digest is not None:
+                digest.update(self._view[:n])
+
+            if progress is not None:
+                progress.add_bytes(n)
+
+            if drop_cache and written - dropped >= self.FADVISE_INTERVAL:
+                self._drop_cache(f, dropped, written)
+                dropped = written
+
+        # An interrupted read may look like the end of the body
+        if cancel is not None:
+            cancel.check()
+
+        if drop_cache:
+            self._drop_cache(f, dropped, written)
+
+        return written
+
+    def _write_chunks(self, stream: Response, f: BinaryIO,
+                      digest: 'hashlib._Hash | None',
+                      cancel: CancelToken | None,
+                      progress: SyncProgress | None) -> int:
+        """Fallback for responses which cannot be read into a buffer."""
+        written = 0
+
+        for chunk in stream.iter_content(chunk_size=self.BUFFER_SIZE):
+            if cancel is not None:
+                cancel.check()
+
+            f.write(chunk)
+            written += len(chunk)
+
+            if digest is not None:
+                digest.update(chunk)
+
+            if progress is not None:
+                progress.add_bytes(len(chunk))
+
+        if cancel is not None:
+            cancel.check()
+
+        return written
+
+    @staticmethod
+    def _drop_cache(f: BinaryIO, start: int, end: int) -> None:
+        f.flush()
+        os.posix_fadvise(f.fileno(), start, end - start,
+                         os.POSIX_FADV_DONTNEED)
+
+
+_local = threading.local()
+
+
+def get_writer() -> StreamWriter:
+    """Get the writer which belongs to the current thread."""
+    if not hasattr(_local, 'writer'):
+        _local.writer = StreamWriter()
+    return _local.writer
@@ -23,13 +23,23 @@ mass download all user content from Blackboard
 # MA  02110-1301, USA.
 
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from blackboard.api_extended import BlackboardExtended
+from blackboard.blackboard import BBCourse
+from blackboard.exceptions import BBUnauthorizedError
 from blackboard.filters import BBMembershipFilter, BWFilter
 
 from .executor import SyncExecutor
+from .blobs import BlobStore
+from .cancel import CancelToken, SyncCancelled
+from .manifest import SyncManifest
+from .metrics import SyncMetrics
+from .plan import SyncPlan
+from .progress import SyncProgress, ProgressSnapshot
+from .session import SyncSession
 from .content.job import DownloadJob
 from .content.course import Course
 
@@ -37,15 +47,34 @@ from .content.course import Course
 logger = logging.getLogger(__name__)
 
 
+class CourseDownloadError(Exception):
+    """One or more courses could not be downloaded."""
+
+    def __init__(self, errors: dict[str, BaseException]) -> None:
+        super().__init__(f"{len(errors)} course(s) failed to download")
+        self.errors = errors
+
+
 class BlackboardDownload:
     """Blackboard download job."""
 
     _last_downloaded = datetime.fromtimestamp(0, tz=timezone.utc)
 
-    def __init__(self, sess: BlackboardExtended,
+    # Courses discovered in parallel when no limit is given
+    DEFAULT_COURSE_WORKERS = 4
+    # Folders expanded in parallel across all courses
+    DEFAULT_FOLDER_WORKERS = 8
+
+    # Seconds between each progress report in the log
+    PROGRESS_INTERVAL = 30
+
+    def __init__(self, sess: SyncSession,
                  download_location: Path,
                  last_downloaded: datetime | None = None,
-                 min_year: int | None = None):
+                 min_year: int | None = None,
+                 course_workers: int | None = None,
+                 dry_run: bool = False,
+                 metrics: SyncMetrics | None = None):
         """BlackboardDownload constructor
 
         Download all files in blackboard recursively to download_location,
@@ -53,18 +82,28 @@ class BlackboardDownload:
 
         Keyword arguments:
 
-        :param BlackboardExtended sess: UCLan BB user session
+        :param SyncSession sess: UCLan BB user session
         :param (str / Path) download_location: Where files will be stored
         :param str last_downloaded: Files modified before are ignored
         :param min_year: Courses created before are ignored
+        :param course_workers: Max number of courses fetched concurrently
+        :param dry_run: Only build the plan of the sync, see `plan`
+        :param metrics: Where to add the files and bytes downloaded
         """
 
         self._sess = sess
         self._user_id = sess.user_id
         self._download_location = download_location
         self._min_year = min_year
-        self.executor = SyncExecutor()
-        self.cancelled = False
+        self._course_workers = course_workers or self.DEFAULT_COURSE_WORKERS
+        self._folder_workers = self.DEFAULT_FOLDER_WORKERS
+        self._course_errors: dict[str, BaseException] = {}
+        self._progress = SyncProgress()
+        self.executor = SyncExecutor(progress=self._progress)
+        self._cancel_token = CancelToken()
+        self._dry_run = dry_run
+        self._plan = SyncPlan()
+        self._metrics = metrics
 
         if last_downloaded is not None:
             self._last_downloaded = last_downloaded
@@ -89,30 +128,200 @@ class BlackboardDownload:
 
         course_filter = BBMembershipFilter(min_year=self._min_year,
                                            data_sources=BWFilter())
+
+        # Requests stop as soon as the download is cancelled
+        self._sess.transport.cancel_token = self._cancel_token
+
+        try:
+            return self._download(course_filter, start_time)
+        except SyncCancelled:
+            logger.info("Download cancelled")
+            return None
+        finally:
+            self._sess.transport.cancel_token = None
+            self._record_metrics()
+
+    def _download(self, course_filter: BBMembershipFilter,
+                  start_time: datetime) -> datetime | None:
         courses = self._sess.ex_fetch_courses(user_id=self.user_id,
                                               result_filter=course_filter)
 
-        job = DownloadJob(session=self._sess,
-                          last_downloaded=self._last_downloaded)
+        # Every worker may hold a connection at once
+        workers = (self._course_workers + self._folder_workers +
+                   self.executor.workers)
+        self._sess.transport.configure(pool_size=workers)
+        self._sess.warm_up(self._course_workers)
 
-        for course in courses:
-            if self.cancelled:
-                break
+        folder_pool = ThreadPoolExecutor(max_workers=self._folder_workers,
+                                         thread_name_prefix="folder")
 
-            logger.info(f"Fetching user course <{course.id}>")
+        data_directory = self.download_location / SyncManifest.data_directory
+        manifest = SyncManifest.for_location(self.download_location)
+        blobs = BlobStore(data_directory)
 
-            Course(course, job).write(self.download_location, self.executor)
+        if self._dry_run:
+            # Nothing is recorded for a sync which does not happen
+            real_manifest, manifest = manifest, manifest.snapshot()
+            real_manifest.close()
 
-        logger.info("Shutting down download workers")
+        job = DownloadJob(session=self._sess,
+                          last_downloaded=self._last_downloaded,
+                          executor=folder_pool,
+                          manifest=manifest,
+                          blobs=blobs,
+                          retry=self._sess.transport.retry,
+                          cancel_token=self._cancel_token,
+                          progress=self._progress)
+
+        reported = threading.Event()
+        threading.Thread(target=self._report_progress, args=(reported,),
+                         name="progress", daemon=True).start()
+
+        try:
+            with folder_pool, ThreadPoolExecutor(
+                    max_workers=self._course_workers,
+                    thread_name_prefix="course") as pool:
+                futures = {pool.submit(self._download_course, course, job):
+                           course for course in courses}
+
+                for future in as_completed(futures):
+                    course = futures[future]
+                    exc = future.exception()
+
+                    # Courses cut short by a cancellation are not errors
+                    if exc is not None and not self.cancelled:
+                        logger.error(f"Error fetching course <{course.id}>",
+                                     exc_info=exc)
+                        self._course_errors[course.id] = exc
+
+            self._report_plan(SyncPlan.path_for(data_directory))
+        finally:
+            reported.set()
+            logger.info("Shutting down download workers")
+
+            self.executor.shutdown(wait=True, cancel_futures=self.cancelled)
+            # Downloads record themselves in the manifest until they end
+            manifest.close()
+
+        logger.info(f"Progress: {self.progress}")
+
+        stats = self._sess.transport.stats
+        logger.info(f"{stats.requests} requests over {stats.connections} "
+                    f"connections, peak {stats.peak_in_flight} in flight, "
+                    f"{stats.saturated} waited for a free connection "
+                    f"(pool size {stats.pool_size}, "
+                    f"final limit {stats.limit})")
+
+        if self.cancelled or self._dry_run:
+            return None
 
-        self.executor.shutdown(wait=True, cancel_futures=self.cancelled)
         self.executor.raise_exceptions()
+        self._raise_course_errors()
 
-        return start_time if not self.cancelled else None
+        # Files of an incomplete sync may still be needed by the next
+        logger.info(f"Removed {blobs.prune()} unused files from store")
+
+        return start_time
+
+    def _download_course(self, course: BBCourse, job: DownloadJob) -> None:
+        """Discover the contents of a course and schedule their download."""
+        if self.cancelled:
+            return
+
+        logger.info(f"Fetching user course <{course.id}>")
+
+        course_content = Course(course, job)
+
+        # Contents found before the cancellation are not downloaded
+        if self.cancelled:
+            return
+
+        plan = SyncPlan()
+        course_content.write(self.download_location, plan)
+        self._plan.extend(plan)
+
+        self._progress.discover(len(plan.files), plan.total_bytes)
+
+        # Downloads start while other courses are still discovered
+        if not self._dry_run:
+            plan.execute(self.executor, self._cancel_token)
+
+    def _record_metrics(self) -> None:
+        if self._metrics is None:
+            return
+
+        progress = self.progress
+        written = progress.completed - progress.skipped
+
+        self._metrics.files.inc(written, result='written')
+        self._metrics.files.inc(progress.skipped, result='skipped')
+        self._metrics.files.inc(progress.failed, result='failed')
+        self._metrics.downloaded_bytes.inc(progress.bytes_done)
+        self._metrics.errors.inc(len(self._course_errors), stage='course')
+
+    def _report_progress(self, done: threading.Event) -> None:
+        """Log the progress of the download every so often."""
+        while not done.wait(self.PROGRESS_INTERVAL):
+            logger.info(f"Progress: {self.progress}")
+
+    def _report_plan(self, plan_path: Path) -> None:
+        """Log the size of the plan, and how it changed since last sync."""
+        plan = self._plan
+        logger.info(f"Planned {len(plan.files)} files, "
+                    f"{plan.total_bytes} bytes known, "
+                    f"{plan.unknown_sizes} of unknown size")
+
+        if plan_path.exists():
+            previous = SyncPlan.load(plan_path)
+            diff = plan.diff(previous)
+            # Unchanged contents are saved as the last sync left them
+            plan = plan.carry_over(previous)
+            logger.info(f"Since last sync: {len(diff.added)} added, "
+                        f"{len(diff.removed)} removed, "
+                        f"{len(diff.changed)} changed")
+
+        # Only plans which were carried out are compared with
+        if not self.cancelled and not self._dry_run:
+            plan.dump(plan_path)
+
+    def _raise_course_errors(self) -> None:
+        """Re-raise errors from individual courses once all are done."""
+        if not self._course_errors:
+            return
+
+        for exc in self._course_errors.values():
+            # An expired session must reach the caller as is
+            if isinstance(exc, BBUnauthorizedError):
+                raise exc
+
+        raise CourseDownloadError(self._course_errors)
 
     def cancel(self) -> None:
-        """Cancel the download job."""
-        self.cancelled = True
+        """Cancel the download job.
+
+        Courses and folders are no longer expanded, and downloads in
+        progress are interrupted. `download` returns shortly after.
+        """
+        self._cancel_token.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_token.cancelled
+
+    @property
+    def progress(self) -> ProgressSnapshot:
+        """Files and bytes done so far, and how fast."""
+        return self._progress.snapshot()
+
+    @property
+    def plan(self) -> SyncPlan:
+        """Every directory and file planned by the last download."""
+        return self._plan
+
+    @property
+    def course_errors(self) -> dict[str, BaseException]:
+        """Errors raised while fetching each course, by course id."""
+        return dict(self._course_errors)
 
     @property
     def download_location(self) -> Path:
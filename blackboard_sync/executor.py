@@ -15,30 +15,91 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
 # MA  02110-1301, USA.
 
+import os
+import threading
 from typing import Any
 from collections.abc import Callable
 
 from concurrent.futures import ThreadPoolExecutor, Future
-from concurrent.futures import wait as wait_futures
+
+from .progress import SyncProgress
 
 
 class SyncExecutor(ThreadPoolExecutor):
-    def __init__(self, max_workers: int | None = None) -> None:
-        super().__init__(max_workers)
-        self.futures: list[Future[Any]] = []
+    """Thread pool with a bounded number of unfinished tasks.
+
+    `submit` blocks while the pool is full, so producers cannot get far
+    ahead of the workers. Futures are dropped as soon as they succeed,
+    only failures are kept to be reported at the end of the sync.
+    Each task finished is counted as a file done by `progress`.
+    """
+
+    # Tasks allowed to wait in the queue for each worker
+    QUEUE_FACTOR = 4
+
+    # Same as the default of ThreadPoolExecutor
+    DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+    def __init__(self, max_workers: int | None = None,
+                 max_pending: int | None = None,
+                 progress: SyncProgress | None = None) -> None:
+        self._workers = max_workers or self.DEFAULT_WORKERS
+        super().__init__(self._workers)
+        self._progress = progress
+        self._max_pending = (max_pending or
+                             self._workers * self.QUEUE_FACTOR)
+        self._pending = 0
+        self._cond = threading.Condition()
+        self.failures: list[Future[Any]] = []
 
     def submit(self, fn: Callable[..., Any], /,
                *args: Any, **kwargs: Any) -> Future[Any]:
-        future = super().submit(fn, *args, **kwargs)
-        self.futures.append(future)
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending < self._max_pending)
+            self._pending += 1
+
+        try:
+            future = super().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._task_done(None)
+            raise
+
+        future.add_done_callback(self._task_done)
         return future
 
+    def _task_done(self, future: Future[Any] | None) -> None:
+        with self._cond:
+            self._pending -= 1
+
+            if future is not None and not future.cancelled():
+                failed = future.exception() is not None
+
+                if failed:
+                    self.failures.append(future)
+
+                if self._progress is not None:
+                    self._progress.complete(failed)
+
+            self._cond.notify_all()
+
     def shutdown(self, wait: bool = True, *,
                  cancel_futures: bool = False) -> None:
         super().shutdown(wait, cancel_futures=cancel_futures)
 
     def raise_exceptions(self, timeout: int | None = None) -> None:
-        done, not_done = wait_futures(self.futures, timeout)
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending == 0, timeout)
+            failures = list(self.failures)
 
-        for future in done:
+        for future in failures:
             future.result()
+
+    @property
+    def workers(self) -> int:
+        """Number of threads the pool may run at once."""
+        return self._workers
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks submitted that have not finished yet."""
+        return self._pending
@@ -0,0 +1,212 @@
+"""
+BlackboardSync adaptive concurrency limiter
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from requests import Response
+
+from .cancel import CancelToken
+from .retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after(response: Response) -> float | None:
+    """Seconds a response asks the client to wait, if any."""
+    value = response.headers.get('Retry-After')
+
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class AdaptiveLimiter:
+    """Limit requests in flight, adapting to how the server copes.
+
+    The limit grows by about one request per round trip while latency
+    stays close to the best seen (additive increase), and is cut down
+    at once when the server answers 429 or 503, asks to wait with
+    `Retry-After` or fails to answer (multiplicative decrease). Once
+    cut, the limit is not cut again until the requests sent with the
+    old limit have come back. A pause asked with `Retry-After` lasts
+    `max_pause` at most.
+    """
+
+    INITIAL_LIMIT = 8
+    MIN_LIMIT = 1
+    MAX_LIMIT = 64
+
+    # Limit kept after a decrease
+    BACKOFF = 0.5
+    # Latency over the baseline which stops the limit from growing
+    TOLERANCE = 2.0
+    # Weight of each new sample in the latency baseline
+    SMOOTHING = 0.1
+
+    OVERLOAD_STATUS = (429, 503)
+
+    def __init__(self, initial: float | None = None,
+                 max_limit: float | None = None,
+                 max_pause: float | None = None) -> None:
+        """
+        :param initial: Limit before any request comes back
+        :param max_limit: Highest limit ever allowed
+        :param max_pause: Longest pause after a `Retry-After`, by default
+                          the longest delay between retries
+        """
+        self._max_limit = max_limit or self.MAX_LIMIT
+        self._max_pause = (RetryPolicy.MAX_DELAY if max_pause is None
+                           else max_pause)
+        self._limit = min(initial or self.INITIAL_LIMIT, self._max_limit)
+        self._in_flight = 0
+        self._baseline: float | None = None
+        self._decreased_at = 0.0
+        self._paused_until = 0.0
+        self._decreases = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, cancel: CancelToken | None = None) -> float:
+        """Wait for a free slot, then take it.
+
+        :param cancel: Token which stops the wait once cancelled
+        :return: Time at which the slot was taken, for `release`
+        :raises SyncCancelled: If cancelled before a slot is free
+        """
+        if cancel is None:
+            return self._acquire(None)
+
+        with cancel.interrupting(self._wake):
+            return self._acquire(cancel)
+
+    def _acquire(self, cancel: CancelToken | None) -> float:
+        with self._cond:
+            while True:
+                if cancel is not None:
+                    cancel.check()
+
+                pause = self._paused_until - time.monotonic()
+
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self._in_flight >= int(self._limit):
+                    self._cond.wait()
+                else:
+                    break
+
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self, started: float, status: int | None = None,
+                wait: float | None = None) -> None:
+        """Free a slot and adapt the limit to the outcome of the request.
+
+        :param started: Value returned by `acquire`
+        :param status: Status code of the response, None if it failed
+        :param wait: Seconds the server asked to wait before retrying
+        """
+        now = time.monotonic()
+        latency = now - started
+
+        with self._cond:
+            self._in_flight -= 1
+
+            if status is None or status in self.OVERLOAD_STATUS or wait:
+                self._decrease(started, now, wait)
+            else:
+                self._increase(latency)
+
+            self._cond.notify_all()
+
+    def cancel(self) -> None:
+        """Free a slot without adapting the limit."""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _increase(self, latency: float) -> None:
+        if self._baseline is None:
+            self._baseline = latency
+
+        if latency <= self._baseline * self.TOLERANCE:
+            self._limit = min(self._limit + 1 / self._limit,
+                              self._max_limit)
+
+        # Baseline follows latency down at once, and up slowly
+        self._baseline = min(latency, self._baseline +
+                             self.SMOOTHING * (latency - self._baseline))
+
+    def _decrease(self, started: float, now: float,
+                  wait: float | None) -> None:
+        if wait:
+            wait = min(wait, self._max_pause)
+            self._paused_until = max(self._paused_until, now + wait)
+
+        # Sent before the last decrease, already accounted for
+        if started < self._decreased_at:
+            return
+
+        self._limit = max(self._limit * self.BACKOFF, self.MIN_LIMIT)
+        self._decreased_at = now
+        self._decreases += 1
+        logger.info(f"Server overloaded, limit cut to {int(self._limit)}")
+
+    @property
+    def limit(self) -> int:
+        """Number of requests currently allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def max_limit(self) -> float:
+        return self._max_limit
+
+    @max_limit.setter
+    def max_limit(self, max_limit: float) -> None:
+        with self._cond:
+            self._max_limit = max_limit
+            self._limit = min(self._limit, max_limit)
+            self._cond.notify_all()
+
+    @property
+    def decreases(self) -> int:
+        """Times the limit has been cut down."""
+        return self._decreases
@@ -0,0 +1,332 @@
+"""
+BlackboardSync download manifest
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+from enum import Enum
+from pathlib import Path
+from typing import Any, NamedTuple
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ItemStatus(str, Enum):
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+
+
+class ManifestEntry(NamedTuple):
+    key: str
+    parent: str | None
+    modified: str | None
+    size: int | None
+    etag: str | None
+    path: str | None
+    status: ItemStatus
+    digest: str | None = None
+    last_modified: str | None = None
+
+
+class Listing(NamedTuple):
+    """Children listed for a folder."""
+    digest: str
+    children: list[dict[str, Any]]
+
+
+class SyncManifest:
+    """Record of every item downloaded to a download location.
+
+    Items are keyed by their API path, e.g. `course/content` for course
+    contents and `course/content/attachment` for the files they own.
+    Contents are only considered unchanged if their modified time is
+    the same as last time and all of their files are still in place.
+
+    The children listed for each folder are kept as well, so that a
+    folder whose modified time has not changed need not be listed again.
+    Listings are trusted for `LISTING_MAX_AGE` at most.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS items (
+            key TEXT PRIMARY KEY,
+            parent TEXT,
+            modified TEXT,
+            size INTEGER,
+            etag TEXT,
+            path TEXT,
+            status TEXT NOT NULL,
+            digest TEXT,
+            last_modified TEXT
+        );
+        CREATE INDEX IF NOT EXISTS items_parent ON items (parent);
+        CREATE INDEX IF NOT EXISTS items_etag ON items (etag);
+        CREATE TABLE IF NOT EXISTS listings (
+            key TEXT PRIMARY KEY,
+            modified TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            children TEXT NOT NULL,
+            listed_at TEXT NOT NULL
+        );
+    """
+
+    _columns = ('key', 'parent', 'modified', 'size', 'etag', 'path',
+                'status', 'digest', 'last_modified')
+
+    # Hidden directory in the download location for sync metadata
+    data_directory = ".bbsync"
+    _filename = "manifest.db"
+
+    # Folders are listed again after this long, changed or not
+    LISTING_MAX_AGE = timedelta(days=1)
+
+    def __init__(self, path: Path | None = None) -> None:
+        """Open a manifest database, in memory if no path is given."""
+        if path is not None:
+            path.parent.mkdir(exist_ok=True, parents=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path or ':memory:',
+                                     check_same_thread=False)
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self._schema)
+
+    @classmethod
+    def for_location(cls, download_location: Path) -> 'SyncManifest':
+        """Open the manifest kept in a download location."""
+        return cls(download_location / cls.data_directory / cls._filename)
+
+    def get(self, key: str) -> ManifestEntry | None:
+        entries = self._select("key = ?", key)
+        return entries[0] if entries else None
+
+    def children(self, parent: str) -> list[ManifestEntry]:
+        return self._select("parent = ?", parent)
+
+    def find_etag(self, key: str, etag: str) -> ManifestEntry | None:
+        """Find the last download of a file, if served with the ETag.
+
+        ETags are only compared for the same file, as different files
+        may well be served with the same one.
+        """
+        entries = self._select("key = ? AND etag = ? AND digest NOT NULL",
+                               key, etag)
+        return entries[0] if entries else None
+
+    def is_current(self, key: str, modified: datetime | None) -> bool | None:
+        """Check if a content is unchanged since it was last downloaded.
+
+        :return: None if the content has never been recorded.
+        """
+        entry = self.get(key)
+
+        if entry is None:
+            return None
+
+        if entry.status != ItemStatus.COMPLETE:
+            return False
+
+        if entry.modified != self._timestamp(modified):
+            return False
+
+        return all(self.file_in_place(f) for f in self.children(key))
+
+    def record_content(self, key: str, modified: datetime | None,
+                       failed: bool = False) -> None:
+        """Record a content after its children have been scheduled."""
+        status = ItemStatus.FAILED if failed else ItemStatus.COMPLETE
+        self._upsert(key, None, modified=self._timestamp(modified),
+                     status=status)
+
+    def start_file(self, key: str, parent: str | None) -> None:
+        """Record a file which is about to be downloaded.
+
+        Details of any previous download are kept, as they may be used
+        to validate the local copy.
+        """
+        self._set_status(key, parent, ItemStatus.PENDING)
+
+    def complete_file(self, key: str, parent: str | None, path: Path,
+                      etag: str | None = None,
+                      digest: str | None = None,
+                      last_modified: str | None = None) -> None:
+        """Record a file which has been written to disk."""
+        self._upsert(key, parent, size=path.stat().st_size, etag=etag,
+                     path=str(path), status=ItemStatus.COMPLETE,
+                     digest=digest, last_modified=last_modified)
+
+    def keep_file(self, key: str, parent: str | None) -> None:
+        """Record a file whose local copy is still up to date."""
+        self._set_status(key, parent, ItemStatus.COMPLETE)
+
+    def skip_file(self, key: str, parent: str | None) -> None:
+        """Record a file which was deliberately not downloaded."""
+        self._set_status(key, parent, ItemStatus.SKIPPED)
+
+    def fail_file(self, key: str, parent: str | None) -> None:
+        """Record a file which could not be downloaded."""
+        self._set_status(key, parent, ItemStatus.FAILED)
+
+    def cached_children(self, key: str, modified: datetime
+                        ) -> list[dict[str, Any]] | None:
+        """Children listed for a folder, if it has not changed since.
+
+        :return: None if the folder must be listed again.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT modified, children, listed_at FROM listings "
+                "WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None or row[0] != self._timestamp(modified):
+            return None
+
+        listed_at = datetime.fromisoformat(row[2])
+
+        if datetime.now(timezone.utc) - listed_at > self.LISTING_MAX_AGE:
+            return None
+
+        return json.loads(row[1])
+
+    def last_listing(self, key: str) -> Listing | None:
+        """Children listed for a folder last time, however long ago."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest, children FROM listings WHERE key = ?", (key,)
+            ).fetchone()
+
+        return Listing(row[0], json.loads(row[1])) if row else None
+
+    def record_children(self, key: str, modified: datetime,
+                        children: list[dict[str, Any]]) -> bool:
+        """Record the children listed for a folder.
+
+        :return: True if they differ from the last listing recorded.
+        """
+        encoded = json.dumps(children, sort_keys=True)
+        digest = hashlib.sha256(encoded.encode()).hexdigest()
+        now = datetime.now(timezone.utc).isoformat()
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT digest FROM listings WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO listings "
+                "(key, modified, digest, children, listed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self._timestamp(modified), digest, encoded, now)
+            )
+
+        return row is None or row[0] != digest
+
+    def snapshot(self) -> 'SyncManifest':
+        """Copy the manifest into memory, to be changed without effect."""
+        manifest = SyncManifest()
+
+        with self._lock, manifest._lock:
+            self._conn.backup(manifest._conn)
+        return manifest
+
+    def clear(self) -> None:
+        """Forget every item, so everything is downloaded again."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM items")
+            self._conn.execute("DELETE FROM listings")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _select(self, where: str, *params: str) -> list[ManifestEntry]:
+        columns = ', '.join(self._columns)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM items WHERE {where}", params
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def _upsert(self, key: str, parent: str | None, *,
+                status: ItemStatus, modified: str | None = None,
+                size: int | None = None, etag: str | None = None,
+                path: str | None = None, digest: str | None = None,
+                last_modified: str | None = None) -> None:
+        columns = ', '.join(self._columns)
+        values = ', '.join('?' * len(self._columns))
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO items ({columns}) VALUES ({values})",
+                (key, parent, modified, size, etag, path, status.value,
+                 digest, last_modified)
+            )
+
+    def _set_status(self, key: str, parent: str | None,
+                    status: ItemStatus) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO items (key, parent, status) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "parent = excluded.parent, status = excluded.status",
+                (key, parent, status.value)
+            )
+
+    @staticmethod
+    def file_in_place(entry: ManifestEntry) -> bool:
+        """Check that a file is complete and as it was recorded."""
+        if entry.status == ItemStatus.SKIPPED:
+            return True
+
+        if entry.status != ItemStatus.COMPLETE:
+            return False
+
+        return SyncManifest.file_unchanged(entry)
+
+    @staticmethod
+    def file_unchanged(entry: ManifestEntry) -> bool:
+        """Check that the last copy written of a file is still there."""
+        if entry.path is None:
+            return False
+
+        try:
+            return Path(entry.path).stat().st_size == entry.size
+        except OSError:
+            return False
+
+    @staticmethod
+    def _timestamp(modified: datetime | None) -> str | None:
+        return modified.isoformat() if modified is not None else None
+
+    @staticmethod
+    def _entry(row: tuple) -> ManifestEntry:
+        *fields, status, digest, last_modified = row
+        return ManifestEntry(*fields, status=ItemStatus(status),
+                             digest=digest, last_modified=last_modified)
@@ -0,0 +1,302 @@
+"""
+BlackboardSync metrics in the Prometheus text format
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import os
+import re
+import math
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Path of every call to the public REST API
+API_PATH = re.compile(r'^/learn/api/public/v\d+/')
+
+# Seconds until the response headers of a request arrive
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds taken by a whole sync
+SYNC_BUCKETS = (10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def endpoint_label(url: str | bytes) -> str:
+    """Name of the endpoint a URL belongs to, without any ids.
+
+    `/learn/api/public/v1/courses/_12_1/contents` becomes
+    `courses/{id}/contents`. Other paths are named after their first
+    segment, e.g. `bbcswebdav` for WebDav files.
+    """
+    if isinstance(url, bytes):
+        url = url.decode()
+
+    path = urlsplit(url).path
+    api_path = API_PATH.sub('', path)
+
+    if api_path == path:
+        return path.strip('/').split('/', 1)[0] or '/'
+
+    segments = api_path.strip('/').split('/')
+    return '/'.join('{id}' if any(c.isdigit() or c == ':' for c in s)
+                    or s == 'me' else s for s in segments)
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for metrics, rendered in the text format."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str,
+                 labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.kind}"]
+
+    def _label_text(self, key: tuple[str, ...],
+                    extra: dict[str, str] | None = None) -> str:
+        pairs = [*zip(self.labels, key), *(extra or {}).items()]
+
+        if not pairs:
+            return ''
+        text = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return f'{{{text}}}'
+
+
+class Counter(Metric):
+    """Value which only goes up, one for each set of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str,
+                 labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+
+        with self._lock:
+            values = sorted(self._values.items())
+
+        for key, value in values:
+            lines.append(f"{self.name}{self._label_text(key)} "
+                         f"{_format(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value which may go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values, counted in cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 buckets: tuple[float, ...]) -> None:
+        super().__init__(name, documentation)
+        self.buckets = (*sorted(buckets), math.inf)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    @property
+    def count(self) -> int:
+        return self._counts[-1]
+
+    def render(self) -> list[str]:
+        lines = super().render()
+
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        for bound, count in zip(self.buckets, counts):
+            labels = self._label_text((), {'le': _format(bound)})
+            lines.append(f"{self.name}_bucket{labels} {count}")
+
+        lines.append(f"{self.name}_sum {_format(total)}")
+        lines.append(f"{self.name}_count {counts[-1]}")
+        return lines
+
+
+class SyncMetrics:
+    """Counters and histograms kept across every sync of the app.
+
+    The transport counts each request as it is sent, the rest is added
+    once each sync is over. Metrics can be written for the textfile
+    collector of the Prometheus node exporter, or served over HTTP.
+    """
+
+    def __init__(self) -> None:
+        self.api_requests = Counter(
+            'bbsync_api_requests_total',
+            "Requests sent, by endpoint and status code.",
+            ('endpoint', 'status')
+        )
+        self.request_duration = Histogram(
+            'bbsync_request_duration_seconds',
+            "Time until the response headers of a request arrived.",
+            LATENCY_BUCKETS
+        )
+        self.request_limit = Gauge(
+            'bbsync_request_limit',
+            "Requests allowed in flight by the adaptive limiter."
+        )
+        self.retries = Counter(
+            'bbsync_retries_total',
+            "Requests sent again after a transient failure."
+        )
+        self.downloaded_bytes = Counter(
+            'bbsync_downloaded_bytes_total',
+            "Bytes of files downloaded."
+        )
+        self.files = Counter(
+            'bbsync_files_total',
+            "Files handled, by result: written, skipped or failed.",
+            ('result',)
+        )
+        self.errors = Counter(
+            'bbsync_errors_total',
+            "Errors, by stage: request, course or sync.",
+            ('stage',)
+        )
+        self.syncs = Counter(
+            'bbsync_syncs_total',
+            "Syncs run, by result: complete, failed or cancelled.",
+            ('result',)
+        )
+        self.sync_duration = Histogram(
+            'bbsync_sync_duration_seconds',
+            "Time taken by each sync.",
+            SYNC_BUCKETS
+        )
+        self.last_sync = Gauge(
+            'bbsync_last_sync_timestamp_seconds',
+            "Time at which the last sync finished."
+        )
+
+    def observe_request(self, url: str | bytes, status: int | None,
+                        duration: float) -> None:
+        """Count a request sent, with a status of None if it failed."""
+        self.api_requests.inc(endpoint=endpoint_label(url),
+                              status=str(status or 'error'))
+        self.request_duration.observe(duration)
+
+        if status is None:
+            self.errors.inc(stage='request')
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        metrics = [self.api_requests, self.request_duration,
+                   self.request_limit, self.retries, self.downloaded_bytes,
+                   self.files, self.errors, self.syncs, self.sync_duration,
+                   self.last_sync]
+
+        return '\n'.join(line for metric in metrics
+                         for line in metric.render()) + '\n'
+
+    def write_textfile(self, path: Path) -> None:
+        """Write the metrics to a file, replacing it at once.
+
+        The textfile collector may read the file at any time, so it is
+        never seen half written.
+        """
+        path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.render(), encoding='utf-8')
+        tmp_path.replace(path)
+
+    def serve(self, port: int, host: str = '127.0.0.1'
+              ) -> ThreadingHTTPServer:
+        """Serve the metrics on `/metrics` from a background thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics",
+                         daemon=True).start()
+
+        logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return server
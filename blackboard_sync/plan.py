@@ -0,0 +1,236 @@
+"""
+BlackboardSync sync plan
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import json
+import logging
+import threading
+from enum import Enum
+from pathlib import Path
+from typing import NamedTuple, TYPE_CHECKING
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from .cancel import CancelToken
+
+if TYPE_CHECKING:
+    from .content.base import BStream, FStream
+
+logger = logging.getLogger(__name__)
+
+
+class PlanAction(str, Enum):
+    DIRECTORY = 'directory'
+    DOWNLOAD = 'download'
+    WRITE = 'write'
+    # Left as an earlier sync wrote it
+    KEEP = 'keep'
+
+
+class PlanItem(NamedTuple):
+    action: PlanAction
+    path: str
+    url: str | None = None
+    # Bytes expected, if known
+    size: int | None = None
+    key: str | None = None
+
+
+class PlanDiff(NamedTuple):
+    added: list[PlanItem]
+    removed: list[PlanItem]
+    changed: list[PlanItem]
+
+
+class SyncPlan:
+    """Every directory and file a sync is about to write.
+
+    Content trees are discovered first and written into a plan, which
+    can be inspected, saved and compared with the plan of another sync
+    before anything is written to disk. Executing the plan creates the
+    directories, then schedules the writes on an executor.
+
+    Contents skipped because they have not changed are kept in the
+    plan, as whatever the previous plan held under their path. So the
+    plan of an incremental sync still describes the whole tree.
+
+    Plans read back with `load` describe the work, but cannot run it.
+    """
+
+    _filename = "plan.json"
+
+    def __init__(self, items: Iterable[PlanItem] = ()) -> None:
+        self._items = list(items)
+        self._tasks: dict[int, Callable[[ThreadPoolExecutor], None]] = {}
+        self._lock = threading.Lock()
+
+    def add_directory(self, path: Path) -> None:
+        self._add(PlanItem(PlanAction.DIRECTORY, str(path)), None)
+
+    def add_kept(self, path: Path) -> None:
+        """Plan to leave what an earlier sync wrote to the path."""
+        self._add(PlanItem(PlanAction.KEEP, str(path)), None)
+
+    def add_stream(self, path: Path, stream: 'BStream') -> None:
+        """Plan the download of a byte stream to the given path."""
+        item = PlanItem(PlanAction.DOWNLOAD, str(path), stream.stream_url(),
+                        stream.expected_size(), stream.key)
+
+        def _task(executor: ThreadPoolExecutor) -> None:
+            stream.write_base(path, executor)
+
+        self._add(item, _task)
+
+    def add_text(self, path: Path, stream: 'FStream', body: str) -> None:
+        """Plan the write of a text file to the given path."""
+        item = PlanItem(PlanAction.WRITE, str(path),
+                        size=len(body.encode('utf-8')))
+
+        def _task(executor: ThreadPoolExecutor) -> None:
+            stream.write_base(path, executor, body)
+
+        self._add(item, _task)
+
+    def _add(self, item: PlanItem,
+             task: Callable[[ThreadPoolExecutor], None] | None) -> None:
+        with self._lock:
+            if task is not None:
+                self._tasks[len(self._items)] = task
+            self._items.append(item)
+
+    def extend(self, plan: 'SyncPlan') -> None:
+        """Add the items of another plan, without their tasks."""
+        with self._lock:
+            self._items.extend(plan.items)
+
+    def execute(self, executor: ThreadPoolExecutor,
+                cancel: CancelToken | None = None) -> None:
+        """Create the directories and schedule every write.
+
+        Text files go first, as they are written at once, then the
+        largest downloads, so that long downloads do not start last.
+        Downloads of unknown size follow.
+        """
+        with self._lock:
+            items = list(enumerate(self._items))
+            tasks = dict(self._tasks)
+
+        for _, item in items:
+            if item.action == PlanAction.DIRECTORY:
+                Path(item.path).mkdir(exist_ok=True, parents=True)
+
+        for i, item in sorted(items, key=self._order):
+            if cancel is not None and cancel.cancelled:
+                return
+
+            if (task := tasks.get(i)) is not None:
+                task(executor)
+
+    @staticmethod
+    def _order(indexed: tuple[int, PlanItem]) -> tuple[int, int]:
+        _, item = indexed
+
+        if item.action != PlanAction.DOWNLOAD:
+            return (0, 0)
+        if item.size is None:
+            return (2, 0)
+        return (1, -item.size)
+
+    def carry_over(self, previous: 'SyncPlan') -> 'SyncPlan':
+        """Plan with the items kept replaced by those of an earlier plan.
+
+        Kept paths the earlier plan knows nothing about stay as they are.
+        """
+        items = self.items
+        kept = {i.path for i in items if i.action == PlanAction.KEEP}
+        plan = SyncPlan(i for i in items if i.action != PlanAction.KEEP)
+        planned = {(i.action, i.path) for i in plan.items}
+        found_in_previous = set()
+
+        for item in previous.items:
+            path = Path(item.path)
+            found = next((str(p) for p in (path, *path.parents)
+                          if str(p) in kept), None)
+
+            if found is None:
+                continue
+
+            if (item.action, item.path) not in planned:
+                plan._items.append(item)
+            found_in_previous.add(found)
+
+        plan._items.extend(PlanItem(PlanAction.KEEP, path)
+                           for path in sorted(kept - found_in_previous))
+        return plan
+
+    def diff(self, previous: 'SyncPlan') -> PlanDiff:
+        """Compare with an earlier plan, item by item of the same path.
+
+        Items kept from the earlier plan are left unchanged.
+        """
+        before = {(i.action, i.path): i for i in previous.items
+                  if i.action != PlanAction.KEEP}
+        after = {(i.action, i.path): i
+                 for i in self.carry_over(previous).items
+                 if i.action != PlanAction.KEEP}
+
+        added = [i for k, i in after.items() if k not in before]
+        removed = [i for k, i in before.items() if k not in after]
+        changed = [i for k, i in after.items()
+                   if k in before and before[k] != i]
+
+        return PlanDiff(added, removed, changed)
+
+    def dump(self, path: Path) -> None:
+        items = [item._asdict() for item in self.items]
+        path.write_text(json.dumps({'items': items}, indent=1),
+                        encoding='utf-8')
+
+    @classmethod
+    def load(cls, path: Path) -> 'SyncPlan':
+        data = json.loads(path.read_text(encoding='utf-8'))
+        return cls(PlanItem(**{**item, 'action': PlanAction(item['action'])})
+                   for item in data['items'])
+
+    @classmethod
+    def path_for(cls, data_directory: Path) -> Path:
+        """Where the plan of the last sync is kept."""
+        return data_directory / cls._filename
+
+    @property
+    def items(self) -> list[PlanItem]:
+        with self._lock:
+            return list(self._items)
+
+    @property
+    def files(self) -> list[PlanItem]:
+        """Items which write a file."""
+        return [i for i in self.items
+                if i.action in (PlanAction.DOWNLOAD, PlanAction.WRITE)]
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes expected to be written, counting known sizes only."""
+        return sum(i.size or 0 for i in self.files)
+
+    @property
+    def unknown_sizes(self) -> int:
+        """Files whose size will only be known once downloaded."""
+        return sum(1 for i in self.files if i.size is None)
@@ -0,0 +1,269 @@
+"""
+BlackboardSync profiling of sync runs
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import os
+import sys
+import pstats
+import logging
+import cProfile
+import threading
+from pathlib import Path
+from types import FrameType, TracebackType
+from collections import Counter
+from collections.abc import Collection
+
+logger = logging.getLogger(__name__)
+
+# Overrides the profiler set in the configuration
+PROFILE_ENV = 'BBSYNC_PROFILE'
+
+# Every function call is recorded, and stacks are sampled too
+CPROFILE = 'cprofile'
+# Stacks are only sampled, which slows the sync down far less
+SAMPLE = 'sample'
+
+
+def profiler_mode(configured: str | None) -> str | None:
+    """Profiler to run syncs under, if any.
+
+    :param configured: Profiler set in the configuration
+    """
+    mode = os.environ.get(PROFILE_ENV) or configured
+
+    if not mode or mode.lower() in ('0', 'off', 'false', 'none'):
+        return None
+
+    mode = mode.lower()
+
+    if mode in ('1', 'on', 'true'):
+        return CPROFILE
+
+    if mode not in (CPROFILE, SAMPLE):
+        logger.warning(f"Unknown profiler {mode}, not profiling")
+        return None
+
+    return mode
+
+
+class StackSampler:
+    """Count the stacks of running threads at a fixed interval.
+
+    Only the thread which starts the sampler and the threads started
+    after it are sampled, so idle threads of the app are left out.
+    Stacks are kept in the collapsed format read by flame graph tools,
+    one line per stack, frames from the root separated by semicolons.
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        """
+        :param interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._ignored: set[int] = set()
+
+    def start(self) -> None:
+        current = threading.get_ident()
+        self._ignored = {t for t in sys._current_frames() if t != current}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self._ignored:
+                    continue
+
+                thread = names.get(ident, str(ident))
+                self.stacks[self._collapse(thread, frame)] += 1
+
+    @staticmethod
+    def _collapse(thread: str, frame: FrameType | None) -> str:
+        frames = []
+
+        while frame is not None:
+            code = frame.f_code
+            filename = Path(code.co_filename).name
+            frames.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+
+        # Thread names tell apart course, download and loop workers
+        thread = thread.rsplit('_', 1)[0]
+        return ';'.join([thread, *reversed(frames)])
+
+    def dump(self, path: Path) -> None:
+        lines = (f"{stack} {count}\n"
+                 for stack, count in self.stacks.most_common())
+        path.write_text(''.join(lines), encoding='utf-8')
+
+
+class ThreadProfiler:
+    """cProfile for the calling thread and every thread it starts.
+
+    Before Python 3.12, a profile only records the thread it is enabled
+    in, so each new thread enables its own, and they are merged at the
+    end. Later versions record every thread with a single profile.
+
+    A profile can only be disabled by its own thread, so threads which
+    outlive the profiler would be left profiling. Those of pools which
+    are kept between syncs must be ignored.
+    """
+
+    PER_THREAD = sys.version_info < (3, 12)
+
+    def __init__(self, ignore_threads: Collection[str] = ()) -> None:
+        """
+        :param ignore_threads: Prefixes of the names of threads which
+                               are not profiled, before Python 3.12
+        """
+        self._ignore_threads = tuple(ignore_threads)
+        self._profiles: list[cProfile.Profile] = []
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._active = False
+
+    def start(self) -> None:
+        self._active = True
+
+        if self.PER_THREAD:
+            threading.setprofile(self._start_thread)
+        self._enable()
+
+    def stop(self) -> None:
+        self._active = False
+
+        if self.PER_THREAD:
+            threading.setprofile(None)
+
+        self._profiles[0].disable()
+
+        with self._lock:
+            running = [t.name for t in self._threads[1:] if t.is_alive()]
+
+        if running:
+            logger.warning(f"Threads {', '.join(running)} outlived "
+                           "the profiler and are still being profiled")
+
+    def _start_thread(self, frame: FrameType, event: str,
+                      arg: object) -> None:
+        # Called for every event of the new thread until replaced
+        sys.setprofile(None)
+
+        if not self._active:
+            return
+
+        if threading.current_thread().name.startswith(self._ignore_threads):
+            return
+
+        self._enable()
+
+    def _enable(self) -> None:
+        profile = cProfile.Profile()
+
+        with self._lock:
+            self._profiles.append(profile)
+            self._threads.append(threading.current_thread())
+
+        profile.enable()
+
+    def stats(self) -> pstats.Stats:
+        with self._lock:
+            profiles = list(self._profiles)
+
+        return pstats.Stats(*profiles)
+
+
+class SyncProfiler:
+    """Profile a sync, then write the results for later comparison.
+
+    In `cprofile` mode a `.pstats` file is written, which can be read
+    with `pstats` or snakeviz, along with the stacks sampled. In
+    `sample` mode only the stacks are written, as a `.collapsed` file
+    for flame graph tools.
+    """
+
+    def __init__(self, mode: str,
+                 ignore_threads: Collection[str] = ()) -> None:
+        """
+        :param mode: Either `cprofile` or `sample`
+        :param ignore_threads: Threads which outlive the sync, see
+                               `ThreadProfiler`
+        """
+        if mode not in (CPROFILE, SAMPLE):
+            raise ValueError(f"Unknown profiler {mode}")
+
+        self.mode = mode
+        self.sampler = StackSampler()
+        self.profiler = None
+
+        if mode == CPROFILE:
+            self.profiler = ThreadProfiler(ignore_threads)
+
+    def __enter__(self) -> 'SyncProfiler':
+        self.sampler.start()
+
+        if self.profiler is not None:
+            self.profiler.start()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None,
+                 exc: BaseException | None,
+                 tb: TracebackType | None) -> None:
+        if self.profiler is not None:
+            self.profiler.stop()
+
+        self.sampler.stop()
+
+    def dump(self, directory: Path, name: str) -> list[Path]:
+        """Write the results to the directory.
+
+        :param name: Name of the files, without extension
+        :return: Files written
+        """
+        directory.mkdir(exist_ok=True, parents=True)
+        written = []
+
+        if self.profiler is not None:
+            stats_path = directory / f"{name}.pstats"
+            self.profiler.stats().dump_stats(stats_path)
+            written.append(stats_path)
+
+        stacks_path = directory / f"{name}.collapsed"
+        self.sampler.dump(stacks_path)
+        written.append(stacks_path)
+
+        logger.info(f"Profile written to {directory / name}")
+        return written
@@ -0,0 +1,156 @@
+"""
+BlackboardSync progress reporting
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import math
+import time
+import threading
+from typing import NamedTuple
+
+
+class ProgressSnapshot(NamedTuple):
+    # Files planned so far, more are found while courses are discovered
+    discovered: int
+    completed: int
+    failed: int
+    # Files completed without being written, as they were current
+    skipped: int
+    bytes_done: int
+    # Bytes expected for the files planned, counting known sizes only
+    bytes_expected: int
+    # Bytes per second, averaged over the last few seconds
+    throughput: float
+    # Files per second, averaged likewise
+    file_rate: float
+    elapsed: float
+
+    @property
+    def remaining(self) -> int:
+        return max(self.discovered - self.completed - self.failed, 0)
+
+    @property
+    def eta(self) -> float | None:
+        """Seconds until every file discovered so far is done."""
+        if not self.remaining:
+            return 0.0
+        if self.file_rate <= 0:
+            return None
+        return self.remaining / self.file_rate
+
+    def __str__(self) -> str:
+        eta = self.eta
+        left = f"{eta:.0f}s left" if eta is not None else "time left unknown"
+        return (f"{self.completed + self.failed}/{self.discovered} files, "
+                f"{self.bytes_done / 2**20:.1f} MiB at "
+                f"{self.throughput / 2**20:.2f} MiB/s, {left}")
+
+
+class SyncProgress:
+    """Counters of the work done by a sync, cheap to update and poll.
+
+    Workers only add to the counters under a lock, rates are worked
+    out when a snapshot is taken. Rates are moving averages which give
+    less weight to older samples as time passes, whatever the polling
+    interval, so the tray and the logs can poll at their own pace.
+
+    The ETA is based on files rather than bytes, as the size of most
+    files is only known once their download starts.
+    """
+
+    # Seconds after which a sample weighs a third as much
+    AVERAGE_WINDOW = 10.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._discovered = 0
+        self._completed = 0
+        self._failed = 0
+        self._skipped = 0
+        self._bytes_done = 0
+        self._bytes_expected = 0
+
+        self._sampled_at = self._started
+        self._sampled_bytes = 0
+        self._sampled_files = 0
+        self._throughput: float | None = None
+        self._file_rate: float | None = None
+
+    def discover(self, files: int, size: int = 0) -> None:
+        """Count files planned, and the bytes they are expected to take."""
+        with self._lock:
+            self._discovered += files
+            self._bytes_expected += size
+
+    def complete(self, failed: bool = False) -> None:
+        """Count a file done with, whether written, skipped or failed."""
+        with self._lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    def skip(self) -> None:
+        """Count a file which needed no writing, before it completes."""
+        with self._lock:
+            self._skipped += 1
+
+    def add_bytes(self, size: int) -> None:
+        with self._lock:
+            self._bytes_done += size
+
+    def snapshot(self) -> ProgressSnapshot:
+        now = time.monotonic()
+
+        with self._lock:
+            self._sample(now)
+            return ProgressSnapshot(self._discovered, self._completed,
+                                    self._failed, self._skipped,
+                                    self._bytes_done,
+                                    self._bytes_expected,
+                                    self._throughput or 0.0,
+                                    self._file_rate or 0.0,
+                                    now - self._started)
+
+    def _sample(self, now: float) -> None:
+        elapsed = now - self._sampled_at
+
+        if elapsed <= 0:
+            return
+
+        files = self._completed + self._failed
+        throughput = (self._bytes_done - self._sampled_bytes) / elapsed
+        file_rate = (files - self._sampled_files) / elapsed
+
+        weight = 1 - math.exp(-elapsed / self.AVERAGE_WINDOW)
+        self._throughput = self._average(self._throughput, throughput,
+                                         weight)
+        self._file_rate = self._average(self._file_rate, file_rate, weight)
+
+        self._sampled_at = now
+        self._sampled_bytes = self._bytes_done
+        self._sampled_files = files
+
+    @staticmethod
+    def _average(average: float | None, sample: float,
+                 weight: float) -> float:
+        if average is None:
+            return sample
+        return average + weight * (sample - average)
@@ -21,6 +21,7 @@ from PyQt6.QtGui import QAction
 from PyQt6.QtCore import pyqtSignal, QObject
 from PyQt6.QtWidgets import QMenu, QSystemTrayIcon
 
+from ..progress import ProgressSnapshot
 from .assets import logo, get_theme_icon, AppIcon
 from .utils import time_ago
 from .notification import Event, TrayMessages
@@ -82,11 +83,28 @@ class SyncTrayMenu(QMenu):
         human_ago = time_ago(last_synced) if last_synced else "Never"
         self._status.setText(self.tr("Last synced: ") + human_ago)
 
-    def set_currently_syncing(self, syncing: bool) -> None:
+    def set_currently_syncing(self, syncing: bool,
+                              progress: ProgressSnapshot | None = None
+                              ) -> None:
         self.refresh.setEnabled(not syncing)
 
-        if syncing:
+        if not syncing:
+            return
+
+        if progress is None or not progress.discovered:
             self._status.setText(self.tr("Downloading now..."))
+            return
+
+        done = progress.completed + progress.failed
+        status = self.tr("Downloading {done} of {total} files").format(
+            done=done, total=progress.discovered
+        )
+
+        if (eta := progress.eta) is not None:
+            minutes = max(round(eta / 60), 1)
+            status += self.tr(", about {n} min left").format(n=minutes)
+
+        self._status.setText(status)
 
 
 class SyncTrayIcon(QSystemTrayIcon):
@@ -133,8 +151,10 @@ class SyncTrayIcon(QSystemTrayIcon):
     def set_last_synced(self, value: datetime | None) -> None:
         self._menu.set_last_synced(value)
 
-    def set_currently_syncing(self, syncing: bool) -> None:
-        self._menu.set_currently_syncing(syncing)
+    def set_currently_syncing(self, syncing: bool,
+                              progress: ProgressSnapshot | None = None
+                              ) -> None:
+        self._menu.set_currently_syncing(syncing, progress)
 
     def notify(self, evt: Event) -> None:
         title, msg, icon, duration = self._messages.get_msg(evt)
@@ -25,6 +25,7 @@ from PyQt6.QtCore import QLocale, QTranslator, QLibraryInfo
 from PyQt6.QtCore import Qt, pyqtSlot, pyqtSignal, QObject
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QWidget
 
+from ..progress import ProgressSnapshot
 from . import SetupWizard, LoginWebView, SettingsWindow, SyncTrayIcon
 from .notification import Event
 from .dialogs import Dialogs
@@ -189,10 +190,11 @@ class UIManager(QObject):
         self.show(self.config_window)
 
     def open_menu(self, last_sync: datetime,
-                  is_logged: bool, is_syncing: bool) -> None:
+                  is_logged: bool, is_syncing: bool,
+                  progress: ProgressSnapshot | None = None) -> None:
         self.tray.set_last_synced(last_sync)
         self.tray.set_logged_in(is_logged)
-        self.tray.set_currently_syncing(is_syncing)
+        self.tray.set_currently_syncing(is_syncing, progress)
 
     def open_tray(self, first_time: bool, is_logged: bool) -> None:
         if first_time:
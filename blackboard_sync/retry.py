@@ -0,0 +1,97 @@
+"""
+BlackboardSync retry policy
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import random
+import logging
+
+import requests
+import urllib3
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the same request may well succeed
+TRANSIENT_ERRORS: tuple[type[BaseException], ...] = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    urllib3.exceptions.HTTPError,
+    ConnectionError,
+    TimeoutError
+)
+
+
+class RetryPolicy:
+    """When and after how long to repeat a request that failed.
+
+    Only idempotent requests are repeated, after a transient error or a
+    status which suggests the server may answer next time. Delays grow
+    exponentially with full jitter, and are never shorter than what the
+    server asked for with `Retry-After`.
+    """
+
+    DEFAULT_ATTEMPTS = 3
+    BASE_DELAY = 0.5
+    MAX_DELAY = 30.0
+
+    IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS',
+                                    'PUT', 'DELETE', 'TRACE'})
+    RETRY_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+    def __init__(self, attempts: int | None = None,
+                 base_delay: float | None = None,
+                 max_delay: float | None = None) -> None:
+        """
+        :param attempts: Times a request is sent at most, including the first
+        :param base_delay: Seconds before the first retry, at most
+        :param max_delay: Longest delay between two attempts
+        """
+        self.attempts = max(attempts or self.DEFAULT_ATTEMPTS, 1)
+        self.base_delay = (self.BASE_DELAY if base_delay is None
+                           else base_delay)
+        self.max_delay = self.MAX_DELAY if max_delay is None else max_delay
+
+    def is_idempotent(self, method: str | bytes) -> bool:
+        if isinstance(method, bytes):
+            method = method.decode()
+        return method.upper() in self.IDEMPOTENT_METHODS
+
+    def should_retry(self, status: int) -> bool:
+        return status in self.RETRY_STATUS
+
+    def delay(self, failures: int, wait: float | None = None
+              ) -> float | None:
+        """Seconds to wait before the next attempt.
+
+        :param failures: Attempts which have failed so far
+        :param wait: Seconds the server asked to wait
+        :return: None if no attempts are left
+        """
+        if failures >= self.attempts:
+            return None
+
+        backoff = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+        delay = random.uniform(0, backoff)
+
+        if wait is not None:
+            delay = max(delay, min(wait, self.max_delay))
+
+        logger.info(f"Retrying in {delay:.1f}s, attempt {failures + 1}")
+        return delay
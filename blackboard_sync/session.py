@@ -0,0 +1,246 @@
+"""
+BlackboardSync API session
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import logging
+from typing import Any
+from urllib.parse import urljoin
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.cookies import RequestsCookieJar
+from tiny_api_client import api_client_method, get
+
+from blackboard.blackboard import BBCourse, BBCourseContent
+from blackboard.filters import BBMembershipFilter
+from blackboard.exceptions import BBForbiddenError, status_handler
+from blackboard.api_extended import BlackboardExtended
+
+from .transport import SyncTransport
+
+logger = logging.getLogger(__name__)
+
+head = api_client_method('HEAD')
+
+# Fields of each object read by the sync, nothing else is requested
+MEMBERSHIP_FIELDS = "courseId,dataSourceId,created,availability"
+COURSE_FIELDS = "id,name,created,availability"
+CONTENT_FIELDS = ("id,title,modified,hasChildren,parentId,"
+                  "availability,contentHandler")
+ATTACHMENT_FIELDS = "id,fileName,mimeType"
+
+# Session through which tiny_api_client sends the requests of a client,
+# it creates a plain one on first use only if the client has none
+CLIENT_SESSION_ATTRIBUTE = '__client_session'
+
+
+class SyncSession(BlackboardExtended):
+    """A `BlackboardExtended` session with the requests needed to sync.
+
+    Content listings are exposed as iterators, which yield each page of
+    results while the next one is being fetched.
+
+    Every request of the API client is sent through the session's
+    transport. Close the session once it is no longer needed.
+    """
+
+    # Threads fetching the next page of listings being read
+    PREFETCH_WORKERS = 4
+    PREFETCH_THREAD_NAME = "page"
+
+    def __init__(self, url: str, *, cookies: RequestsCookieJar,
+                 transport: SyncTransport | None = None) -> None:
+        """
+        :param url: The URL of the blackboard API to use
+        :param cookies: A `RequestsCookieJar` authorised to use the API
+        :param transport: Session used to send all requests
+        """
+        super().__init__(url, cookies=cookies)
+        self._transport = transport or SyncTransport()
+        # Whether the instance can list a course at once, until it fails
+        self.recursive_listing = True
+        self._prefetch = ThreadPoolExecutor(
+            self.PREFETCH_WORKERS, thread_name_prefix=self.PREFETCH_THREAD_NAME
+        )
+
+        setattr(self, CLIENT_SESSION_ATTRIBUTE, self._transport)
+
+    def close(self) -> None:
+        """Stop fetching pages ahead, and close every connection."""
+        self._prefetch.shutdown(wait=False, cancel_futures=True)
+        self._transport.close()
+
+    def warm_up(self, connections: int) -> None:
+        """Open connections to the instance before a sync starts."""
+        self._transport.warm(self.instance_url, connections, self._cookies)
+
+    def attachment_url(self, *, course_id: str, content_id: str,
+                       attachment_id: str) -> str:
+        """URL requested by `download` for the same arguments."""
+        api_url = self.url.format(version=1)
+        return (f"{api_url}/courses/{course_id}/contents/{content_id}/"
+                f"attachments/{attachment_id}/download")
+
+    @property
+    def transport(self) -> SyncTransport:
+        return self._transport
+
+    def ex_fetch_courses(self, *,
+                         result_filter: BBMembershipFilter | None = None,
+                         **kwargs: Any) -> list[BBCourse]:
+        """Fetch the user's available courses, with the fields synced"""
+        courses = []
+
+        memberships = self.fetch_user_memberships(
+            params={'fields': MEMBERSHIP_FIELDS}, **kwargs
+        )
+
+        if result_filter is not None:
+            memberships = list(result_filter.filter(memberships))
+
+        for ms in memberships:
+            if not ms.availability:
+                continue
+
+            try:
+                course = self.fetch_courses(course_id=ms.courseId,
+                                            params={'fields': COURSE_FIELDS})
+            except BBForbiddenError:
+                logger.warning(f"Course {ms.courseId} is not available")
+            else:
+                assert isinstance(course, BBCourse)
+                courses.append(course.model_copy(
+                    update={'created': ms.created}
+                ))
+
+        return courses
+
+    def fetch_content_tree(self, *, course_id: str,
+                           fields: str | None = None
+                           ) -> list[BBCourseContent]:
+        """List every content item in a course, at any depth.
+
+        The hierarchy can be rebuilt from the `parentId` of each item.
+
+        :param course_id: The course or organization ID.
+        :param fields: Fields to include for each content, all by default
+        """
+        params = {'recursive': 'true'}
+
+        if fields is not None:
+            params['fields'] = f"{fields},parentId"
+
+        first_page = self._fetch_contents_page(course_id=course_id,
+                                               params=params)
+        return [BBCourseContent(**content)
+                for content in self.iter_results(first_page)]
+
+    def iter_contents(self, *, course_id: str, fields: str | None = None
+                      ) -> Iterator[BBCourseContent]:
+        """List top-level content items in a course, page by page.
+
+        :param course_id: The course or organization ID.
+        :param fields: Fields to include for each content, all by default
+        """
+        first_page = self._fetch_contents_page(course_id=course_id,
+                                               params=self._fields(fields))
+
+        for content in self.iter_results(first_page):
+            yield BBCourseContent(**content)
+
+    def iter_content_children(self, *, course_id: str, content_id: str,
+                              fields: str | None = None
+                              ) -> Iterator[BBCourseContent]:
+        """List the children of a content item, page by page.
+
+        :param course_id: The course or organization ID.
+        :param content_id: The Content ID.
+        :param fields: Fields to include for each content, all by default
+        """
+        first_page = self._fetch_children_page(course_id=course_id,
+                                               content_id=content_id,
+                                               params=self._fields(fields))
+
+        for content in self.iter_results(first_page):
+            yield BBCourseContent(**content)
+
+    def iter_results(self, response: requests.Response
+                     ) -> Iterator[dict[str, Any]]:
+        """Results of a paginated listing, following every next page.
+
+        The next page is requested before the results of the current
+        one are yielded.
+        """
+        while True:
+            page = response.json()
+
+            if 'status' in page:
+                status_handler(self, page['status'], page)
+
+            next_page = page.get('paging', {}).get('nextPage')
+            prefetch = None
+
+            if next_page:
+                prefetch = self._prefetch.submit(
+                    self._fetch_page,
+                    page_url=urljoin(self.instance_url, next_page)
+                )
+
+            yield from page.get('results', [])
+
+            if prefetch is None:
+                return
+
+            response = prefetch.result()
+
+    @staticmethod
+    def _fields(fields: str | None) -> dict[str, str]:
+        return {'fields': fields} if fields is not None else {}
+
+    @get("/courses/{course_id}/contents/{content_id}",
+         params={'fields': 'body'})
+    def fetch_content_body(self, response: Any) -> str | None:
+        """Fetch the body of a single content item.
+
+        :param course_id: The course or organization ID.
+        :param content_id: The Content ID.
+        """
+        return response.get('body')
+
+    @get("/courses/{course_id}/contents", json=False)
+    def _fetch_contents_page(self, response: requests.Response
+                             ) -> requests.Response:
+        return response
+
+    @get("/courses/{course_id}/contents/{content_id}/children", json=False)
+    def _fetch_children_page(self, response: requests.Response
+                             ) -> requests.Response:
+        return response
+
+    @get("{page_url}", json=False, use_api=False)
+    def _fetch_page(self, response: requests.Response) -> requests.Response:
+        return response
+
+    @head("{webdav_url}", json=False, use_api=False)
+    def probe_webdav(self, response: requests.Response
+                     ) -> requests.Response:
+        """Fetch the headers of an arbitrary webdav file"""
+        return response
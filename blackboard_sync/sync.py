@@ -25,16 +25,23 @@ import time
 import logging
 import threading
 from pathlib import Path
+from http.server import ThreadingHTTPServer
 from requests import RequestException
 from datetime import datetime, timezone, timedelta
 
 from requests.cookies import RequestsCookieJar
 
-from blackboard.api_extended import BlackboardExtended
 from blackboard.exceptions import BBUnauthorizedError, BBForbiddenError
 
 from .config import SyncConfig
+from .manifest import SyncManifest
+from .metrics import SyncMetrics
+from .profiling import SyncProfiler, profiler_mode
+from .session import SyncSession
+from .retry import RetryPolicy
+from .transport import SyncTransport
 from .download import BlackboardDownload
+from .progress import ProgressSnapshot
 from .institutions import Institution, get_by_index
 
 logger = logging.getLogger(__name__)
@@ -44,15 +51,21 @@ class BlackboardSync:
     """Represents an instance of the BlackboardSync application."""
 
     _log_directory = "log"
+    _profile_directory = "profile"
 
     # Seconds between each check of time elapsed since last sync
     _check_sleep_time = 10
 
+    # Seconds to wait for the sync thread to stop
+    _stop_timeout = 10
+
     def __init__(self) -> None:
         """Create an instance of the program."""
 
         # Download job
         self._download: BlackboardDownload | None = None
+        # Thread which runs the sync loop
+        self.sync_thread: threading.Thread | None = None
 
         # Time between each sync in seconds
         self._sync_interval = 60 * 30
@@ -70,11 +83,17 @@ class BlackboardSync:
         self._is_active = False
         # Flag to know if download thread has errors
         self._has_error = False
+        # Set to wake the sync thread up early
+        self._wake = threading.Event()
 
         logger.debug("Initialising BlackboardSync")
 
         self.university: Institution | None = None
-        self.sess: BlackboardExtended | None = None
+        self.sess: SyncSession | None = None
+
+        # Kept across every sync, exported after each one
+        self._metrics = SyncMetrics()
+        self._metrics_server: ThreadingHTTPServer | None = None
 
         # Attempt to load existing configuration
         self._config = SyncConfig()
@@ -109,15 +128,24 @@ class BlackboardSync:
         api_url = str(self.university.api_url)
 
         try:
-            u_sess = BlackboardExtended(api_url, cookies=cookies)
+            transport = SyncTransport(
+                per_thread=self._config.thread_sessions,
+                retry=RetryPolicy(self._config.retry_attempts),
+                metrics=self._metrics
+            )
+            u_sess = SyncSession(api_url, cookies=cookies,
+                                 transport=transport)
             # should trigger exception if not authenticated
             u_sess.fetch_users(user_id='me')
         except (BBUnauthorizedError, BBForbiddenError):
             logger.warning("Credentials are incorrect")
+            u_sess.close()
         except RequestException:
             logger.warning("Error while making auth request")
+            u_sess.close()
         else:
             logger.info("Logged in successfully")
+            self._close_session()
             self.sess = u_sess
             self._is_logged_in = True
             self.start_sync()
@@ -127,9 +155,14 @@ class BlackboardSync:
     def log_out(self) -> None:
         """Stop syncing and forget user session."""
         self.stop_sync()
-        self.sess = None
+        self._close_session()
         self._is_logged_in = False
 
+    def _close_session(self) -> None:
+        if self.sess is not None:
+            self.sess.close()
+            self.sess = None
+
     def download(self) -> datetime | None:
         user_session = self.sess
 
@@ -143,27 +176,87 @@ class BlackboardSync:
             user_session,
             self.download_location,
             self.last_sync_time,
-            self.min_year
+            self.min_year,
+            self._config.course_workers,
+            metrics=self._metrics
         )
 
         if not self._is_active:
             return None
 
+        started = time.monotonic()
+
         try:
-            start_time = self._download.download()
+            start_time = self._run_download(self._download)
         except BBUnauthorizedError:
             logger.exception("User session expired")
+            self._record_sync('failed', started)
             self.log_out()
         except Exception:
             logger.exception("Download error")
             self._has_error = True
+            self._record_sync('failed', started)
 
             # manually postpone next sync job
             self.schedule_next_sync(datetime.now(timezone.utc))
         else:
+            result = 'complete' if start_time is not None else 'cancelled'
+            self._record_sync(result, started)
             return start_time
         return None
 
+    def _run_download(self, download: BlackboardDownload) -> datetime | None:
+        """Run the download job, under a profiler if one is enabled."""
+        mode = profiler_mode(self._config.profiler)
+
+        if mode is None or self.download_location is None:
+            return download.download()
+
+        # Threads kept by the session for later syncs are left out
+        profiler = SyncProfiler(mode, ignore_threads=[
+            SyncSession.PREFETCH_THREAD_NAME
+        ])
+
+        try:
+            with profiler:
+                return download.download()
+        finally:
+            # Kept next to the logs, one set of files per sync
+            profile_dir = self.download_location / self._profile_directory
+            name = f"sync_{datetime.now():%Y-%m-%d_%H-%M-%S}"
+
+            try:
+                profiler.dump(profile_dir, name)
+            except OSError:
+                logger.warning(f"Could not write profile to {profile_dir}")
+
+    def _record_sync(self, result: str, started: float) -> None:
+        """Add a sync to the metrics, then export them."""
+        self._metrics.syncs.inc(result=result)
+        self._metrics.sync_duration.observe(time.monotonic() - started)
+        self._metrics.last_sync.set(time.time())
+
+        if result == 'failed':
+            self._metrics.errors.inc(stage='sync')
+
+        if (textfile := self._config.metrics_textfile) is not None:
+            try:
+                self._metrics.write_textfile(textfile)
+            except OSError:
+                logger.warning(f"Could not write metrics to {textfile}")
+
+    def _serve_metrics(self) -> None:
+        """Serve the metrics on localhost, if a port is configured."""
+        port = self._config.metrics_port
+
+        if port is None or self._metrics_server is not None:
+            return
+
+        try:
+            self._metrics_server = self._metrics.serve(port)
+        except OSError:
+            logger.warning(f"Could not serve metrics on port {port}")
+
     def _sync_task(self) -> None:
         """Constantly check if data is outdated and if so start download.
 
@@ -184,7 +277,7 @@ class BlackboardSync:
                 self._is_syncing = False
 
             if self._is_active:
-                time.sleep(self._check_sleep_time)
+                self._wake.wait(self._check_sleep_time)
 
     def start_sync(self) -> bool:
         """Starts Sync thread or returns False if not possible."""
@@ -192,19 +285,39 @@ class BlackboardSync:
             return False
 
         logger.info("Starting sync thread")
+        self._serve_metrics()
         self._is_active = True
+        self._wake.clear()
         self.sync_thread = threading.Thread(target=self._sync_task)
         self.sync_thread.start()
         return True
 
-    def stop_sync(self) -> None:
-        """Stop Sync thread."""
+    def stop_sync(self, timeout: float | None = None) -> bool:
+        """Stop Sync thread, cancelling any download in progress.
+
+        :param timeout: Seconds to wait for the thread to stop
+        :return: Whether the thread stopped in time
+        """
         logger.info("Stopping sync thread")
         self._is_active = False
+        self._wake.set()
 
         if self._download is not None:
             self._download.cancel()
 
+        thread = self.sync_thread
+
+        # The sync thread itself stops on an expired session
+        if thread is None or thread is threading.current_thread():
+            return True
+
+        thread.join(self._stop_timeout if timeout is None else timeout)
+
+        if thread.is_alive():
+            logger.warning("Sync thread did not stop in time")
+            return False
+        return True
+
     def _add_logger_file_handler(self) -> None:
         filename = f"sync_log_{datetime.now():%Y-%m-%d}.log"
 
@@ -231,6 +344,12 @@ class BlackboardSync:
     def redownload(self) -> None:
         self.last_sync_time = None
 
+        # Forget which files were downloaded too
+        if self.download_location is not None:
+            manifest = SyncManifest.for_location(self.download_location)
+            manifest.clear()
+            manifest.close()
+
     @property
     def username(self) -> str | None:
         return self.sess.user_id if self.sess is not None else None
@@ -311,6 +430,18 @@ class BlackboardSync:
         """Flag raised everytime a download job is running."""
         return self._is_syncing
 
+    @property
+    def metrics(self) -> SyncMetrics:
+        """Metrics of every sync since the app started."""
+        return self._metrics
+
+    @property
+    def progress(self) -> ProgressSnapshot | None:
+        """Progress of the download job running, if any."""
+        if not self._is_syncing or self._download is None:
+            return None
+        return self._download.progress
+
     @property
     def has_error(self) -> bool:
         """Flag indicates an error resulting in no downloads."""
@@ -87,7 +87,8 @@ class SyncController:
     def open_menu(self) -> None:
         self.ui.open_menu(self.model.last_sync_time,
                           self.model.is_logged_in,
-                          self.model.is_syncing)
+                          self.model.is_syncing,
+                          self.model.progress)
 
         if self.model.has_error:
             self.ui.notify_sync_error()
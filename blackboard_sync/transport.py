@@ -0,0 +1,318 @@
+"""
+BlackboardSync HTTP transport
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import time
+import logging
+import threading
+from typing import Any, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cancel import CancelToken
+from .limiter import AdaptiveLimiter, retry_after
+from .metrics import SyncMetrics
+from .retry import RetryPolicy, TRANSIENT_ERRORS
+
+logger = logging.getLogger(__name__)
+
+
+class TransportStats(NamedTuple):
+    pool_size: int
+    requests: int
+    in_flight: int
+    peak_in_flight: int
+    saturated: int
+    connections: int
+    limit: int
+    retries: int
+
+
+class SyncTransport(requests.Session):
+    """The `requests` session that carries every request of a sync.
+
+    Connection pools are sized for the number of threads making
+    requests, so connections are kept alive and reused instead of being
+    discarded when the pool overflows. Optionally, each thread gets its
+    own session, all of them sharing the same cookie jar. The session
+    of a thread is closed once the thread has ended.
+
+    Requests in flight are capped by an `AdaptiveLimiter`, which backs
+    off when the server is overloaded, up to the size of the pools.
+    Idempotent requests which fail transiently are sent again, following
+    a `RetryPolicy`. While a `cancel_token` is set, no request is sent
+    once it is cancelled, and waits between attempts are cut short.
+    Every request sent is counted in `metrics`, if given.
+
+    A request is counted as saturated when it starts while as many
+    requests as there are pooled connections are already in flight, so
+    it has to wait for one of them to finish.
+    """
+
+    DEFAULT_POOL_SIZE = 10
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 per_thread: bool = False,
+                 limiter: AdaptiveLimiter | None = None,
+                 retry: RetryPolicy | None = None,
+                 metrics: SyncMetrics | None = None) -> None:
+        super().__init__()
+        self._metrics = metrics
+        self._per_thread = per_thread
+        self._retry = retry or RetryPolicy()
+        self._limiter = limiter or AdaptiveLimiter(
+            max_pause=self._retry.max_delay
+        )
+        self._retries = 0
+        self._cancel_token: CancelToken | None = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._saturated = 0
+        self._sessions: dict[threading.Thread, requests.Session] = {}
+        self.configure(pool_size)
+
+    def configure(self, pool_size: int) -> None:
+        """Size the connection pools for the given number of threads.
+
+        Connections already open are closed.
+        """
+        self._pool_size = pool_size
+        self._limiter.max_limit = pool_size
+
+        with self._lock:
+            self._close_ended_sessions()
+            sessions = list(self._sessions.values())
+
+        for session in [self, *sessions]:
+            self._mount_adapters(session)
+
+    def _mount_adapters(self, session: requests.Session) -> None:
+        adapter = HTTPAdapter(pool_connections=self._pool_size,
+                              pool_maxsize=self._pool_size,
+                              pool_block=True)
+
+        for prefix in ("https://", "http://"):
+            if prefix in session.adapters:
+                session.adapters[prefix].close()
+            session.mount(prefix, adapter)
+
+    def warm(self, url: str, connections: int | None = None,
+             cookies: Any = None) -> None:
+        """Open connections to a host ahead of the first requests."""
+        if self._per_thread:
+            # Thread sessions have their own pools, opened on first use
+            return
+
+        connections = min(connections or self._pool_size, self._pool_size)
+
+        def _connect(_: int) -> requests.Response | None:
+            try:
+                return self.head(url, allow_redirects=False, timeout=10,
+                                 cookies=cookies, stream=True)
+            except requests.RequestException:
+                logger.info(f"Could not pre-open connection to {url}")
+                return None
+
+        # Responses are held open so that each takes its own connection
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            responses = list(executor.map(_connect, range(connections)))
+
+        for response in responses:
+            if response is not None:
+                # Reading the empty body returns the connection to the pool
+                response.content
+
+    def request(self, method: str | bytes, url: str | bytes,
+                *args: Any, **kwargs: Any) -> requests.Response:
+        if self._per_thread:
+            send = self._thread_session().request
+        else:
+            send = super().request
+
+        if self._cancel_token is not None:
+            self._cancel_token.check()
+
+        self._start()
+
+        try:
+            return self._send_with_retries(send, method, url,
+                                           *args, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _send_with_retries(self, send: Any, method: str | bytes,
+                           *args: Any, **kwargs: Any) -> requests.Response:
+        if not self._retry.is_idempotent(method):
+            return self._send(send, method, *args, **kwargs)
+
+        failures = 0
+
+        while True:
+            try:
+                response = self._send(send, method, *args, **kwargs)
+            except TRANSIENT_ERRORS:
+                failures += 1
+                delay = self._retry.delay(failures)
+
+                if delay is None:
+                    raise
+            else:
+                if not self._retry.should_retry(response.status_code):
+                    return response
+
+                failures += 1
+                delay = self._retry.delay(failures, retry_after(response))
+
+                if delay is None:
+                    return response
+
+                # Free the connection for the next attempt
+                response.close()
+
+            with self._lock:
+                self._retries += 1
+
+            if self._metrics is not None:
+                self._metrics.retries.inc()
+
+            if self._cancel_token is not None:
+                self._cancel_token.sleep(delay)
+            else:
+                time.sleep(delay)
+
+    def _send(self, send: Any, method: str | bytes, url: str | bytes,
+              *args: Any, **kwargs: Any) -> requests.Response:
+        """Send a request once the limiter allows it."""
+        started = self._limiter.acquire(self._cancel_token)
+
+        try:
+            response = send(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self._limiter.release(started)
+            self._observe(url, None, started)
+            raise
+        except BaseException:
+            self._limiter.cancel()
+            raise
+
+        self._limiter.release(started, response.status_code,
+                              retry_after(response))
+        self._observe(url, response.status_code, started)
+        return response
+
+    def _observe(self, url: str | bytes, status: int | None,
+                 started: float) -> None:
+        if self._metrics is None:
+            return
+
+        self._metrics.observe_request(url, status,
+                                      time.monotonic() - started)
+        self._metrics.request_limit.set(self._limiter.limit)
+
+    def _start(self) -> None:
+        with self._lock:
+            # Each thread session has a pool to itself
+            if not self._per_thread and self._in_flight >= self._pool_size:
+                self._saturated += 1
+
+            self._requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight,
+                                       self._in_flight)
+
+    def _thread_session(self) -> requests.Session:
+        thread = threading.current_thread()
+
+        if (session := self._sessions.get(thread)) is not None:
+            return session
+
+        session = requests.Session()
+        session.cookies = self.cookies
+        session.headers = self.headers
+        self._mount_adapters(session)
+
+        with self._lock:
+            self._close_ended_sessions()
+            self._sessions[thread] = session
+        return session
+
+    def _close_ended_sessions(self) -> None:
+        """Close the sessions of threads which have ended."""
+        for thread in [t for t in self._sessions if not t.is_alive()]:
+            self._sessions.pop(thread).close()
+
+    def close(self) -> None:
+        """Close every connection, of all threads."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+
+        for session in sessions:
+            session.close()
+
+        super().close()
+
+    @staticmethod
+    def _pools(session: requests.Session) -> list[Any]:
+        pools = []
+        for adapter in set(session.adapters.values()):
+            if isinstance(adapter, HTTPAdapter):
+                manager = adapter.poolmanager
+                keys = manager.pools.keys()
+                pools.extend(manager.pools[key] for key in keys)
+        return pools
+
+    @property
+    def stats(self) -> TransportStats:
+        """Usage of the connection pools since the transport was created."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        connections = sum(pool.num_connections
+                          for session in [self, *sessions]
+                          for pool in self._pools(session))
+
+        with self._lock:
+            return TransportStats(self._pool_size, self._requests,
+                                  self._in_flight, self._peak_in_flight,
+                                  self._saturated, connections,
+                                  self._limiter.limit, self._retries)
+
+    @property
+    def limiter(self) -> AdaptiveLimiter:
+        return self._limiter
+
+    @property
+    def retry(self) -> RetryPolicy:
+        return self._retry
+
+    @property
+    def cancel_token(self) -> CancelToken | None:
+        """Token of the sync currently using the transport, if any."""
+        return self._cancel_token
+
+    @cancel_token.setter
+    def cancel_token(self, token: CancelToken | None) -> None:
+        self._cancel_token = token
@@ -5,7 +5,7 @@ from hypothesis import given, infer
 from hypothesis import strategies as st
 from hypothesis.strategies import composite, DrawFn
 
-from blackboard_sync.blackboard import (
+from blackboard.blackboard import (
     BBLocale, BBDuration, BBEnrollment, BBProctoring, BBFile, BBAttachment,
     BBCourseContent, BBAvailability)
 
@@ -85,12 +85,11 @@ def bb_course_contents(draw: DrawFn) -> BBCourseContent:
     utc_strategy = st.just(timezone.utc)
     iso_datetime_strategy = st.datetimes(timezones=utc_strategy).map(lambda dt: dt.isoformat())
 
-    draw(st.builds(BBCourseContent, id=infer, title=infer, body=infer,
-                   created=iso_datetime_strategy, modified=iso_datetime_strategy,
-                   position=infer, hasChildren=..., launchInNewWindow=infer,
-                   reviewable=infer, availability=..., contentHandler=...,
-                   links=..., hasGradebookColumns=infer, hasAssociatedGroups=infer))
-    return 1
+    return draw(st.builds(BBCourseContent, id=infer, title=infer, body=infer,
+                          created=iso_datetime_strategy, modified=iso_datetime_strategy,
+                          position=infer, hasChildren=..., launchInNewWindow=infer,
+                          reviewable=infer, availability=..., contentHandler=...,
+                          links=..., hasGradebookColumns=infer, hasAssociatedGroups=infer))
 
 
 @composite
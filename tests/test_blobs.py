@@ -0,0 +1,144 @@
+"""BlobStore Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import io
+import os
+from unittest import mock
+
+import pytest
+
+from blackboard_sync.blobs import BlobStore
+from blackboard_sync.manifest import SyncManifest
+from blackboard_sync.content.base import BStream
+from blackboard_sync.content.job import DownloadJob
+
+
+class FakeFile(BStream):
+    def __init__(self, job, key, payload, etag=None):
+        super().__init__(job, key, 'course/content')
+        self.payload = payload
+        self.etag = etag
+        self.bodies_read = 0
+
+    def open_stream(self, headers):
+        headers = {'ETag': self.etag} if self.etag else {}
+        response = mock.MagicMock(status_code=200, headers=headers)
+        response.__enter__.return_value = response
+        response.raw.readinto = self._readinto(io.BytesIO(self.payload))
+        return response
+
+    def _readinto(self, raw):
+        def readinto(b):
+            self.bodies_read += 1
+            return raw.readinto(b)
+        return readinto
+
+
+@pytest.fixture
+def job(tmp_path):
+    data = tmp_path / '.bbsync'
+    return DownloadJob(None, None, manifest=SyncManifest(),
+                       blobs=BlobStore(data))
+
+
+def test_duplicates_linked(tmp_path, job):
+    payload = os.urandom(1024)
+    FakeFile(job, 'a', payload)._download(tmp_path / 'a.pdf')
+    FakeFile(job, 'b', payload)._download(tmp_path / 'b.pdf')
+
+    a, b = (tmp_path / 'a.pdf').stat(), (tmp_path / 'b.pdf').stat()
+    assert a.st_ino == b.st_ino
+    assert (tmp_path / 'b.pdf').read_bytes() == payload
+    assert job.manifest.get('a').digest == job.manifest.get('b').digest
+
+
+def test_known_etag_not_refetched(tmp_path, job):
+    payload = os.urandom(1024)
+    FakeFile(job, 'a', payload, etag='"v1"')._download(tmp_path / 'a.pdf')
+    (tmp_path / 'a.pdf').unlink()
+
+    again = FakeFile(job, 'a', payload, etag='"v1"')
+    again._download(tmp_path / 'a.pdf')
+
+    assert again.bodies_read == 0
+    assert (tmp_path / 'a.pdf').read_bytes() == payload
+
+
+def test_etag_of_other_file_ignored(tmp_path, job):
+    # ETags built from size and mtime may be shared by different files
+    FakeFile(job, 'c/1/y', b'AAAA', etag='"1"')._download(tmp_path / 'y.pdf')
+
+    other = FakeFile(job, 'd/3/z', b'BBBB', etag='"1"')
+    other._download(tmp_path / 'z.pdf')
+
+    assert other.bodies_read > 0
+    assert (tmp_path / 'z.pdf').read_bytes() == b'BBBB'
+    assert (tmp_path / 'y.pdf').read_bytes() == b'AAAA'
+
+
+def test_without_hardlinks(tmp_path, job):
+    payload = os.urandom(1024)
+
+    with mock.patch('os.link', side_effect=OSError()):
+        FakeFile(job, 'a', payload, etag='"v1"')._download(tmp_path / 'a.pdf')
+        # Same file, moved to another folder
+        moved = FakeFile(job, 'a', payload, etag='"v1"')
+        moved._download(tmp_path / 'b.pdf')
+
+    # Copied from the first file rather than downloaded again
+    assert moved.bodies_read == 0
+    assert (tmp_path / 'b.pdf').read_bytes() == payload
+    assert not list((tmp_path / '.bbsync' / 'blobs').glob('*/*'))
+
+
+def test_prune(tmp_path, job):
+    FakeFile(job, 'a', b'old version')._download(tmp_path / 'a.pdf')
+    FakeFile(job, 'a', b'new version')._download(tmp_path / 'a.pdf')
+
+    assert job.blobs.prune() == 1
+    assert (tmp_path / 'a.pdf').read_bytes() == b'new version'
+
+
+class ConditionalFile(FakeFile):
+    CONDITIONAL_REQUESTS = True
+
+    def open_stream(self, headers):
+        self.headers = headers
+
+        if headers.get('If-None-Match') == self.etag:
+            response = mock.MagicMock(status_code=304, headers={})
+            response.__enter__.return_value = response
+            return response
+        return super().open_stream(headers)
+
+
+def test_conditional_request(tmp_path, job):
+    path = tmp_path / 'a.png'
+    ConditionalFile(job, 'a', b'image', etag='"v1"')._download(path)
+
+    again = ConditionalFile(job, 'a', b'image', etag='"v1"')
+    again._download(path)
+
+    assert again.headers == {'If-None-Match': '"v1"'}
+    assert again.bodies_read == 0
+    assert SyncManifest.file_in_place(job.manifest.get('a'))
+
+    # Without a local copy, no validators are sent
+    path.unlink()
+    ConditionalFile(job, 'a', b'image', etag='"v2"')._download(path)
+    assert path.read_bytes() == b'image'
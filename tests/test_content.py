@@ -1,5 +1,12 @@
+import io
+import os
 from pathlib import Path
+from datetime import datetime, timezone, timedelta
 from unittest import mock
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 
 from hypothesis import given
 from hypothesis import assume
@@ -19,10 +26,23 @@ from blackboard_sync.content import (
     Content,
     Folder,
     Document,
+    Attachment,
     Unhandled
 )
 
-from blackboard_sync.content.base import FStream
+from blackboard.exceptions import BBBadRequestError
+
+from blackboard_sync.content.base import BStream, FStream, DownloadError
+from blackboard_sync.content.job import DownloadJob
+from blackboard_sync.content.tree import ContentTree
+from blackboard_sync.content.walker import TreeWalker
+from blackboard_sync.content.writer import StreamWriter
+from blackboard_sync.content.webdav import Link, WebDavFile, probe_webdav
+from blackboard_sync.cancel import CancelToken
+from blackboard_sync.manifest import SyncManifest, ItemStatus
+from blackboard_sync.plan import PlanAction, PlanItem, SyncPlan
+from blackboard_sync.session import ATTACHMENT_FIELDS, CONTENT_FIELDS
+from blackboard_sync.retry import RetryPolicy
 
 
 def assert_written(path, content):
@@ -37,6 +57,23 @@ def make_available(model):
     })
 
 
+class FakeStream(BStream):
+    """Stream whose request is replaced by each test."""
+
+    def open_stream(self, headers):
+        raise NotImplementedError
+
+
+def test_bstream_is_abstract():
+    with pytest.raises(TypeError):
+        BStream()
+
+
+def mock_job(**kwargs):
+    kwargs.setdefault('cancel_token', CancelToken())
+    return mock.Mock(cancelled=False, **kwargs)
+
+
 def get_module(class_name):
     return 'blackboard_sync.content.content.' + class_name
 
@@ -58,63 +95,277 @@ def test_fstream_write(tmpdir):
         assert contents == f.read()
 
 
+@pytest.mark.parametrize('workers', [None, 4])
+def test_walker_expands_tree(workers):
+    executor = ThreadPoolExecutor(workers) if workers else None
+    walker = TreeWalker(executor)
+    expanded = []
+
+    def expand(depth, node):
+        expanded.append(node)
+        if depth < 3:
+            for i in range(3):
+                walker.submit(partial(expand, depth + 1, f"{node}/{i}"))
+
+    walker.submit(partial(expand, 0, 'root'))
+    walker.join()
+
+    # 1 + 3 + 9 + 27 nodes, deeper than the walker ever recurses
+    assert len(expanded) == 40
+
+
+def test_walker_raises_errors():
+    walker = TreeWalker(ThreadPoolExecutor(2))
+
+    def fail():
+        raise ValueError()
+
+    walker.submit(fail)
+    walker.submit(lambda: None)
+
+    with pytest.raises(ValueError):
+        walker.join()
+
+
 @given(...)
 def test_course_api_call(course: BBCourse):
     course = make_available(course)
 
-    job = mock.Mock()
-    job.session.fetch_contents.return_value = []
+    job = mock_job()
+    job.fork.return_value = job
+    job.session.fetch_content_tree.side_effect = BBBadRequestError()
+    job.session.iter_contents.return_value = []
+
+    Course(course, job)
+
+    # Listed folder by folder without recursive listing
+    job.fork.assert_called_once_with(None)
+    job.session.iter_contents.assert_called_once_with(
+        course_id=course.id, fields=job.content_fields
+    )
+
+
+def test_content_fields():
+    job = DownloadJob(mock.Mock(), None)
+    assert job.lists_bodies
+    assert job.content_fields == f"{CONTENT_FIELDS},body"
+
+    job = DownloadJob(mock.Mock(), datetime(2024, 10, 1, tzinfo=timezone.utc))
+    assert not job.lists_bodies
+    assert job.content_fields == CONTENT_FIELDS
+
+
+def test_content_body_fetched_when_changed():
+    job = mock_job(lists_bodies=False)
+    job.has_changed.return_value = True
+    job.session.fetch_content_body.return_value = '<p>Hello</p>'
+
+    content = BBCourseContent(id='1', title='Notes',
+                              availability={'available': 'Yes'})
+    api_path = BBContentPath(course_id='c', content_id='1')
+
+    with mock.patch(get_module('body.ContentBody')) as p:
+        Content(content, api_path, job)
+
+    job.session.fetch_content_body.assert_called_once_with(**api_path)
+    assert p.call_args.args[0].body == '<p>Hello</p>'
+
+    # Unchanged contents are only descended into
+    job.has_changed.return_value = False
+    job.session.fetch_content_body.reset_mock()
+    Content(content.model_copy(update={'hasChildren': True}), api_path, job)
+    job.session.fetch_content_body.assert_not_called()
+
+
+def test_unchanged_content_kept_in_plan(tmp_path):
+    job = mock_job()
+    job.has_changed.return_value = False
+    content = BBCourseContent(id='1', title='Notes',
+                              availability={'available': 'Yes'})
+    api_path = BBContentPath(course_id='c', content_id='1')
+
+    plan = SyncPlan()
+    Content(content, api_path, job).write(tmp_path, plan)
+    assert plan.items == [PlanItem(PlanAction.KEEP, str(tmp_path / 'Notes'))]
+
+    # Unavailable contents are gone from the tree
+    plan = SyncPlan()
+    content = content.model_copy(update={'availability': None})
+    Content(content, api_path, job).write(tmp_path, plan)
+    assert plan.items == []
+
+
+def make_tree_content(content_id, parent_id=None, folder=False):
+    handler = BBResourceType.Folder if folder else BBResourceType.Document
+    return BBCourseContent(id=content_id, parentId=parent_id,
+                           title=content_id, hasChildren=folder,
+                           availability={'available': 'Yes'},
+                           contentHandler=BBContentHandler(id=handler))
+
+
+def test_content_tree():
+    contents = [make_tree_content('1', 'root', folder=True),
+                make_tree_content('2', '1', folder=True),
+                make_tree_content('3', '2'),
+                make_tree_content('4', 'root')]
+    tree = ContentTree(contents)
+
+    assert [c.id for c in tree.roots] == ['1', '4']
+    assert [c.id for c in tree.children('1')] == ['2']
+    assert [c.id for c in tree.children('2')] == ['3']
+    assert tree.children('3') == []
+
+
+def test_content_tree_orphans():
+    contents = [make_tree_content('1', 'root', folder=True),
+                make_tree_content('2', '1'),
+                make_tree_content('3', 'hidden'),
+                make_tree_content('4', 'root')]
+
+    with mock.patch('blackboard_sync.content.tree.logger') as logger:
+        tree = ContentTree(contents)
+
+    # Contents under a folder that was not listed are left out
+    assert [c.id for c in tree.roots] == ['1', '4']
+    assert tree.children('hidden') == []
+    logger.warning.assert_called_once()
+
+
+def test_course_recursive_listing_unsupported():
+    job = DownloadJob(mock.Mock(), None)
+    job.session.recursive_listing = True
+    job.session.fetch_content_tree.side_effect = BBBadRequestError()
+    job.session.iter_contents.return_value = []
+    course = BBCourse(id='c', title='Course',
+                      availability={'available': 'Yes'})
 
     Course(course, job)
+    Course(course.model_copy(update={'id': 'd'}), job)
+
+    # Not asked again once the instance has refused it
+    job.session.fetch_content_tree.assert_called_once()
+    assert job.session.iter_contents.call_count == 2
+
+
+def test_course_recursive_listing():
+    contents = [make_tree_content('1', 'root', folder=True),
+                make_tree_content('2', '1', folder=True),
+                make_tree_content('3', '2', folder=True)]
+
+    job = DownloadJob(mock.Mock(), None)
+    job.session.fetch_content_tree.return_value = contents
+    job.session.iter_content_children.return_value = []
+    course = BBCourse(id='c', title='Course',
+                      availability={'available': 'Yes'})
 
-    job.session.fetch_contents.assert_called_once_with(
-        course_id=course.id
+    Course(course, job)
+
+    job.session.fetch_content_tree.assert_called_once_with(
+        course_id='c', fields=job.content_fields
+    )
+    job.session.iter_contents.assert_not_called()
+
+    # Only the folder whose children were not listed is fetched
+    job.session.iter_content_children.assert_called_once_with(
+        course_id='c', content_id='3', fields=job.content_fields
     )
 
 
 @given(...)
 def test_folder_api_call(api_path: BBContentPath):
-    job = mock.Mock()
-    job.session.fetch_content_children.return_value = []
+    job = mock_job(content_tree=None)
+    job.session.iter_content_children.return_value = []
+
+    folder = Folder(BBCourseContent(id='folder'), api_path, job)
+    job.walker.submit.assert_called_once_with(folder.expand)
+    job.session.iter_content_children.assert_not_called()
+
+    folder.expand()
+    job.session.iter_content_children.assert_called_once_with(
+        fields=job.content_fields, **api_path
+    )
+
+
+def test_folder_listing_cached():
+    job = mock_job(manifest=SyncManifest(), content_tree=None)
+    child = BBCourseContent(id='2', title='Week 1',
+                            modified=datetime(2024, 10, 1))
+    job.session.iter_content_children.return_value = [child]
+
+    api_path = BBContentPath(course_id='c', content_id='1')
+    folder = BBCourseContent(id='1', modified=datetime(2024, 10, 2))
 
-    Folder(None, api_path, job)
-    job.session.fetch_content_children.assert_called_once_with(**api_path)
+    with mock.patch('blackboard_sync.content.folder.content.Content') as p:
+        Folder(folder, api_path, job).expand()
+        Folder(folder, api_path, job).expand()
+
+    # Unchanged folder is not listed again
+    job.session.iter_content_children.assert_called_once()
+    assert p.call_args_list[0] == p.call_args_list[1]
+
+
+def test_folder_new_child_changed(monkeypatch):
+    manifest = SyncManifest()
+    last_sync = datetime(2024, 10, 3, tzinfo=timezone.utc)
+    job = DownloadJob(mock.Mock(), last_sync, manifest=manifest)
+    modified = datetime(2024, 10, 1, tzinfo=timezone.utc)
+    week_1 = BBCourseContent(id='2', modified=modified)
+    week_2 = BBCourseContent(id='3', modified=modified)
+
+    api_path = BBContentPath(course_id='c', content_id='1')
+    folder = BBCourseContent(id='1', modified=datetime(2024, 10, 2))
+
+    with mock.patch('blackboard_sync.content.folder.content.Content'):
+        job.session.iter_content_children.return_value = [week_1]
+        Folder(folder, api_path, job).expand()
+
+        # Added while the last listing was used, then listed again
+        monkeypatch.setattr(SyncManifest, 'LISTING_MAX_AGE', timedelta(0))
+        job.session.iter_content_children.return_value = [week_1, week_2]
+        Folder(folder, api_path, job).expand()
+
+    assert job.has_changed(week_2.modified, 'c/3')
+    assert not job.has_changed(week_1.modified, 'c/2')
 
 
 @given(...)
 def test_file_api_call(api_path: BBContentPath):
-    job = mock.Mock()
+    job = mock_job()
     job.session.fetch_file_attachments.return_value = []
 
     Document(None, api_path, job)
 
     job.session.fetch_file_attachments.assert_called_once_with(
-        **api_path
+        params={'fields': ATTACHMENT_FIELDS}, **api_path
     )
 
 
 @given(...)
 def test_children_course(course: BBCourse, contents: list[BBCourseContent]):
-    job = mock.Mock()
-    job.session.fetch_contents.return_value = contents
+    job = mock_job()
+    job.session.fetch_content_tree.side_effect = BBBadRequestError()
+    course_job = job.fork.return_value = mock_job()
+    course_job.session.iter_contents.return_value = contents
 
     course = make_available(course)
 
     calls = []
     for content in contents:
         api_path = BBContentPath(course_id=course.id, content_id=content.id)
-        calls.append(mock.call(content, api_path, job))
+        calls.append(mock.call(content, api_path, course_job))
 
     with mock.patch('blackboard_sync.content.course.Content') as p:
         Course(course, job)
         p.assert_has_calls(calls)
 
+    course_job.walker.join.assert_called_once()
+
 
 @given(...)
 def test_children_folder(api_path: BBContentPath,
                          children: list[BBCourseContent]):
-    job = mock.Mock()
-    job.session.fetch_content_children.return_value = children
+    job = mock_job(content_tree=None)
+    job.session.iter_content_children.return_value = children
 
     calls = []
     for child in children:
@@ -123,14 +374,14 @@ def test_children_folder(api_path: BBContentPath,
         calls.append(mock.call(child, api_path, job))
 
     with mock.patch('blackboard_sync.content.folder.content.Content') as p:
-        Folder(None, api_path, job)
+        Folder(BBCourseContent(id='folder'), api_path, job).expand()
         p.assert_has_calls(calls)
 
 
 @given(...)
 def test_children_file(api_path: BBContentPath,
                        attachments: list[BBAttachment]):
-    job = mock.Mock()
+    job = mock_job()
     job.session.fetch_file_attachments.return_value = attachments
 
     calls = []
@@ -150,7 +401,7 @@ def test_children_file(api_path: BBContentPath,
 
 @given(...)
 def test_content_folder(api_path: BBContentPath):
-    job = mock.Mock()
+    job = mock_job()
     job.has_changed.return_value = True
 
     content = mock.MagicMock()
@@ -166,7 +417,7 @@ def test_content_folder(api_path: BBContentPath):
 
 @given(...)
 def test_content_file(api_path: BBContentPath):
-    job = mock.Mock()
+    job = mock_job()
     job.has_changed.return_value = True
 
     content = mock.MagicMock()
@@ -182,7 +433,7 @@ def test_content_file(api_path: BBContentPath):
 
 @given(...)
 def test_content_link(api_path: BBContentPath):
-    job = mock.Mock()
+    job = mock_job()
     job.has_changed.return_value = True
 
     content = mock.MagicMock()
@@ -198,7 +449,7 @@ def test_content_link(api_path: BBContentPath):
 
 @given(...)
 def test_content_unhandled(api_path: BBContentPath):
-    job = mock.Mock()
+    job = mock_job()
     job.has_changed.return_value = True
 
     content = mock.MagicMock()
@@ -218,3 +469,331 @@ def test_unhandled():
     content = Unhandled(mock.Mock(title="Content title"), None, mock.Mock())
     content.write(None, executor)
     executor.submit.assert_not_called()
+
+
+def test_attachment_deferred_stream(tmpdir):
+    job = mock_job(blobs=None, manifest=SyncManifest())
+    response = mock.MagicMock(raw=io.BytesIO(b'abcdef'), headers={},
+                              status_code=200)
+    response.__enter__.return_value = response
+    job.session.download.return_value = response
+
+    attachment = BBAttachment(id='1', fileName='notes.pdf',
+                              mimeType='application/pdf')
+    api_path = BBContentPath(course_id='c', content_id='d')
+    att = Attachment(attachment, api_path, job)
+
+    # No request is sent while building the tree
+    job.session.download.assert_not_called()
+
+    plan = SyncPlan()
+    att.write(Path(tmpdir), plan)
+    job.session.download.assert_not_called()
+
+    plan.execute(mock.Mock(submit=lambda x: x()))
+
+    job.session.download.assert_called_once_with(attachment_id='1',
+                                                 headers={}, **api_path)
+    response.__exit__.assert_called_once()
+    assert_written(Path(tmpdir, 'notes.pdf'), 'abcdef')
+
+
+def test_webdav_invalid_stream_closed(tmpdir):
+    job = mock_job(webdav_probes={})
+    job.session.instance_url = 'https://bb.example.org'
+    job.session.probe_webdav.return_value = make_probe_response(
+        200, {'Content-Type': 'image/png'}
+    )
+    response = mock.MagicMock(status_code=404)
+    response.__enter__.return_value = response
+    job.session.download_webdav.return_value = response
+
+    link = Link(href='https://bb.example.org/webdav/a.png', text='a.png')
+    plan = SyncPlan()
+    WebDavFile(link, job).write(Path(tmpdir), plan)
+
+    # Failed, to be downloaded again next time
+    with pytest.raises(DownloadError):
+        plan.execute(mock.Mock(submit=lambda x: x()))
+
+    response.__exit__.assert_called_once()
+    response.iter_content.assert_not_called()
+    assert not Path(tmpdir, 'a.png').exists()
+
+
+@pytest.mark.parametrize('status', [403, 404, 500, 503])
+def test_bstream_error_status(tmpdir, status):
+    manifest = SyncManifest()
+    job = mock_job(blobs=None, manifest=manifest,
+                   retry=RetryPolicy(base_delay=0))
+    response = mock.MagicMock(raw=io.BytesIO(b'<html>Error</html>'),
+                              status_code=status, headers={})
+    response.__enter__.return_value = response
+
+    stream = FakeStream(job, 'c/1/a', 'c/1')
+    stream.open_stream = mock.Mock(return_value=response)
+    path = Path(tmpdir, 'notes.pdf')
+
+    with pytest.raises(DownloadError):
+        stream._download(path)
+
+    # Error page is neither written nor retried
+    assert not path.exists()
+    stream.open_stream.assert_called_once()
+    assert manifest.get('c/1/a').status == ItemStatus.FAILED
+
+
+def test_bstream_request_error_not_retried(tmpdir):
+    job = mock_job(blobs=None, retry=RetryPolicy(base_delay=0))
+    stream = FakeStream(job)
+    stream.open_stream = mock.Mock(side_effect=ConnectionError())
+
+    # Already retried by the transport
+    with pytest.raises(ConnectionError):
+        stream._download(Path(tmpdir, 'notes.pdf'))
+
+    stream.open_stream.assert_called_once()
+
+
+@pytest.mark.parametrize('size', [0, 10, 64 * 1024, 3 * 1024 * 1024 + 7])
+def test_stream_writer(tmpdir, size):
+    data = os.urandom(size)
+    path = Path(tmpdir, 'file.bin')
+    stream = mock.Mock(raw=io.BytesIO(data), headers={})
+
+    with path.open('wb') as f:
+        assert StreamWriter().write(stream, f, drop_cache=True) == size
+
+    assert path.read_bytes() == data
+
+
+def test_stream_writer_chunks(tmpdir):
+    path = Path(tmpdir, 'file.bin')
+    stream = mock.Mock(raw=None, headers={})
+    stream.iter_content.return_value = [b'abc', b'def']
+
+    with path.open('wb') as f:
+        assert StreamWriter().write(stream, f) == 6
+
+    assert path.read_bytes() == b'abcdef'
+
+
+class FakeRangeServer:
+    """Serve a payload, honouring range requests like Blackboard does."""
+
+    def __init__(self, payload, fail_after=None, ranges=True, etag='"v1"'):
+        self.payload = payload
+        self.fail_after = fail_after
+        self.ranges = ranges
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, headers):
+        self.requests.append(headers)
+        start = 0
+        response_headers = {'Accept-Ranges': 'bytes'} if self.ranges else {}
+        status = 200
+
+        if self.etag is not None:
+            response_headers['ETag'] = self.etag
+
+        # The whole file is sent if it changed since the part was started
+        current = headers.get('If-Range', self.etag) == self.etag
+
+        if self.ranges and 'Range' in headers and current:
+            start = int(headers['Range'][6:-1])
+            status = 206
+            response_headers['Content-Range'] = \
+                f"bytes {start}-{len(self.payload) - 1}/{len(self.payload)}"
+
+        body = self.payload[start:]
+        response_headers['Content-Length'] = str(len(body))
+        raw = io.BytesIO(body)
+
+        if self.fail_after is not None:
+            fail_after, self.fail_after = self.fail_after, None
+
+            def readinto(b):
+                if raw.tell() >= fail_after:
+                    raise ConnectionError()
+                return io.BytesIO.readinto(raw, b[:fail_after - raw.tell()])
+            raw.readinto = readinto
+
+        response = mock.MagicMock(raw=raw, status_code=status,
+                                  headers=response_headers)
+        response.__enter__.return_value = response
+        return response
+
+
+def make_bstream(server):
+    stream = FakeStream()
+    stream.open_stream = server
+    return stream
+
+
+def test_bstream_atomic_resume(tmpdir):
+    payload = os.urandom(300 * 1024)
+    server = FakeRangeServer(payload, fail_after=100 * 1024)
+    path = Path(tmpdir, 'lecture.pdf')
+    part_path = Path(tmpdir, 'lecture.pdf.part')
+
+    stream = make_bstream(server)
+
+    with pytest.raises(ConnectionError):
+        stream._download(path)
+
+    # Interrupted download never reaches its destination
+    assert not path.exists()
+    assert part_path.stat().st_size == 100 * 1024
+
+    stream._download(path)
+
+    assert server.requests[-1] == {'Range': f"bytes={100 * 1024}-",
+                                   'If-Range': '"v1"'}
+    assert path.read_bytes() == payload
+    assert not part_path.exists()
+
+
+def test_bstream_resume_changed_file(tmpdir):
+    payload = os.urandom(300 * 1024)
+    server = FakeRangeServer(payload, fail_after=100 * 1024)
+    path = Path(tmpdir, 'lecture.pdf')
+
+    stream = make_bstream(server)
+
+    with pytest.raises(ConnectionError):
+        stream._download(path)
+
+    # A new version is uploaded before the next sync
+    server.payload = os.urandom(300 * 1024)
+    server.etag = '"v2"'
+    stream._download(path)
+
+    assert server.requests[-1]['If-Range'] == '"v1"'
+    assert path.read_bytes() == server.payload
+    assert not Path(tmpdir, 'lecture.pdf.part.json').exists()
+
+
+def test_bstream_resume_without_validator(tmpdir):
+    payload = os.urandom(300 * 1024)
+    server = FakeRangeServer(payload, fail_after=100 * 1024, etag=None)
+    path = Path(tmpdir, 'lecture.pdf')
+
+    stream = make_bstream(server)
+
+    with pytest.raises(ConnectionError):
+        stream._download(path)
+
+    # Could not tell whether the file changed, so it is not kept
+    assert not Path(tmpdir, 'lecture.pdf.part').exists()
+
+    stream._download(path)
+    assert 'Range' not in server.requests[-1]
+    assert path.read_bytes() == payload
+
+
+def test_bstream_resume_other_size(tmpdir):
+    payload = os.urandom(300 * 1024)
+    server = FakeRangeServer(payload, fail_after=100 * 1024)
+    path = Path(tmpdir, 'lecture.pdf')
+
+    stream = make_bstream(server)
+
+    with pytest.raises(ConnectionError):
+        stream._download(path)
+
+    # Same validator, but the range is of a file of another size
+    server.payload = payload + b'appendix'
+    stream._download(path)
+
+    assert server.requests[-2]['Range'] == f"bytes={100 * 1024}-"
+    assert 'Range' not in server.requests[-1]
+    assert path.read_bytes() == server.payload
+
+
+def test_bstream_no_range_support(tmpdir):
+    payload = os.urandom(300 * 1024)
+    server = FakeRangeServer(payload, fail_after=100 * 1024, ranges=False)
+    path = Path(tmpdir, 'lecture.pdf')
+
+    stream = make_bstream(server)
+
+    with pytest.raises(ConnectionError):
+        stream._download(path)
+
+    # Cannot be resumed, so it is not kept
+    assert not Path(tmpdir, 'lecture.pdf.part').exists()
+
+    stream._download(path)
+    assert path.read_bytes() == payload
+
+
+def test_bstream_retries_interrupted(tmpdir):
+    payload = os.urandom(300 * 1024)
+    server = FakeRangeServer(payload, fail_after=100 * 1024)
+    path = Path(tmpdir, 'lecture.pdf')
+
+    job = mock_job(blobs=None, retry=RetryPolicy(base_delay=0))
+    stream = FakeStream(job)
+    stream.open_stream = server
+
+    stream._download(path)
+
+    # Resumed within the same write
+    assert server.requests[-1] == {'Range': f"bytes={100 * 1024}-",
+                                   'If-Range': '"v1"'}
+    assert path.read_bytes() == payload
+
+
+def make_probe_response(status, headers):
+    response = mock.MagicMock(status_code=status, headers=headers)
+    response.__enter__.return_value = response
+    return response
+
+
+def test_webdav_probe_cached():
+    job = mock_job(webdav_probes={})
+    job.session.instance_url = 'https://bb.example.org'
+    job.session.probe_webdav.return_value = make_probe_response(
+        200, {'Content-Type': 'image/png', 'Content-Length': '100'}
+    )
+
+    link = 'https://bb.example.org/webdav/a.png'
+    assert probe_webdav(job, link)
+    assert probe_webdav(job, link)
+
+    job.session.probe_webdav.assert_called_once_with(webdav_url=link)
+    job.session.download_webdav.assert_not_called()
+
+
+def test_webdav_probe_rejects():
+    job = mock_job(webdav_probes={})
+    job.session.instance_url = 'https://bb.example.org'
+    job.session.probe_webdav.return_value = make_probe_response(405, {})
+    job.session.download_webdav.return_value = make_probe_response(
+        206, {'Content-Type': 'application/pdf', 'Content-Length': '1',
+              'Content-Range': f"bytes 0-0/{100 * 1024 * 1024}"}
+    )
+
+    # Too large, only known from the ranged request
+    link = 'https://bb.example.org/webdav/big.pdf'
+    assert not probe_webdav(job, link)
+    job.session.download_webdav.assert_called_once_with(
+        webdav_url=link, headers={'Range': 'bytes=0-0'}
+    )
+
+    # Other hosts are never requested
+    assert not probe_webdav(job, 'https://example.com/a.png')
+    job.session.probe_webdav.assert_called_once()
+
+
+def test_webdav_probe_unknown_size():
+    job = mock_job(webdav_probes={})
+    job.session.instance_url = 'https://bb.example.org'
+    job.session.probe_webdav.return_value = make_probe_response(405, {})
+    job.session.download_webdav.return_value = make_probe_response(
+        206, {'Content-Type': 'application/pdf', 'Content-Length': '1',
+              'Content-Range': 'bytes 0-0/*'}
+    )
+
+    assert probe_webdav(job, 'https://bb.example.org/webdav/a.pdf')
@@ -0,0 +1,306 @@
+"""BlackboardDownload Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import time
+import logging
+import threading
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from blackboard.exceptions import BBUnauthorizedError
+
+from blackboard_sync.cancel import CancelToken, SyncCancelled
+from blackboard_sync.config import SyncConfig
+from blackboard_sync.content.base import BStream, FStream
+from blackboard_sync.content.job import DownloadJob
+from blackboard_sync.download import BlackboardDownload, CourseDownloadError
+from blackboard_sync.executor import SyncExecutor
+from blackboard_sync.manifest import SyncManifest
+from blackboard_sync.metrics import SyncMetrics
+from blackboard_sync.sync import BlackboardSync
+
+
+class StalledHandler(BaseHTTPRequestHandler):
+    """Sends the start of a body, then stops until the test is over."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(1024 * 1024))
+        self.end_headers()
+        self.wfile.write(b'x' * 1024)
+        self.wfile.flush()
+        self.server.done.wait(30)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stalled_url():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StalledHandler)
+    httpd.daemon_threads = True
+    httpd.done = threading.Event()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/"
+    httpd.done.set()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class UrlStream(BStream):
+    def __init__(self, url, job):
+        super().__init__(job)
+        self.url = url
+
+    def open_stream(self, headers):
+        return requests.get(self.url, headers=headers, stream=True)
+
+
+def make_download(tmp_path, courses, **kwargs):
+    sess = mock.Mock()
+    sess.ex_fetch_courses.return_value = courses
+    return BlackboardDownload(sess, tmp_path, **kwargs)
+
+
+def make_course(course_id):
+    return mock.Mock(id=course_id)
+
+
+def test_download_all_courses(tmp_path):
+    courses = [make_course(str(i)) for i in range(10)]
+    download = make_download(tmp_path, courses, course_workers=3)
+
+    with mock.patch('blackboard_sync.download.Course') as p:
+        assert download.download() is not None
+        assert p.call_count == len(courses)
+
+
+def test_course_errors_are_isolated(tmp_path):
+    courses = [make_course(str(i)) for i in range(5)]
+    download = make_download(tmp_path, courses)
+
+    def fake_course(course, job):
+        if course.id == '2':
+            raise ValueError("broken course")
+        return mock.Mock()
+
+    with (mock.patch('blackboard_sync.download.Course',
+                     side_effect=fake_course) as p,
+          mock.patch('blackboard_sync.download.BlobStore') as blobs):
+        with pytest.raises(CourseDownloadError) as exc_info:
+            download.download()
+
+        # Every other course was still processed
+        assert p.call_count == len(courses)
+
+    # Files of the broken course are still held for the next sync
+    blobs.return_value.prune.assert_not_called()
+
+    assert list(exc_info.value.errors) == ['2']
+    assert list(download.course_errors) == ['2']
+
+
+def test_download_metrics(tmp_path):
+    metrics = SyncMetrics()
+    courses = [make_course(str(i)) for i in range(3)]
+    download = make_download(tmp_path, courses, metrics=metrics)
+
+    def fake_course(course, job):
+        if course.id == '2':
+            raise ValueError("broken course")
+
+        content = mock.Mock()
+        content.write.side_effect = lambda path, plan: plan.add_text(
+            path / f"{course.id}.txt", FStream(), 'notes'
+        )
+        return content
+
+    with mock.patch('blackboard_sync.download.Course',
+                    side_effect=fake_course):
+        with pytest.raises(CourseDownloadError):
+            download.download()
+
+    assert metrics.files.get(result='written') == 2
+    assert metrics.files.get(result='failed') == 0
+    assert metrics.errors.get(stage='course') == 1
+
+
+def test_course_unauthorized_reraised(tmp_path):
+    download = make_download(tmp_path, [make_course('1')])
+
+    with mock.patch('blackboard_sync.download.Course',
+                    side_effect=BBUnauthorizedError({})):
+        with pytest.raises(BBUnauthorizedError):
+            download.download()
+
+
+def test_manifest_closed_on_error(tmp_path):
+    download = make_download(tmp_path, [make_course('1')])
+
+    with (mock.patch('blackboard_sync.download.Course'),
+          mock.patch.object(download, '_report_plan',
+                            side_effect=OSError('disk full')),
+          mock.patch.object(SyncManifest, 'close',
+                            autospec=True) as close):
+        with pytest.raises(OSError):
+            download.download()
+
+    close.assert_called_once()
+
+
+def test_cancelled_download(tmp_path):
+    download = make_download(tmp_path, [make_course('1')])
+    download.cancel()
+
+    with mock.patch('blackboard_sync.download.Course') as p:
+        assert download.download() is None
+        p.assert_not_called()
+
+
+def test_dry_run_only_plans(tmp_path):
+    download = make_download(tmp_path, [make_course('1')], dry_run=True)
+
+    def fake_course(course, job):
+        content = mock.Mock()
+        content.write.side_effect = lambda path, plan: plan.add_text(
+            path / 'notes.txt', FStream(), 'notes'
+        )
+        return content
+
+    with mock.patch('blackboard_sync.download.Course',
+                    side_effect=fake_course):
+        assert download.download() is None
+
+    assert len(download.plan.files) == 1
+    assert download.plan.total_bytes == 5
+    assert download.progress.discovered == 1
+    assert not (tmp_path / 'notes.txt').exists()
+    assert not (tmp_path / '.bbsync' / 'plan.json').exists()
+
+
+def test_cancel_stops_traversal(tmp_path):
+    download = make_download(tmp_path, [make_course('1')])
+    started = threading.Event()
+
+    def slow_course(course, job):
+        started.set()
+        # Stands in for a course still being expanded
+        job.cancel_token.sleep(30)
+
+    with mock.patch('blackboard_sync.download.Course',
+                    side_effect=slow_course):
+        thread = threading.Thread(target=download.download)
+        thread.start()
+        assert started.wait(5)
+
+        begin = time.monotonic()
+        download.cancel()
+        thread.join(5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - begin < 2
+
+
+def test_cancel_interrupts_stream(tmp_path, stalled_url):
+    token = CancelToken()
+    job = DownloadJob(mock.Mock(), None, cancel_token=token)
+    executor = SyncExecutor()
+    path = tmp_path / 'file.bin'
+    part_path = tmp_path / 'file.bin.part'
+
+    UrlStream(stalled_url, job).write_base(path, executor)
+
+    # Wait until the read blocks in the middle of the body
+    for _ in range(100):
+        if part_path.exists():
+            break
+        time.sleep(0.05)
+
+    time.sleep(0.2)
+
+    begin = time.monotonic()
+    token.cancel()
+    executor.shutdown(wait=True)
+
+    assert time.monotonic() - begin < 2
+    assert not path.exists()
+
+    with pytest.raises(SyncCancelled):
+        executor.raise_exceptions()
+
+
+@pytest.fixture
+def sync_logger():
+    logger = logging.getLogger('blackboard_sync.sync')
+    handlers = list(logger.handlers)
+    yield logger
+
+    # Log files of the sync are opened by its constructor
+    for handler in set(logger.handlers) - set(handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def test_stop_sync_interrupts_download(tmp_path, stalled_url, sync_logger):
+    config = SyncConfig(tmp_path)
+    config.download_location = tmp_path / 'courses'
+
+    with mock.patch('blackboard_sync.sync.SyncConfig',
+                    return_value=config):
+        sync = BlackboardSync()
+
+    sync.university = mock.Mock()
+    sync.sess = mock.Mock()
+    sync.sess.ex_fetch_courses.return_value = [make_course('1')]
+
+    def stalled_course(course, job):
+        content = mock.Mock()
+        content.write.side_effect = lambda path, plan: plan.add_stream(
+            path / 'file.bin', UrlStream(stalled_url, job)
+        )
+        return content
+
+    with mock.patch('blackboard_sync.download.Course',
+                    side_effect=stalled_course):
+        assert sync.start_sync()
+
+        part_path = tmp_path / 'courses' / 'file.bin.part'
+
+        # Wait until the read blocks in the middle of the body
+        for _ in range(100):
+            if part_path.exists():
+                break
+            time.sleep(0.05)
+
+        assert part_path.exists()
+        time.sleep(0.2)
+
+        begin = time.monotonic()
+        assert sync.stop_sync(timeout=5)
+
+    assert time.monotonic() - begin < 2
+    assert not sync.sync_thread.is_alive()
+    assert not (tmp_path / 'courses' / 'file.bin').exists()
+    assert any(h.baseFilename.startswith(str(tmp_path))
+               for h in sync_logger.handlers
+               if isinstance(h, logging.FileHandler))
@@ -0,0 +1,72 @@
+"""SyncExecutor Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import threading
+
+import pytest
+
+from blackboard_sync.executor import SyncExecutor
+
+
+def test_executor_blocks_when_full():
+    executor = SyncExecutor(max_workers=1, max_pending=2)
+    release = threading.Event()
+    submitted = []
+
+    def produce():
+        for i in range(3):
+            executor.submit(release.wait)
+            submitted.append(i)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    producer.join(timeout=0.5)
+
+    # Third task waits for a free slot
+    assert submitted == [0, 1]
+    assert executor.pending == 2
+
+    release.set()
+    producer.join(timeout=5)
+    assert submitted == [0, 1, 2]
+
+    executor.shutdown()
+    assert executor.pending == 0
+
+
+def test_executor_keeps_failures_only():
+    executor = SyncExecutor(max_workers=2)
+
+    def fail():
+        raise ValueError()
+
+    for _ in range(10):
+        executor.submit(lambda: None)
+    executor.submit(fail)
+
+    executor.shutdown()
+
+    assert len(executor.failures) == 1
+
+    with pytest.raises(ValueError):
+        executor.raise_exceptions()
+
+
+def test_executor_workers():
+    assert SyncExecutor(max_workers=3).workers == 3
+    assert SyncExecutor().workers == SyncExecutor.DEFAULT_WORKERS
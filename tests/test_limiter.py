@@ -0,0 +1,135 @@
+"""AdaptiveLimiter Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import time
+import threading
+from unittest import mock
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from blackboard_sync.cancel import CancelToken, SyncCancelled
+from blackboard_sync.limiter import AdaptiveLimiter, retry_after
+
+
+def response(**headers):
+    return mock.Mock(headers=headers)
+
+
+@pytest.mark.parametrize('value,expected', [
+    (None, None), ('3', 3.0), ('-1', 0.0), ('soon', None)
+])
+def test_retry_after_seconds(value, expected):
+    headers = {'Retry-After': value} if value is not None else {}
+    assert retry_after(response(**headers)) == expected
+
+
+def test_retry_after_date():
+    date = datetime.now(timezone.utc) + timedelta(seconds=30)
+    wait = retry_after(response(**{'Retry-After': format_datetime(date)}))
+    assert 28 < wait <= 30
+
+
+def test_limiter_increases_while_stable():
+    limiter = AdaptiveLimiter(initial=2, max_limit=10)
+
+    # Latency of a few microseconds would be mostly noise
+    for _ in range(50):
+        limiter.release(limiter.acquire() - 0.1, 200)
+
+    assert limiter.limit == 10
+
+
+def test_limiter_stops_increasing_when_slow():
+    limiter = AdaptiveLimiter(initial=2)
+    limiter.release(limiter.acquire(), 200)
+
+    for _ in range(5):
+        limiter.release(limiter.acquire() - 1, 200)
+
+    assert limiter.limit == 2
+
+
+@pytest.mark.parametrize('status', [429, 503, None])
+def test_limiter_backs_off(status):
+    limiter = AdaptiveLimiter(initial=8)
+    started = [limiter.acquire() for _ in range(4)]
+
+    # Requests sent together only cut the limit once
+    for s in started:
+        limiter.release(s, status)
+
+    assert limiter.limit == 4
+    assert limiter.decreases == 1
+
+
+def test_limiter_blocks_at_limit():
+    limiter = AdaptiveLimiter(initial=2)
+    started = [limiter.acquire(), limiter.acquire()]
+    acquired = threading.Event()
+
+    def _acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=_acquire, daemon=True).start()
+    assert not acquired.wait(0.2)
+
+    limiter.release(started[0], 200)
+    assert acquired.wait(1)
+
+
+def test_limiter_retry_after_pauses():
+    limiter = AdaptiveLimiter()
+    limiter.release(limiter.acquire(), 200, wait=0.3)
+
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.25
+
+
+def test_limiter_pause_is_capped():
+    limiter = AdaptiveLimiter(max_pause=0.2)
+    limiter.release(limiter.acquire(), 503, wait=3600)
+
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start < 1
+
+
+def test_limiter_acquire_stops_when_cancelled():
+    limiter = AdaptiveLimiter(initial=1)
+    limiter.acquire()
+    token = CancelToken()
+    errors = []
+
+    def _acquire():
+        try:
+            limiter.acquire(token)
+        except SyncCancelled as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=_acquire, daemon=True)
+    thread.start()
+    time.sleep(0.1)
+
+    token.cancel()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert len(errors) == 1
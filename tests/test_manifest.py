@@ -0,0 +1,118 @@
+"""SyncManifest Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from datetime import datetime, timezone, timedelta
+
+from blackboard_sync.manifest import SyncManifest, ItemStatus
+from blackboard_sync.content.job import DownloadJob
+
+
+MODIFIED = datetime(2024, 10, 1, tzinfo=timezone.utc)
+
+
+def test_unknown_content():
+    manifest = SyncManifest()
+    assert manifest.is_current('course/content', MODIFIED) is None
+
+
+def test_content_current(tmp_path):
+    manifest = SyncManifest.for_location(tmp_path)
+    file_path = tmp_path / 'notes.pdf'
+    file_path.write_bytes(b'notes')
+
+    manifest.record_content('c/1', MODIFIED)
+    manifest.start_file('c/1/a', 'c/1')
+    assert not manifest.is_current('c/1', MODIFIED)
+
+    manifest.complete_file('c/1/a', 'c/1', file_path, etag='"abc"')
+    assert manifest.is_current('c/1', MODIFIED)
+    assert manifest.get('c/1/a').etag == '"abc"'
+
+    # Persisted to the download location
+    manifest.close()
+    manifest = SyncManifest.for_location(tmp_path)
+    assert manifest.is_current('c/1', MODIFIED)
+
+    # Content was modified
+    assert not manifest.is_current('c/1', MODIFIED + timedelta(hours=1))
+
+
+def test_content_missing_file(tmp_path):
+    manifest = SyncManifest()
+    file_path = tmp_path / 'notes.pdf'
+    file_path.write_bytes(b'notes')
+
+    manifest.record_content('c/1', MODIFIED)
+    manifest.complete_file('c/1/a', 'c/1', file_path)
+    manifest.skip_file('c/1/b', 'c/1')
+    assert manifest.is_current('c/1', MODIFIED)
+
+    file_path.unlink()
+    assert not manifest.is_current('c/1', MODIFIED)
+
+
+def test_content_failed_file():
+    manifest = SyncManifest()
+    manifest.record_content('c/1', MODIFIED)
+    manifest.fail_file('c/1/a', 'c/1')
+
+    assert manifest.get('c/1/a').status == ItemStatus.FAILED
+    assert not manifest.is_current('c/1', MODIFIED)
+
+
+def test_job_uses_manifest():
+    manifest = SyncManifest()
+    last_sync = MODIFIED + timedelta(days=1)
+    job = DownloadJob(None, last_sync, manifest=manifest)
+
+    # Unknown items fall back to the last sync time
+    assert not job.has_changed(MODIFIED, 'c/1')
+
+    manifest.record_content('c/1', MODIFIED, failed=True)
+    assert job.has_changed(MODIFIED, 'c/1')
+
+    manifest.clear()
+    assert not job.has_changed(MODIFIED, 'c/1')
+
+
+def test_listing_cached():
+    manifest = SyncManifest()
+    children = [{'id': '2', 'title': 'Week 1'}]
+
+    assert manifest.cached_children('c/1', MODIFIED) is None
+    assert manifest.record_children('c/1', MODIFIED, children)
+    assert manifest.cached_children('c/1', MODIFIED) == children
+
+    # Folder was modified
+    later = MODIFIED + timedelta(hours=1)
+    assert manifest.cached_children('c/1', later) is None
+
+    # Same children listed again
+    assert not manifest.record_children('c/1', later, children)
+    assert manifest.last_listing('c/1').children == children
+
+    manifest.clear()
+    assert manifest.cached_children('c/1', later) is None
+
+
+def test_listing_expires(monkeypatch):
+    manifest = SyncManifest()
+    manifest.record_children('c/1', MODIFIED, [])
+
+    monkeypatch.setattr(SyncManifest, 'LISTING_MAX_AGE', timedelta(0))
+    assert manifest.cached_children('c/1', MODIFIED) is None
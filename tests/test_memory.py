@@ -0,0 +1,283 @@
+"""Memory Tests
+
+Courses of generated contents are built and written while memory is
+traced, and the growth of the peak per content between a small course
+and a large one must stay within a budget. Trees of tens of thousands
+of contents take minutes to sync while traced, so a smaller one is used
+by default, set `BBSYNC_MEMORY_NODES` to check a larger tree, or 0 to
+skip the test.
+"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import io
+import os
+import gc
+import html
+import logging
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any, NamedTuple
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from requests import Response
+from hypothesis import given, settings, HealthCheck, Phase
+from hypothesis import strategies as st
+
+from blackboard.blackboard import (BBCourse, BBCourseContent, BBAttachment,
+                                   BBAvailability, BBContentHandler)
+
+from blackboard_sync.plan import SyncPlan
+from blackboard_sync.executor import SyncExecutor
+from blackboard_sync.content.job import DownloadJob
+from blackboard_sync.content.course import Course
+
+from .strategies import bb_course_contents, bb_attachment
+
+# Contents in the large course, and in the small one it is compared to
+NODES = int(os.environ.get('BBSYNC_MEMORY_NODES', 1_000))
+SMALL_NODES = max(NODES // 10, 10)
+
+# Contents synced first, so that caches filled once are not counted
+WARM_UP_NODES = 50
+
+# Children of each folder
+FANOUT = 10
+
+# Peak bytes allocated for each content added to a course, while it is
+# built and written. Recorded at 9 to 11 KiB per content from 100 to
+# 1,000 contents, and from 1,000 to 5,000
+TRACED_BUDGET = 16 * 1024
+# Peak growth of the resident set likewise, where it can be read, which
+# was recorded at 15 to 19 KiB per content
+RSS_BUDGET = 24 * 1024
+
+INSTANCE_URL = 'https://blackboard.test'
+PAYLOAD = b'%PDF-1.4\n' + bytes(4087)
+
+
+class MemoryUsage(NamedTuple):
+    # Peak bytes allocated by Python, as traced by tracemalloc
+    traced: int
+    # Peak growth of the resident set size, if known
+    rss: int | None
+
+
+def read_rss() -> int | None:
+    """Resident set size of the process, on Linux only."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+class MemorySampler:
+    """Trace allocations and sample the resident set while running."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self._stop = threading.Event()
+        self._start_rss: int | None = None
+        self._peak_rss: int | None = None
+        self._traced = 0
+
+    def __enter__(self) -> 'MemorySampler':
+        gc.collect()
+        self._start_rss = self._peak_rss = read_rss()
+        tracemalloc.start()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._traced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            if (rss := read_rss()) is not None and self._peak_rss is not None:
+                self._peak_rss = max(self._peak_rss, rss)
+
+    @property
+    def usage(self) -> MemoryUsage:
+        rss = None
+
+        if self._start_rss is not None and self._peak_rss is not None:
+            rss = self._peak_rss - self._start_rss
+        return MemoryUsage(self._traced, rss)
+
+
+def make_response(content_type: str, body: bytes = b'') -> Response:
+    response = Response()
+    response.status_code = 200
+    response.raw = io.BytesIO(body)
+    response.headers['Content-Type'] = content_type
+    response.headers['Content-Length'] = str(len(PAYLOAD))
+    return response
+
+
+class LargeCourseSession:
+    """Session serving a whole course from generated contents."""
+
+    instance_url = INSTANCE_URL
+    recursive_listing = True
+
+    def __init__(self, contents: list[BBCourseContent],
+                 attachment: BBAttachment) -> None:
+        self.contents = contents
+        self.attachment = attachment
+
+    def fetch_content_tree(self, **kwargs: Any) -> list[BBCourseContent]:
+        return self.contents
+
+    def iter_content_children(self, **kwargs: Any) -> list[BBCourseContent]:
+        return []
+
+    def fetch_content_body(self, **kwargs: Any) -> str | None:
+        return None
+
+    def fetch_file_attachments(self, *, content_id: str,
+                               **kwargs: Any) -> list[BBAttachment]:
+        return [self.attachment.model_copy(update={
+            'id': f"{content_id}_a", 'fileName': f"slides{content_id}.pdf",
+            'mimeType': 'application/pdf'
+        })]
+
+    def attachment_url(self, **kwargs: Any) -> str:
+        return f"{INSTANCE_URL}/download"
+
+    def download(self, **kwargs: Any) -> Response:
+        return make_response('application/pdf', PAYLOAD)
+
+    def probe_webdav(self, **kwargs: Any) -> Response:
+        return make_response('application/pdf')
+
+    def download_webdav(self, **kwargs: Any) -> Response:
+        return make_response('application/pdf', PAYLOAD)
+
+
+def build_contents(templates: list[BBCourseContent],
+                   nodes: int) -> list[BBCourseContent]:
+    """Tile generated contents into a tree of folders and documents.
+
+    The first `FANOUT` contents are at the top of the course, every
+    other content is a child of the content `FANOUT` times before it.
+    Documents have an HTML body which links to a WebDav file.
+    """
+    modified = datetime.now(timezone.utc)
+    available = BBAvailability(available='Yes')
+    folder = BBContentHandler(id='resource/x-bb-folder')
+    document = BBContentHandler(id='resource/x-bb-document')
+    contents = []
+
+    for i in range(nodes):
+        template = templates[i % len(templates)]
+        is_folder = (i + 1) * FANOUT < nodes
+        parent = f"_{i // FANOUT - 1}_1" if i >= FANOUT else None
+        body = None
+
+        if not is_folder:
+            text = html.escape(template.body or '')
+            body = (f"<h1>Week {i}</h1><p>{text}</p>" + "<p>Notes</p>" * 40 +
+                    f'<a href="{INSTANCE_URL}/bbcswebdav/pid-{i}/xid-{i}_1">'
+                    f"notes_{i}.pdf</a>")
+
+        contents.append(template.model_copy(update={
+            'id': f"_{i}_1",
+            'title': f"{(template.title or '')[:20]} {i}",
+            'body': body,
+            'modified': modified,
+            'parentId': parent,
+            'hasChildren': is_folder,
+            'availability': available,
+            'contentHandler': folder if is_folder else document
+        }))
+
+    return contents
+
+
+def sync_course(session: LargeCourseSession, path: Path) -> SyncPlan:
+    """Build the course, then write every file in its plan.
+
+    Folders are expanded and files written on separate pools, as they
+    are by `BlackboardDownload`.
+    """
+    executor = SyncExecutor(8)
+
+    with ThreadPoolExecutor(8) as folder_pool:
+        job = DownloadJob(session, None, folder_pool)
+        course = BBCourse(id='_1_1', name='Large Course',
+                          availability={'available': 'Yes'})
+
+        plan = SyncPlan()
+        Course(course, job).write(path, plan)
+
+    plan.execute(executor)
+    executor.shutdown(wait=True)
+    executor.raise_exceptions()
+    return plan
+
+
+def measure_sync(templates: list[BBCourseContent], attachment: BBAttachment,
+                 nodes: int, path: Path) -> MemoryUsage:
+    """Peak memory used to sync a course with this many contents."""
+    contents = build_contents(templates, nodes)
+    session = LargeCourseSession(contents, attachment)
+
+    with MemorySampler() as sampler:
+        plan = sync_course(session, path)
+
+    # Every document and its attachment, body and WebDav file
+    documents = sum(1 for c in contents if not c.hasChildren)
+    assert len(plan.files) == 3 * documents
+
+    return sampler.usage
+
+
+@pytest.mark.skipif(NODES <= SMALL_NODES, reason="memory suite disabled")
+@settings(max_examples=1, deadline=None, database=None,
+          phases=[Phase.generate], suppress_health_check=list(HealthCheck))
+@given(st.lists(bb_course_contents(), min_size=10, max_size=10),
+       bb_attachment())
+def test_peak_memory_per_node(tmp_path_factory, caplog, templates,
+                              attachment):
+    # Records captured for each content would be counted too
+    caplog.set_level(logging.WARNING, logger='blackboard_sync')
+
+    def measure(nodes: int) -> MemoryUsage:
+        path = tmp_path_factory.mktemp('course')
+        return measure_sync(templates, attachment, nodes, path)
+
+    measure(WARM_UP_NODES)
+    small = measure(SMALL_NODES)
+    large = measure(NODES)
+    added = NODES - SMALL_NODES
+
+    traced = (large.traced - small.traced) / added
+    assert traced <= TRACED_BUDGET, f"{traced:.0f} bytes traced per node"
+
+    if large.rss is not None and small.rss is not None:
+        rss = (large.rss - small.rss) / added
+        assert rss <= RSS_BUDGET, f"{rss:.0f} resident bytes per node"
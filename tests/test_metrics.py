@@ -0,0 +1,93 @@
+"""SyncMetrics Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import pytest
+import requests
+
+from blackboard_sync.metrics import SyncMetrics, endpoint_label
+
+
+@pytest.mark.parametrize('url, label', [
+    ('https://bb.ac.uk/learn/api/public/v1/courses/_12_1/contents',
+     'courses/{id}/contents'),
+    ('https://bb.ac.uk/learn/api/public/v1/courses/_12_1/contents/_3_1/'
+     'children?limit=200', 'courses/{id}/contents/{id}/children'),
+    ('https://bb.ac.uk/learn/api/public/v3/users/me', 'users/{id}'),
+    ('https://bb.ac.uk/learn/api/public/v1/users/uuid:abc/courses',
+     'users/{id}/courses'),
+    ('https://bb.ac.uk/bbcswebdav/pid-1/xid-2_1', 'bbcswebdav'),
+    (b'https://bb.ac.uk/', '/'),
+])
+def test_endpoint_label(url, label):
+    assert endpoint_label(url) == label
+
+
+def test_render_text_format():
+    metrics = SyncMetrics()
+    url = 'https://bb.ac.uk/learn/api/public/v1/courses/_1_1'
+
+    metrics.observe_request(url, 200, 0.2)
+    metrics.observe_request(url, 200, 3.0)
+    metrics.observe_request(url, None, 12.0)
+    metrics.files.inc(3, result='written')
+
+    text = metrics.render()
+
+    assert '# TYPE bbsync_api_requests_total counter' in text
+    assert ('bbsync_api_requests_total{endpoint="courses/{id}",'
+            'status="200"} 2') in text
+    assert ('bbsync_api_requests_total{endpoint="courses/{id}",'
+            'status="error"} 1') in text
+    assert '# TYPE bbsync_request_duration_seconds histogram' in text
+    assert 'bbsync_request_duration_seconds_bucket{le="0.25"} 1' in text
+    assert 'bbsync_request_duration_seconds_bucket{le="5"} 2' in text
+    assert 'bbsync_request_duration_seconds_bucket{le="+Inf"} 3' in text
+    assert 'bbsync_request_duration_seconds_sum 15.2' in text
+    assert 'bbsync_request_duration_seconds_count 3' in text
+    assert 'bbsync_errors_total{stage="request"} 1' in text
+    assert 'bbsync_files_total{result="written"} 3' in text
+    assert text.endswith('\n')
+
+
+def test_write_textfile(tmp_path):
+    metrics = SyncMetrics()
+    metrics.syncs.inc(result='complete')
+    path = tmp_path / 'collector' / 'bbsync.prom'
+
+    metrics.write_textfile(path)
+
+    assert path.read_text() == metrics.render()
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_serve_metrics():
+    metrics = SyncMetrics()
+    metrics.retries.inc()
+    server = metrics.serve(0)
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        response = requests.get(f"{url}/metrics", timeout=5)
+        assert response.status_code == 200
+        assert 'bbsync_retries_total 1' in response.text
+        assert response.headers['Content-Type'].startswith('text/plain')
+
+        assert requests.get(f"{url}/", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
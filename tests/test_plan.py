@@ -0,0 +1,127 @@
+"""SyncPlan Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import mock
+
+from blackboard_sync.content.base import BStream, FStream
+from blackboard_sync.plan import PlanAction, PlanItem, SyncPlan
+
+
+class SizedStream(BStream):
+    def __init__(self, url, size):
+        super().__init__()
+        self.url = url
+        self.size = size
+        self.written = []
+
+    def open_stream(self, headers):
+        raise NotImplementedError
+
+    def stream_url(self):
+        return self.url
+
+    def expected_size(self):
+        return self.size
+
+    def write_base(self, path, executor):
+        self.written.append(path)
+        executor.order.append(self.url)
+
+
+def make_plan(tmp_path):
+    plan = SyncPlan()
+    plan.add_directory(tmp_path / 'course')
+    plan.add_stream(tmp_path / 'course' / 'a.pdf', SizedStream('a', 10))
+    plan.add_stream(tmp_path / 'course' / 'b.pdf', SizedStream('b', None))
+    plan.add_stream(tmp_path / 'course' / 'c.pdf', SizedStream('c', 300))
+    plan.add_text(tmp_path / 'course' / 'd.html', FStream(), 'hello')
+    return plan
+
+
+def test_plan_describes_work(tmp_path):
+    plan = make_plan(tmp_path)
+
+    assert [i.action for i in plan.items] == [PlanAction.DIRECTORY,
+                                              *[PlanAction.DOWNLOAD] * 3,
+                                              PlanAction.WRITE]
+    assert len(plan.files) == 4
+    assert plan.total_bytes == 315
+    assert plan.unknown_sizes == 1
+
+    # Nothing is written until the plan is executed
+    assert not (tmp_path / 'course').exists()
+
+
+def test_plan_execute_order(tmp_path):
+    plan = make_plan(tmp_path)
+    executor = mock.Mock(submit=lambda fn: fn())
+    executor.order = []
+
+    plan.execute(executor)
+
+    assert (tmp_path / 'course').is_dir()
+    assert (tmp_path / 'course' / 'd.html').read_text() == 'hello'
+    # Largest downloads first, unknown sizes last
+    assert executor.order == ['c', 'a', 'b']
+
+
+def test_plan_dump_and_diff(tmp_path):
+    plan = make_plan(tmp_path)
+    plan_path = tmp_path / 'plan.json'
+    plan.dump(plan_path)
+
+    loaded = SyncPlan.load(plan_path)
+    assert loaded.items == plan.items
+    assert plan.diff(loaded) == ([], [], [])
+
+    new_plan = SyncPlan(plan.items[:2])
+    new_plan.add_stream(tmp_path / 'course' / 'c.pdf', SizedStream('c', 5))
+    new_plan.add_stream(tmp_path / 'course' / 'e.pdf', SizedStream('e', 1))
+
+    diff = new_plan.diff(loaded)
+    assert [i.url for i in diff.added] == ['e']
+    assert [i.url for i in diff.removed] == ['b', None]
+    assert diff.changed == [PlanItem(PlanAction.DOWNLOAD,
+                                     str(tmp_path / 'course' / 'c.pdf'),
+                                     'c', 5)]
+
+
+def test_plan_keeps_unchanged_items(tmp_path):
+    previous = make_plan(tmp_path)
+    previous.add_text(tmp_path / 'old' / 'e.html', FStream(), 'gone')
+
+    # Incremental sync which only found one new file
+    plan = SyncPlan()
+    plan.add_kept(tmp_path / 'course')
+    plan.add_kept(tmp_path / 'unknown')
+    plan.add_stream(tmp_path / 'course' / 'f.pdf', SizedStream('f', 1))
+
+    diff = plan.diff(previous)
+    assert [i.url for i in diff.added] == ['f']
+    assert [i.path for i in diff.removed] == [str(tmp_path / 'old' /
+                                                  'e.html')]
+    assert diff.changed == []
+
+    full = plan.carry_over(previous)
+    assert full.items == [*plan.items[2:], *previous.items[:5],
+                          PlanItem(PlanAction.KEEP,
+                                   str(tmp_path / 'unknown'))]
+    assert len(full.files) == 5
+
+    # Kept items stay kept through later syncs
+    assert plan.carry_over(full).items == full.items
@@ -0,0 +1,115 @@
+"""SyncProfiler Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301, USA.
+
+import sys
+import time
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from blackboard_sync.profiling import (SyncProfiler, ThreadProfiler,
+                                       profiler_mode, PROFILE_ENV)
+
+
+def busy_worker() -> None:
+    end = time.monotonic() + 0.2
+    while time.monotonic() < end:
+        pass
+
+
+def run_sync() -> None:
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda _: busy_worker(), range(2)))
+
+
+@pytest.mark.parametrize('env, configured, mode', [
+    (None, None, None),
+    (None, 'cprofile', 'cprofile'),
+    (None, 'Sample', 'sample'),
+    ('1', None, 'cprofile'),
+    ('sample', 'cprofile', 'sample'),
+    ('off', 'cprofile', None),
+    (None, 'yappi', None),
+])
+def test_profiler_mode(monkeypatch, env, configured, mode):
+    if env is None:
+        monkeypatch.delenv(PROFILE_ENV, raising=False)
+    else:
+        monkeypatch.setenv(PROFILE_ENV, env)
+
+    assert profiler_mode(configured) == mode
+
+
+def test_cprofile_records_workers(tmp_path):
+    with SyncProfiler('cprofile') as profiler:
+        run_sync()
+
+    files = profiler.dump(tmp_path / 'profile', 'sync')
+
+    assert [f.name for f in files] == ['sync.pstats', 'sync.collapsed']
+
+    stats = pstats.Stats(str(files[0]))
+    functions = {name for _, _, name in stats.stats}
+    assert 'busy_worker' in functions
+    assert 'run_sync' in functions
+
+
+@pytest.mark.skipif(not ThreadProfiler.PER_THREAD,
+                    reason="every thread shares one profile")
+def test_cprofile_ignores_lasting_threads():
+    # Started during the sync, but kept for the next one
+    pool = ThreadPoolExecutor(1, thread_name_prefix='page')
+
+    try:
+        with SyncProfiler('cprofile', ignore_threads=['page']) as profiler:
+            run_sync()
+            pool.submit(busy_worker).result()
+
+        # Not left profiling once the sync is over
+        assert pool.submit(sys.getprofile).result() is None
+    finally:
+        pool.shutdown()
+
+    stats = profiler.profiler.stats()
+    workers = [key for key in stats.stats if key[2] == 'busy_worker']
+    assert stats.stats[workers[0]][0] == 2
+
+
+def test_sample_collapses_stacks(tmp_path):
+    with SyncProfiler('sample') as profiler:
+        run_sync()
+
+    files = profiler.dump(tmp_path, 'sync')
+    assert [f.name for f in files] == ['sync.collapsed']
+
+    lines = files[0].read_text().splitlines()
+    worker_lines = [line for line in lines if 'busy_worker' in line]
+
+    assert worker_lines
+    stack, count = worker_lines[0].rsplit(' ', 1)
+    frames = stack.split(';')
+    assert frames[0].startswith('ThreadPoolExecutor-')
+    assert frames[-1].startswith('busy_worker (test_profiling.py:')
+    assert int(count) > 0
+
+
+def test_unknown_profiler():
+    with pytest.raises(ValueError):
+        SyncProfiler('yappi')
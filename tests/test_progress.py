@@ -0,0 +1,101 @@
+"""SyncProgress Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from blackboard_sync.executor import SyncExecutor
+from blackboard_sync.progress import SyncProgress
+
+
+@pytest.fixture
+def clock():
+    with mock.patch('blackboard_sync.progress.time.monotonic') as p:
+        p.return_value = 100.0
+        yield p
+
+
+def test_progress_counts(clock):
+    progress = SyncProgress()
+    progress.discover(4, 1000)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for _ in range(100):
+            pool.submit(progress.add_bytes, 10)
+
+    progress.complete()
+    progress.complete(failed=True)
+
+    clock.return_value = 110.0
+    snapshot = progress.snapshot()
+
+    assert snapshot.discovered == 4
+    assert snapshot.completed == 1
+    assert snapshot.failed == 1
+    assert snapshot.remaining == 2
+    assert snapshot.bytes_done == 1000
+    assert snapshot.bytes_expected == 1000
+    assert snapshot.throughput == pytest.approx(100)
+    assert snapshot.eta == pytest.approx(10)
+
+
+def test_progress_moving_average(clock):
+    progress = SyncProgress()
+    progress.discover(100)
+
+    # Fast start, then nothing moves for a while
+    for _ in range(50):
+        progress.complete()
+    clock.return_value = 110.0
+    fast = progress.snapshot()
+
+    clock.return_value = 130.0
+    slow = progress.snapshot()
+
+    assert fast.file_rate == pytest.approx(5)
+    assert 0 < slow.file_rate < fast.file_rate
+    assert slow.eta > fast.eta
+
+
+def test_progress_eta_unknown(clock):
+    progress = SyncProgress()
+    assert progress.snapshot().eta == 0
+
+    progress.discover(1)
+    clock.return_value = 105.0
+    assert progress.snapshot().eta is None
+
+
+def test_executor_counts_files():
+    progress = SyncProgress()
+    progress.discover(3)
+    executor = SyncExecutor(max_workers=2, progress=progress)
+
+    def fail():
+        raise ValueError
+
+    executor.submit(lambda: None)
+    executor.submit(lambda: None)
+    executor.submit(fail)
+    executor.shutdown()
+
+    snapshot = progress.snapshot()
+    assert (snapshot.completed, snapshot.failed) == (2, 1)
+    assert snapshot.remaining == 0
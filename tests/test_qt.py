@@ -34,6 +34,7 @@ from blackboard_sync.qt import (
 )
 
 from blackboard_sync.qt.dialogs import DirDialog, Dialogs
+from blackboard_sync.progress import ProgressSnapshot
 
 
 @pytest.fixture
@@ -276,6 +277,16 @@ class TestSyncTrayIcon:
         tray_icon.set_currently_syncing(False)
         assert tray_icon._menu.refresh.isEnabled()
 
+    def test_tray_icon_syncing_progress(self, qtbot, tray_icon):
+        tray_icon.set_logged_in(True)
+        progress = ProgressSnapshot(discovered=10, completed=2, failed=1,
+                                    skipped=0, bytes_done=0, bytes_expected=0,
+                                    throughput=0.0, file_rate=0.05,
+                                    elapsed=60.0)
+        tray_icon.set_currently_syncing(True, progress)
+        status = tray_icon._menu._status.text()
+        assert status == 'Downloading 3 of 10 files, about 2 min left'
+
     def test_tray_icon_setupwiz_signal(self, qtbot, tray_icon):
         with qtbot.waitSignal(tray_icon.signals.reset_setup) as blocker:
             tray_icon._menu.reset_setup.trigger()
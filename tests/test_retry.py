@@ -0,0 +1,50 @@
+"""RetryPolicy Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from blackboard_sync.retry import RetryPolicy
+
+
+@given(st.integers(min_value=1, max_value=20))
+def test_retry_delay_bounded(failures):
+    policy = RetryPolicy(attempts=21, base_delay=1, max_delay=10)
+    delay = policy.delay(failures)
+    assert 0 <= delay <= min(10, 2 ** (failures - 1))
+
+
+def test_retry_attempts_exhausted():
+    policy = RetryPolicy(attempts=3)
+    assert policy.delay(1) is not None
+    assert policy.delay(2) is not None
+    assert policy.delay(3) is None
+
+
+def test_retry_after_respected():
+    policy = RetryPolicy(base_delay=0, max_delay=5)
+    assert policy.delay(1, wait=2) == 2
+    assert policy.delay(1, wait=60) == 5
+
+
+def test_retry_idempotent_only():
+    policy = RetryPolicy()
+    assert policy.is_idempotent('GET')
+    assert policy.is_idempotent(b'head')
+    assert not policy.is_idempotent('POST')
+    assert not policy.is_idempotent('PATCH')
@@ -0,0 +1,142 @@
+"""SyncSession Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+
+import threading
+from unittest import mock
+
+import pytest
+from requests.cookies import RequestsCookieJar
+
+from blackboard.blackboard import BBCourse, BBMembership
+from blackboard.exceptions import BBBadRequestError
+
+from blackboard_sync.session import (
+    SyncSession,
+    COURSE_FIELDS,
+    MEMBERSHIP_FIELDS
+)
+
+
+def page(results, next_page=None):
+    body = {'results': results}
+    if next_page is not None:
+        body['paging'] = {'nextPage': next_page}
+    return mock.Mock(json=mock.Mock(return_value=body))
+
+
+@pytest.fixture
+def session():
+    session = SyncSession('https://bb.example.org',
+                          cookies=RequestsCookieJar())
+    yield session
+    session.close()
+
+
+def test_content_tree_pages(session):
+    next_page = '/learn/api/public/v1/courses/c/contents?offset=1'
+
+    with mock.patch.object(SyncSession, '_fetch_contents_page',
+                           return_value=page([{'id': '1'}], next_page)), \
+         mock.patch.object(SyncSession, '_fetch_page',
+                           return_value=page([{'id': '2',
+                                               'parentId': '1'}])) as p:
+        contents = session.fetch_content_tree(course_id='c')
+
+    p.assert_called_once_with(page_url=f"https://bb.example.org{next_page}")
+    assert [c.id for c in contents] == ['1', '2']
+    assert contents[1].parentId == '1'
+
+
+def test_content_tree_error(session):
+    error = mock.Mock(json=mock.Mock(return_value={'status': 400}))
+
+    with mock.patch.object(SyncSession, '_fetch_contents_page',
+                           return_value=error):
+        with pytest.raises(BBBadRequestError):
+            session.fetch_content_tree(course_id='c')
+
+
+def test_courses_fields(session):
+    membership = BBMembership(courseId='c', availability={'available': 'Yes'},
+                              created='2024-10-01T00:00:00Z')
+
+    with mock.patch.object(SyncSession, 'fetch_user_memberships',
+                           return_value=[membership]) as ms, \
+         mock.patch.object(SyncSession, 'fetch_courses',
+                           return_value=BBCourse(id='c')) as c:
+        courses = session.ex_fetch_courses(user_id='me')
+
+    ms.assert_called_once_with(params={'fields': MEMBERSHIP_FIELDS},
+                               user_id='me')
+    c.assert_called_once_with(course_id='c',
+                              params={'fields': COURSE_FIELDS})
+    assert courses[0].created == membership.created
+
+
+def test_children_prefetched(session):
+    next_page = '/learn/api/public/v1/courses/c/contents/1/children?offset=1'
+    fetched = threading.Event()
+
+    def fetch_page(page_url):
+        fetched.set()
+        return page([{'id': '3'}])
+
+    with mock.patch.object(SyncSession, '_fetch_children_page',
+                           return_value=page([{'id': '2'}], next_page)), \
+         mock.patch.object(SyncSession, '_fetch_page',
+                           side_effect=fetch_page):
+        children = session.iter_content_children(course_id='c',
+                                                 content_id='1',
+                                                 fields='id')
+        assert next(children).id == '2'
+
+        # Next page requested while the first one is being read
+        assert fetched.wait(1)
+        assert [c.id for c in children] == ['3']
+
+
+def test_requests_sent_through_transport():
+    transport = mock.Mock()
+    transport.request.return_value = mock.Mock(
+        json=mock.Mock(return_value={'id': 'me'})
+    )
+    session = SyncSession('https://bb.example.org',
+                          cookies=RequestsCookieJar(), transport=transport)
+
+    # Endpoint defined by the API client itself
+    session.fetch_users(user_id='me')
+    transport.request.assert_called_once()
+
+
+def test_close_stops_prefetch(session):
+    next_page = '/learn/api/public/v1/courses/c/contents?offset=1'
+    running = set(threading.enumerate())
+
+    with mock.patch.object(SyncSession, '_fetch_contents_page',
+                           return_value=page([{'id': '1'}], next_page)), \
+         mock.patch.object(SyncSession, '_fetch_page',
+                           return_value=page([{'id': '2'}])):
+        session.fetch_content_tree(course_id='c')
+
+    session.close()
+
+    for thread in set(threading.enumerate()) - running:
+        if thread.name.startswith(SyncSession.PREFETCH_THREAD_NAME):
+            thread.join(1)
+            assert not thread.is_alive()
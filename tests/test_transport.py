@@ -0,0 +1,191 @@
+"""SyncTransport Tests"""
+
+# Copyright (C) 2024, Jacob Sánchez Pérez
+
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from blackboard_sync.metrics import SyncMetrics
+from blackboard_sync.retry import RetryPolicy
+from blackboard_sync.transport import SyncTransport
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.gate.wait(5)
+
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(self.server.status)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = self.headers.get('Cookie', '').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_HEAD = do_GET
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.gate = threading.Event()
+    httpd.gate.set()
+    httpd.failures = 0
+    httpd.status = 503
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_port}/"
+
+
+def test_transport_reuses_connections(server):
+    transport = SyncTransport(pool_size=2)
+
+    for _ in range(10):
+        transport.get(url(server)).close()
+
+    stats = transport.stats
+    assert stats.requests == 10
+    assert stats.connections == 1
+    assert stats.in_flight == 0
+    assert stats.saturated == 0
+
+
+def test_transport_reports_saturation(server):
+    transport = SyncTransport(pool_size=2)
+    server.gate.clear()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(transport.get, url(server))
+                   for _ in range(4)]
+        threading.Timer(0.5, server.gate.set).start()
+        [f.result() for f in futures]
+
+    stats = transport.stats
+    assert stats.peak_in_flight == 4
+    assert stats.saturated == 2
+    assert stats.connections <= 2
+
+
+def test_transport_warm(server):
+    transport = SyncTransport(pool_size=3)
+    transport.warm(url(server))
+    assert transport.stats.connections == 3
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda _: transport.get(url(server)).close(),
+                          range(9)))
+
+    assert transport.stats.connections == 3
+
+
+def test_transport_thread_sessions_share_cookies(server):
+    transport = SyncTransport(per_thread=True)
+    transport.cookies.set('session', 'abc')
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        bodies = list(executor.map(lambda _: transport.get(url(server)).text,
+                                   range(6)))
+
+    assert bodies == ['session=abc'] * 6
+
+
+def test_transport_closes_sessions_of_ended_threads(server):
+    transport = SyncTransport(per_thread=True)
+
+    for _ in range(3):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: transport.get(url(server)).close(),
+                              range(4)))
+
+    # Only the last pool's threads may be left, once they ended
+    transport.get(url(server)).close()
+    assert transport.stats.connections == 1
+
+    transport.close()
+    assert transport.stats.connections == 0
+
+
+def test_transport_retries_transient_status(server):
+    transport = SyncTransport(retry=RetryPolicy(attempts=3, base_delay=0))
+    server.failures = 2
+
+    assert transport.get(url(server)).status_code == 200
+    assert transport.stats.retries == 2
+
+    # Attempts exhausted, the last response is returned
+    server.failures = 3
+    assert transport.get(url(server)).status_code == 503
+    server.failures = 0
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_transport_retries_streamed_download(server, status):
+    # Downloads are streamed, and go through the same retries
+    transport = SyncTransport(retry=RetryPolicy(attempts=3, base_delay=0))
+    server.failures = 1
+    server.status = status
+    limit = transport.limiter.limit
+
+    with transport.get(url(server), stream=True) as response:
+        assert response.status_code == 200
+
+    assert transport.stats.retries == 1
+    assert transport.limiter.limit < limit
+
+
+def test_transport_does_not_retry_post(server):
+    transport = SyncTransport(retry=RetryPolicy(attempts=3, base_delay=0))
+    server.failures = 1
+
+    assert transport.post(url(server)).status_code == 503
+    assert transport.stats.retries == 0
+
+
+def test_transport_metrics(server):
+    server.failures = 1
+    metrics = SyncMetrics()
+    transport = SyncTransport(retry=RetryPolicy(base_delay=0),
+                              metrics=metrics)
+
+    assert transport.get(url(server)).status_code == 200
+
+    assert metrics.api_requests.get(endpoint='/', status='503') == 1
+    assert metrics.api_requests.get(endpoint='/', status='200') == 1
+    assert metrics.retries.get() == 1
+    assert metrics.request_duration.count == 2
+    assert metrics.request_limit.get() == transport.limiter.limit